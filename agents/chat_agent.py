@@ -2,6 +2,7 @@
 Chat Agent for general conversation
 """
 from typing import Dict, Any
+from app.config import settings
 from core.llm import llm_manager
 from core.memory import memory_manager
 from utils.prompts import CHAT_SYSTEM_PROMPT
@@ -27,7 +28,9 @@ class ChatAgent:
         """
         try:
             # Get conversation history
-            history = memory_manager.get_context_string(session_id, last_n=3)
+            history = memory_manager.get_prompt_context(
+                session_id, settings.SESSION_CONTEXT_MAX_TOKENS, last_n=3, query=query
+            )
             
             # Create prompt with context
             if history:
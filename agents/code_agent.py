@@ -1,7 +1,7 @@
 """
 Code Execution Agent
 """
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from core.llm import llm_manager
 from tools.code_executor import code_executor
 from utils.prompts import CODE_SYSTEM_PROMPT
@@ -15,20 +15,32 @@ class CodeAgent:
         self.llm = llm_manager.get_primary_llm()
         self.name = "Code Agent"
     
-    def process(self, query: str) -> Dict[str, Any]:
+    def process(self, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Process query by generating and executing code
         
         Args:
             query: User request for code execution
+            session_id: Session whose kernel runs the code, keeping its
+                variables (with CODE_STATEFUL_SESSIONS)
         
         Returns:
             Dict with code, output, and explanation
         """
         try:
+            # In stateful mode, let the code reuse what earlier turns computed
+            variables = code_executor.session_variables(session_id)
+            session_state = ""
+            if variables:
+                session_state = (
+                    "\nVariables already defined by earlier code in this session "
+                    "(reuse them instead of reloading or recomputing):\n"
+                    + "\n".join(variables) + "\n"
+                )
+            
             # Create prompt to generate code
             prompt = f"""{CODE_SYSTEM_PROMPT}
-
+{session_state}
 User Request: {query}
 
 Please write Python code to fulfill this request. Wrap your code in ```python ``` blocks."""
@@ -50,7 +62,7 @@ Please write Python code to fulfill this request. Wrap your code in ```python ``
             
             # Execute the first code block
             code = code_blocks[0]
-            execution_result = code_executor.execute(code)
+            execution_result = code_executor.execute(code, session_id)
             
             # Format response
             if execution_result['success']:
@@ -63,7 +75,8 @@ Please write Python code to fulfill this request. Wrap your code in ```python ``
                 'answer': answer,
                 'code': code,
                 'output': execution_result['output'],
-                'error': execution_result['error']
+                'error': execution_result['error'],
+                'usage': execution_result.get('usage')
             }
         
         except Exception as e:
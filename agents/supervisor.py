@@ -1,7 +1,8 @@
 """
 Supervisor Agent - Routes queries to specialized agents
 """
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+from app.config import settings
 from core.llm import llm_manager
 from core.memory import memory_manager
 from utils.prompts import SUPERVISOR_SYSTEM_PROMPT
@@ -37,7 +38,9 @@ class SupervisorAgent:
         """
         try:
             # Get conversation context
-            history = memory_manager.get_context_string(session_id, last_n=2)
+            history = memory_manager.get_context_within_tokens(
+                session_id, settings.SESSION_CONTEXT_MAX_TOKENS, last_n=2
+            )
             
             # Create routing prompt
             if history:
@@ -75,17 +78,38 @@ Which agent(s) should handle this?"""
             print(f"Routing error: {e}")
             return 'CHAT'
     
-    def process(self, query: str, session_id: str = "default") -> Dict[str, Any]:
+    def process(
+        self,
+        query: str,
+        session_id: str = "default",
+        namespaces: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """
         Main processing method
         
         Args:
             query: User query
             session_id: Session identifier
+            namespaces: Document namespaces the RAG agent should search
         
         Returns:
             Final response with answer and metadata
+        
+        Raises:
+            SessionBusyError: If the session already has a request in
+                progress and SESSION_LOCK_MODE rejects or the wait times out
         """
+        # One request per session at a time, so turns can't interleave
+        with memory_manager.session_lock(session_id):
+            return self._process(query, session_id, namespaces)
+    
+    def _process(
+        self,
+        query: str,
+        session_id: str,
+        namespaces: Optional[List[str]]
+    ) -> Dict[str, Any]:
+        """Route, run the agents and save the turn (session lock held)"""
         try:
             # Route to appropriate agent(s)
             routing = self.route_query(query, session_id)
@@ -102,11 +126,11 @@ Which agent(s) should handle this?"""
                 
                 # Call appropriate agent
                 if agent_name == 'RAG':
-                    result = agent.process(query)
+                    result = agent.process(query, namespaces=namespaces)
                 elif agent_name == 'SEARCH':
                     result = agent.process(query)
                 elif agent_name == 'CODE':
-                    result = agent.process(query)
+                    result = agent.process(query, session_id)
                 elif agent_name == 'TOOL':
                     result = agent.process(query)
                 elif agent_name == 'CHAT':
@@ -23,16 +23,62 @@ class Settings(BaseSettings):
     TEMPERATURE: float = 0.1
     
     # Vector Database
+    CHROMA_MODE: str = "embedded"  # "embedded" or "server"
     CHROMA_PERSIST_DIR: str = "./data/chroma_db"
+    CHROMA_SERVER_HOST: str = "127.0.0.1"
+    CHROMA_SERVER_PORT: int = 8001
+    CHROMA_HEALTHCHECK_INTERVAL_SECONDS: int = 30
     COLLECTION_NAME: str = "intelagent_docs"
+    DEFAULT_NAMESPACE: str = "default"
+    QUERY_FANOUT_WORKERS: int = 4
+    RETRIEVAL_CACHE_SIZE: int = 1024  # 0 disables the cache
+    SNAPSHOT_DIR: str = "./data/snapshots"
+    
+    # Vector index (applied when a collection is created)
+    CHROMA_DISTANCE: str = "l2"  # "l2", "cosine" or "ip"
+    HNSW_M: int = 16
+    HNSW_CONSTRUCTION_EF: int = 100
+    HNSW_SEARCH_EF: int = 10
     
     # File Storage
     UPLOAD_DIR: str = "./data/uploads"
     MAX_FILE_SIZE_MB: int = 50
+    MAX_BATCH_FILES: int = 20  # Files per /ingest/batch request
+    
+    # Ingestion jobs
+    INGEST_WORKERS: int = 2
+    INGEST_MAX_PENDING: int = 100
+    INGEST_JOB_DB: str = "./data/ingest_jobs.sqlite3"
+    INGEST_JOB_RETENTION: int = 1000
+    
+    # Document parsing
+    PARSE_WORKERS: int = max(1, (os.cpu_count() or 2) - 1)  # 0 parses in the job thread
+    PARSE_TIMEOUT_SECONDS: int = 300
+    PARSE_PAGES_PER_TASK: int = 16
+    
+    # Chunking
+    CHUNKER: str = "token"  # "token" or "character"
+    CHUNK_SIZE_TOKENS: int = 256
+    CHUNK_OVERLAP_TOKENS: int = 50
+    TABLE_CHUNK_CHARS: int = 1500  # XLSX/CSV rows grouped per chunk, by size
+    
+    # Near-duplicate chunks at ingest
+    DEDUP_MODE: str = "link"  # "off", "drop" or "link"
+    DEDUP_THRESHOLD: float = 0.90  # SimHash similarity (1 - differing bits / 64)
     
     # Code Execution
     CODE_TIMEOUT_SECONDS: int = 10
-    CODE_MAX_MEMORY_MB: int = 256
+    CODE_WORKERS: int = 2  # Warm worker processes (runs in parallel)
+    CODE_WORKER_MAX_RUNS: int = 50  # Runs before a worker is replaced
+    CODE_MAX_MEMORY_MB: int = 256  # Per worker, beyond its preloaded libraries
+    CODE_MAX_CPU_SECONDS: int = 8  # CPU time per run (below the timeout, so the worker survives)
+    CODE_MAX_OPEN_FILES: int = 64
+    CODE_MAX_FILE_MB: int = 16  # Largest file code may write
+    CODE_MAX_OUTPUT_KB: int = 256  # Captured output beyond this is cut
+    CODE_STATEFUL_SESSIONS: bool = False  # Per-session kernels keeping variables across turns
+    CODE_MAX_KERNELS: int = 8
+    CODE_KERNEL_IDLE_MINUTES: int = 15
+    CODE_KERNEL_MEMORY_MB: int = 1024  # Per kernel, beyond its preloaded libraries
     
     # API Settings
     API_HOST: str = "0.0.0.0"
@@ -43,7 +89,25 @@ class Settings(BaseSettings):
     LOG_FILE: str = "./logs/app.log"
     
     # Session
-    SESSION_TIMEOUT_MINUTES: int = 60
+    SESSION_TIMEOUT_MINUTES: int = 60  # Idle sessions are evicted after this (0 = never)
+    SESSION_MAX_COUNT: int = 10000
+    SESSION_MAX_MB: int = 256
+    SESSION_SWEEP_INTERVAL_SECONDS: int = 60
+    SESSION_BACKEND: str = "memory"  # "memory" (per process) or "sqlite" (shared, persistent)
+    SESSION_DB: str = "./data/sessions.sqlite3"
+    SESSION_CACHE_SIZE: int = 1000  # sqlite: sessions held in the read-through cache
+    SESSION_CONTEXT_TURNS: int = 20  # Recent turns kept preformatted per session
+    SESSION_CONTEXT_MAX_TOKENS: int = 1500  # Conversation history budget per prompt
+    SESSION_SUMMARY_ENABLED: bool = False  # Fold older turns into a rolling summary
+    SESSION_SUMMARY_TRIGGER_TOKENS: int = 1000  # Unsummarized history that triggers a summary
+    SESSION_SUMMARY_KEEP_TURNS: int = 2  # Newest turns always kept verbatim
+    SESSION_SUMMARY_MAX_WORDS: int = 200
+    SESSION_RECALL_ENABLED: bool = False  # Embed turns and recall relevant older ones
+    SESSION_RECALL_K: int = 3
+    SESSION_RECALL_MAX_TOKENS: int = 500  # Share of the context budget for recalled turns
+    SESSION_LOCK_MODE: str = "queue"  # Concurrent requests on a session: "queue", "reject" or "allow"
+    SESSION_LOCK_TIMEOUT_SECONDS: int = 120  # Longest queue wait (0 = no limit)
+    SESSION_LEASE_SECONDS: int = 600  # sqlite: a session lease not released by then is taken over
     
     class Config:
         env_file = ".env"
@@ -56,6 +120,7 @@ settings = Settings()
 # Create necessary directories
 Path(settings.CHROMA_PERSIST_DIR).mkdir(parents=True, exist_ok=True)
 Path(settings.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+Path(settings.SNAPSHOT_DIR).mkdir(parents=True, exist_ok=True)
 Path(settings.LOG_FILE).parent.mkdir(parents=True, exist_ok=True)
 
 # Validate OpenAI API key
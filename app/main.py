@@ -8,9 +8,13 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import chat, ingestion, health
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from app.config import settings
+from app.routers import chat, ingestion, health, admin
+from tools.code_executor import code_executor
 import logging
 
 # Configure logging
@@ -33,10 +37,94 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Upload endpoints: single-file ones, and the batch one
+SINGLE_UPLOAD_PATHS = ("/api/ingest", "/api/documents/")
+BATCH_UPLOAD_PATH = "/api/ingest/batch"
+# Allowance for multipart boundaries and form fields
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadSizeLimit:
+    """
+    Cap the body of upload requests as it is received
+    
+    The multipart body is spooled to disk in full before an endpoint runs,
+    so the cap has to be applied here. A declared Content-Length over the
+    limit is refused before anything is read; otherwise (including chunked
+    requests, which declare none) the body is counted as it arrives and the
+    request fails with 413 as soon as it passes the limit.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    @staticmethod
+    def _limit(scope) -> tuple:
+        """(max body bytes, max files) for an upload request, or (None, 0)"""
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            return None, 0
+        path = scope["path"]
+        if path == BATCH_UPLOAD_PATH:
+            max_files = settings.MAX_BATCH_FILES
+        elif path == SINGLE_UPLOAD_PATHS[0] or path.startswith(SINGLE_UPLOAD_PATHS[1]):
+            max_files = 1
+        else:
+            return None, 0
+        return max_files * (settings.MAX_FILE_SIZE_MB * 1024 * 1024 + MULTIPART_OVERHEAD_BYTES), max_files
+    
+    @staticmethod
+    def _too_large(max_files: int) -> HTTPException:
+        detail = f"File too large. Max: {settings.MAX_FILE_SIZE_MB}MB"
+        if max_files > 1:
+            detail = f"Upload too large. Max: {max_files} files of {settings.MAX_FILE_SIZE_MB}MB"
+        return HTTPException(status_code=413, detail=detail)
+    
+    async def __call__(self, scope, receive, send):
+        max_bytes, max_files = self._limit(scope)
+        if max_bytes is None:
+            return await self.app(scope, receive, send)
+        
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            error = self._too_large(max_files)
+            response = JSONResponse(status_code=error.status_code, content={"detail": error.detail})
+            return await response(scope, receive, send)
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Raised inside the endpoint's body parsing, which
+                    # passes HTTPExceptions through to the 413 response
+                    raise self._too_large(max_files)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+
+app.add_middleware(UploadSizeLimit)
+
+
+@app.on_event("startup")
+async def start_code_workers():
+    """Warm the code workers so the first code request doesn't wait on imports"""
+    code_executor.pool.start()
+
+
+@app.on_event("shutdown")
+async def stop_code_workers():
+    code_executor.shutdown()
+
+
 # Include routers
 app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(chat.router, prefix="/api", tags=["chat"])
 app.include_router(ingestion.router, prefix="/api", tags=["ingestion"])
+app.include_router(admin.router, prefix="/api", tags=["admin"])
 
 
 @app.get("/")
@@ -0,0 +1,115 @@
+"""
+Admin endpoints
+"""
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from app.config import settings
+from core.vectorstore import vector_manager
+
+router = APIRouter()
+
+SNAPSHOT_NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,99}$')
+
+
+class SnapshotExportRequest(BaseModel):
+    """Snapshot export request model"""
+    name: Optional[str] = None
+    namespace: Optional[str] = None
+
+
+class SnapshotImportRequest(BaseModel):
+    """Snapshot import request model"""
+    namespace: Optional[str] = None
+    allow_model_mismatch: bool = False
+
+
+def _snapshot_path(name: str) -> Path:
+    """Resolve a snapshot name inside SNAPSHOT_DIR"""
+    if not SNAPSHOT_NAME_PATTERN.match(name):
+        raise HTTPException(status_code=400, detail=f"Invalid snapshot name: {name}")
+    if not name.endswith(".tar"):
+        name = f"{name}.tar"
+    return Path(settings.SNAPSHOT_DIR) / name
+
+
+@router.get("/admin/snapshots")
+def list_snapshots():
+    """List snapshot bundles in SNAPSHOT_DIR"""
+    snapshots = [
+        {
+            "name": f.name,
+            "size_mb": round(f.stat().st_size / (1024 * 1024), 2)
+        }
+        for f in sorted(Path(settings.SNAPSHOT_DIR).glob("*.tar"))
+    ]
+    return {"snapshots": snapshots}
+
+
+@router.post("/admin/snapshots")
+def export_snapshot(request: SnapshotExportRequest):
+    """
+    Export a namespace to a snapshot bundle in SNAPSHOT_DIR
+    
+    Args:
+        request: Optional snapshot name and namespace
+    
+    Returns:
+        Snapshot manifest
+    """
+    try:
+        namespace = vector_manager.resolve_namespace(request.namespace)
+        name = request.name or f"{namespace}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+        path = _snapshot_path(name)
+        
+        result = vector_manager.export_snapshot(str(path), namespace=namespace)
+        return dict(result, name=path.name)
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/admin/snapshots/{name}")
+def download_snapshot(name: str):
+    """Download a snapshot bundle"""
+    path = _snapshot_path(name)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail=f"Snapshot not found: {name}")
+    return FileResponse(path, media_type="application/x-tar", filename=path.name)
+
+
+@router.post("/admin/snapshots/{name}/import")
+def import_snapshot(name: str, request: SnapshotImportRequest):
+    """
+    Import a snapshot bundle from SNAPSHOT_DIR
+    
+    Args:
+        name: Snapshot file name
+        request: Optional target namespace
+    
+    Returns:
+        Snapshot manifest with rows imported
+    """
+    path = _snapshot_path(name)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail=f"Snapshot not found: {name}")
+    
+    try:
+        return vector_manager.import_snapshot(
+            str(path),
+            namespace=request.namespace,
+            allow_model_mismatch=request.allow_model_mismatch
+        )
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
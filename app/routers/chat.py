@@ -2,10 +2,13 @@
 Chat endpoints
 """
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from agents.supervisor import supervisor
 from core.memory import memory_manager
+from core.session_lock import SessionBusyError
+from tools.code_executor import code_executor
 
 router = APIRouter()
 
@@ -14,6 +17,7 @@ class ChatRequest(BaseModel):
     """Chat request model"""
     query: str
     session_id: Optional[str] = "default"
+    namespaces: Optional[List[str]] = None
 
 
 class ChatResponse(BaseModel):
@@ -32,7 +36,8 @@ async def chat(request: ChatRequest):
     Process a chat query
     
     Args:
-        request: Chat request with query and session_id
+        request: Chat request with query, session_id and optional
+            document namespaces to search
     
     Returns:
         Chat response with answer and metadata
@@ -41,14 +46,23 @@ async def chat(request: ChatRequest):
         if not request.query or not request.query.strip():
             raise HTTPException(status_code=400, detail="Query cannot be empty")
         
-        # Process query through supervisor
-        result = supervisor.process(
-            query=request.query,
-            session_id=request.session_id
-        )
+        # Wait for the session's previous request here, in the event loop, so
+        # a queued request doesn't hold a threadpool thread
+        async with memory_manager.session_lock_async(request.session_id):
+            # Process query through supervisor, in the threadpool so requests
+            # on other sessions keep running while this one waits on the LLM
+            result = await run_in_threadpool(
+                supervisor.process,
+                query=request.query,
+                session_id=request.session_id,
+                namespaces=request.namespaces
+            )
         
         return ChatResponse(**result)
     
+    except SessionBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -89,3 +103,25 @@ async def clear_history(session_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.delete("/kernel/{session_id}")
+async def reset_kernel(session_id: str):
+    """Reset a session's Python kernel, dropping the variables its code defined"""
+    if code_executor.kernels is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Stateful code execution is disabled (CODE_STATEFUL_SESSIONS)"
+        )
+    
+    try:
+        reset = await run_in_threadpool(code_executor.reset_session, session_id)
+        
+        return {
+            "success": True,
+            "reset": reset,
+            "message": f"Kernel reset for session: {session_id}" if reset
+            else f"No kernel running for session: {session_id}"
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -3,6 +3,9 @@ Health check endpoints
 """
 from fastapi import APIRouter
 from core.vectorstore import vector_manager
+from core.jobs import ingestion_queue
+from core.memory import memory_manager
+from tools.code_executor import code_executor
 
 router = APIRouter()
 
@@ -21,10 +24,16 @@ async def get_status():
     """Get system status"""
     try:
         doc_count = vector_manager.get_document_count()
+        vector_store = vector_manager.health_check()
         
         return {
-            "status": "operational",
+            "status": "operational" if vector_store["healthy"] else "degraded",
             "documents_indexed": doc_count,
+            "vector_store": vector_store,
+            "retrieval_cache": vector_manager.retrieval_cache.stats(),
+            "ingestion": ingestion_queue.stats(),
+            "sessions": memory_manager.stats(),
+            "code_workers": code_executor.stats(),
             "agents": ["RAG", "SEARCH", "CODE", "TOOL", "CHAT"]
         }
     except Exception as e:
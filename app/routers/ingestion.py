@@ -1,107 +1,236 @@
 """
 Document ingestion endpoints
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from typing import List, Optional
 import os
+import hashlib
+import tempfile
 from pathlib import Path
 from app.config import settings
-from utils.document_loader import DocumentLoader
-from utils.chunking import default_chunker
 from core.vectorstore import vector_manager
+from core.jobs import ingestion_queue, QueueFullError
+from utils.document_loader import DocumentLoader
 
 router = APIRouter()
 
 
-@router.post("/ingest")
-async def ingest_document(file: UploadFile = File(...)):
+ALLOWED_EXTENSIONS = list(DocumentLoader.supported_extensions)
+
+# Bytes read from an upload per await
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def _validate_extension(filename: str):
+    """Reject unsupported file types"""
+    file_ext = Path(filename).suffix.lower()
+    
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {file_ext}. Allowed: {ALLOWED_EXTENSIONS}"
+        )
+
+
+def _resolve_namespace(namespace: Optional[str]) -> str:
+    """Validate a requested namespace"""
+    try:
+        return vector_manager.resolve_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _upload_dir(namespace: str) -> Path:
+    """Upload directory for a namespace (default namespace uses UPLOAD_DIR itself)"""
+    upload_dir = Path(settings.UPLOAD_DIR)
+    if namespace != vector_manager.default_namespace:
+        upload_dir = upload_dir / namespace
+        upload_dir.mkdir(parents=True, exist_ok=True)
+    return upload_dir
+
+
+def _upload_path(namespace: str, source: str) -> Path:
+    """
+    Where a source's uploaded file is kept
+    
+    Sources may be relative paths (bulk_ingest.py names them that way), so
+    the file can be in a subdirectory; a path that would land outside the
+    namespace's upload directory is rejected.
+    """
+    upload_dir = _upload_dir(namespace).resolve()
+    upload_path = (upload_dir / source).resolve()
+    if upload_path == upload_dir or not upload_path.is_relative_to(upload_dir):
+        raise HTTPException(status_code=400, detail=f"Invalid source name: {source}")
+    return upload_path
+
+
+async def _save_upload(file: UploadFile, filename: str, namespace: str) -> tuple:
+    """
+    Copy an uploaded file into its own file in the namespace's upload directory
+    
+    The upload is copied in UPLOAD_CHUNK_SIZE pieces to a new temp file,
+    hashed on the way; its ingestion job moves it over the stored copy once
+    done, so a second upload of the same source can't overwrite a file a
+    running job still reads. By now the request body has been received
+    (capped as it arrived by app.main.UploadSizeLimit); a file over
+    MAX_FILE_SIZE_MB is rejected as soon as the copy crosses the limit,
+    and memory use does not depend on the file size.
+    
+    Returns:
+        Tuple of (temp_path, file_size_mb, sha256 hex digest)
+    """
+    max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    upload_dir = _upload_dir(namespace)
+    
+    # Reject on the declared size before reading anything
+    declared_size = getattr(file, "size", None)
+    if declared_size is not None and declared_size > max_bytes:
+        raise _too_large(declared_size)
+    
+    digest = hashlib.sha256()
+    size = 0
+    # Keeps the extension, which picks the parser
+    fd, tmp_path = tempfile.mkstemp(dir=upload_dir, prefix=".upload-", suffix=Path(filename).suffix)
+    
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(size, partial=True)
+                digest.update(chunk)
+                f.write(chunk)
+    
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    return tmp_path, size / (1024 * 1024), digest.hexdigest()
+
+
+def _too_large(size: int, partial: bool = False) -> HTTPException:
+    """413 error for an upload over MAX_FILE_SIZE_MB"""
+    size_mb = size / (1024 * 1024)
+    qualifier = "over " if partial else ""
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large: {qualifier}{size_mb:.2f}MB. Max: {settings.MAX_FILE_SIZE_MB}MB"
+    )
+
+
+async def _enqueue_upload(
+    file: UploadFile,
+    namespace: str,
+    source: Optional[str] = None,
+    replace: bool = False
+) -> dict:
+    """
+    Save an upload and queue it for background ingestion
+    
+    Returns:
+        Job summary for a 202 response
     """
-    Ingest a document into the vector database
+    source = source or file.filename
+    _validate_extension(source)
+    upload_path = _upload_path(namespace, source)
+    upload_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path, file_size_mb, content_hash = await _save_upload(file, source, namespace)
+    
+    try:
+        job = ingestion_queue.submit(
+            tmp_path,
+            source=source,
+            namespace=namespace,
+            replace=replace,
+            cleanup_on_failure=True,
+            file_hash=content_hash,
+            final_path=str(upload_path)
+        )
+    except QueueFullError as e:
+        os.remove(tmp_path)
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return {
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/ingest/jobs/{job.id}",
+        "filename": source,
+        "namespace": namespace,
+        "file_size_mb": round(file_size_mb, 2),
+        "sha256": content_hash
+    }
+
+
+@router.post("/ingest", status_code=202)
+async def ingest_document(
+    file: UploadFile = File(...),
+    namespace: Optional[str] = Form(None)
+):
+    """
+    Queue a document for ingestion into the vector database
+    
+    Parsing, chunking, embedding and upserting run in the background;
+    poll the returned status_url for progress.
     
     Args:
-        file: Uploaded file (PDF, DOCX, TXT)
+        file: Uploaded file (PDF, DOCX, TXT, XLSX, CSV)
+        namespace: Target namespace (default namespace if omitted)
     
     Returns:
-        Status and metadata
+        Job ID and status URL
     """
+    namespace = _resolve_namespace(namespace)
+    
     try:
-        # Validate file type
-        allowed_extensions = ['.pdf', '.docx', '.doc', '.txt']
-        file_ext = Path(file.filename).suffix.lower()
-        
-        if file_ext not in allowed_extensions:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file type: {file_ext}. Allowed: {allowed_extensions}"
-            )
-        
-        # Save file temporarily
-        upload_path = Path(settings.UPLOAD_DIR) / file.filename
-        
-        with open(upload_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Check file size
-        file_size_mb = len(content) / (1024 * 1024)
-        if file_size_mb > settings.MAX_FILE_SIZE_MB:
-            os.remove(upload_path)
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large: {file_size_mb:.2f}MB. Max: {settings.MAX_FILE_SIZE_MB}MB"
-            )
-        
-        # Load document
-        documents = DocumentLoader.load_document(str(upload_path))
-        
-        # Chunk documents
-        chunks = default_chunker.chunk_documents(documents)
-        
-        # Add metadata
-        for chunk in chunks:
-            chunk.metadata['source'] = file.filename
-            if 'page' not in chunk.metadata:
-                chunk.metadata['page'] = 'N/A'
-        
-        # Add to vector store
-        ids = vector_manager.add_documents(chunks)
-        
-        return {
-            "success": True,
-            "filename": file.filename,
-            "file_size_mb": round(file_size_mb, 2),
-            "chunks_created": len(chunks),
-            "document_ids": ids[:5] + ['...'] if len(ids) > 5 else ids
-        }
+        return await _enqueue_upload(file, namespace)
     
     except HTTPException:
         raise
     except Exception as e:
-        if upload_path.exists():
-            os.remove(upload_path)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/ingest/batch")
-async def ingest_multiple_documents(files: List[UploadFile] = File(...)):
+@router.post("/ingest/batch", status_code=202)
+async def ingest_multiple_documents(
+    files: List[UploadFile] = File(...),
+    namespace: Optional[str] = Form(None)
+):
     """
-    Ingest multiple documents
+    Queue multiple documents for ingestion
     
     Args:
         files: List of uploaded files
+        namespace: Target namespace (default namespace if omitted)
     
     Returns:
-        Status for each file
+        Job for each accepted file, error for each rejected one
     """
+    namespace = _resolve_namespace(namespace)
+    if len(files) > settings.MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files: {len(files)}. Max: {settings.MAX_BATCH_FILES} per batch"
+        )
     results = []
     
     for file in files:
         try:
-            result = await ingest_document(file)
+            job = await _enqueue_upload(file, namespace)
             results.append({
                 "filename": file.filename,
                 "success": True,
-                "details": result
+                "details": job
+            })
+        except HTTPException as e:
+            results.append({
+                "filename": file.filename,
+                "success": False,
+                "error": e.detail
             })
         except Exception as e:
             results.append({
@@ -118,43 +247,135 @@ async def ingest_multiple_documents(files: List[UploadFile] = File(...)):
     }
 
 
+@router.get("/ingest/jobs")
+async def list_ingestion_jobs(limit: int = 50):
+    """List recent ingestion jobs, newest first"""
+    return {
+        "queue": ingestion_queue.stats(),
+        "jobs": ingestion_queue.list_jobs(limit)
+    }
+
+
+@router.get("/ingest/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Get an ingestion job's status and stage-level progress"""
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+
 @router.get("/documents")
-async def get_document_status():
-    """Get status of ingested documents"""
+async def get_document_status(namespace: Optional[str] = None):
+    """Get status of ingested documents in a namespace"""
+    namespace = _resolve_namespace(namespace)
+    
     try:
-        doc_count = vector_manager.get_document_count()
-        
-        # List uploaded files
-        upload_dir = Path(settings.UPLOAD_DIR)
-        uploaded_files = [f.name for f in upload_dir.iterdir() if f.is_file()]
+        doc_count = vector_manager.get_document_count([namespace])
+        sources = vector_manager.list_sources(namespace)
         
         return {
+            "namespace": namespace,
             "total_chunks": doc_count,
-            "uploaded_files": uploaded_files,
-            "file_count": len(uploaded_files)
+            "sources": sources,
+            "source_count": len(sources)
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/namespaces")
+async def list_namespaces():
+    """List document namespaces"""
+    try:
+        namespaces = vector_manager.list_namespaces()
+        
+        return {
+            "namespaces": namespaces,
+            "default": vector_manager.default_namespace
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/documents/{source:path}")
+async def delete_document(source: str, namespace: Optional[str] = None):
+    """Remove one source document's chunks from the vector database"""
+    namespace = _resolve_namespace(namespace)
+    upload_path = _upload_path(namespace, source)
+    
+    try:
+        if not vector_manager.has_source(source, namespace):
+            raise HTTPException(status_code=404, detail=f"Unknown source: {source}")
+        
+        deleted = vector_manager.delete_source(source, namespace)
+        
+        if upload_path.is_file():
+            os.remove(upload_path)
+        
+        return {
+            "success": True,
+            "source": source,
+            "namespace": namespace,
+            "chunks_deleted": deleted
         }
     
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/documents/{source:path}", status_code=202)
+async def replace_document(
+    source: str,
+    file: UploadFile = File(...),
+    namespace: Optional[str] = Form(None)
+):
+    """
+    Queue a new revision of one source document
+    
+    The source's old chunks stay searchable until the new ones are written.
+    
+    Args:
+        source: Name of the source document to replace (may contain '/')
+        file: Uploaded file with the new content
+        namespace: Namespace holding the document
+    
+    Returns:
+        Job ID and status URL
+    """
+    namespace = _resolve_namespace(namespace)
+    
+    try:
+        return await _enqueue_upload(file, namespace, source=source, replace=True)
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.delete("/documents")
-async def clear_all_documents():
-    """Clear all documents from vector database"""
+async def clear_all_documents(namespace: Optional[str] = None):
+    """Clear all documents in a namespace from vector database"""
+    namespace = _resolve_namespace(namespace)
+    
     try:
-        vector_manager.delete_collection()
+        vector_manager.delete_collection(namespace)
         
         # Optionally clear uploaded files
-        upload_dir = Path(settings.UPLOAD_DIR)
+        upload_dir = _upload_dir(namespace)
         for file in upload_dir.iterdir():
             if file.is_file():
                 os.remove(file)
         
         return {
             "success": True,
-            "message": "All documents cleared"
+            "message": f"All documents cleared from namespace '{namespace}'"
         }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
@@ -0,0 +1,114 @@
+"""
+Chunker throughput microbenchmark
+
+Usage:
+    python benchmarks/chunking.py [FILE ...] [--synthetic-mb 5] [--repeat 3]
+        [--chunk-size 256] [--chunk-overlap 50]
+
+Chunks the given documents (PDF, DOCX or TXT; a synthetic corpus when none
+are given) with the character-based TextChunker, the same recursive splitter
+measuring length in tokens, and the single-pass TokenChunker. Reports
+throughput (MB/s, chunks/s) and the token sizes of the chunks each one
+produces. Parsing happens once up front and is not timed.
+"""
+import sys
+import time
+import random
+import argparse
+import statistics
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from utils.document_loader import DocumentLoader
+from utils.chunking import TextChunker, TokenChunker
+
+
+def synthetic_pages(megabytes: float, seed: int = 0) -> List[Document]:
+    """Generate prose-like pages of roughly `megabytes` of text"""
+    rng = random.Random(seed)
+    words = (
+        "the vector index stores embeddings for every chunk of each document and "
+        "queries return the nearest neighbours ranked by distance while ingestion "
+        "parses pages splits them into chunks embeds batches and writes them"
+    ).split()
+
+    pages, size = [], 0
+    while size < megabytes * 1024 * 1024:
+        paragraphs = []
+        for _ in range(rng.randint(4, 8)):
+            sentences = [
+                " ".join(rng.choice(words) for _ in range(rng.randint(8, 25))).capitalize() + "."
+                for _ in range(rng.randint(3, 7))
+            ]
+            paragraphs.append(" ".join(sentences))
+        text = "\n\n".join(paragraphs)
+        pages.append(Document(page_content=text, metadata={"page": len(pages)}))
+        size += len(text.encode("utf-8"))
+    return pages
+
+
+def run(chunk_documents: Callable, pages: List[Document], repeat: int) -> Dict[str, Any]:
+    """Best-of-`repeat` wall time for chunking every page"""
+    best = float("inf")
+    chunks = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = chunk_documents(pages)
+        best = min(best, time.perf_counter() - start)
+    return {"seconds": best, "chunks": chunks}
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description="Chunker throughput microbenchmark")
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--synthetic-mb", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=256, help="TokenChunker size in tokens")
+    parser.add_argument("--chunk-overlap", type=int, default=50, help="TokenChunker overlap in tokens")
+    args = parser.parse_args()
+
+    if args.files:
+        pages = [page for path in args.files for page in DocumentLoader.iter_document(path)]
+    else:
+        pages = synthetic_pages(args.synthetic_mb)
+    megabytes = sum(len(page.page_content.encode("utf-8")) for page in pages) / (1024 * 1024)
+
+    token_chunker = TokenChunker(args.chunk_size, args.chunk_overlap)
+    # The recursive splitter measuring tokens re-tokenizes every candidate
+    # piece; it is what a token budget costs without precomputed offsets
+    recursive_tokens = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        length_function=token_chunker.count_tokens,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
+    chunkers = {
+        "character (RecursiveCharacterTextSplitter, 1000/200 chars)": TextChunker().chunk_documents,
+        f"recursive splitter measuring tokens ({args.chunk_size}/{args.chunk_overlap})": recursive_tokens.split_documents,
+        f"token, single pass ({args.chunk_size}/{args.chunk_overlap})": token_chunker.chunk_documents
+    }
+
+    print(f"{len(pages)} pages, {megabytes:.2f} MB, best of {args.repeat}\n")
+    for name, chunk_documents in chunkers.items():
+        result = run(chunk_documents, pages, args.repeat)
+        seconds = result["seconds"]
+        chunks = result["chunks"]
+        sizes = [token_chunker.count_tokens(chunk.page_content) for chunk in chunks] or [0]
+        print(name)
+        print(f"  {seconds:.3f}s  {megabytes / seconds:.2f} MB/s  {len(chunks) / seconds:.0f} chunks/s")
+        print(
+            f"  {len(chunks)} chunks, tokens per chunk: mean {statistics.mean(sizes):.0f}, "
+            f"max {max(sizes)}, min {min(sizes)}\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+HNSW recall-vs-latency tuning harness
+
+Usage:
+    python benchmarks/hnsw_tuning.py [--namespace NAME] [--k 10] [--queries 200]
+        [--m 8,16,32] [--construction-ef 64,100,200] [--search-ef 10,20,50,100]
+        [--space l2] [--max-vectors 50000] [--json results.json]
+
+Reads the vectors of a collection, holds out a random sample as queries and
+computes their exact top-k by brute force. For every (M, construction_ef)
+pair it builds an index with hnswlib, the library Chroma uses for its HNSW
+segments, and sweeps search_ef over it, reporting recall@k against the exact
+results and p50/p99 single-query latency. Chroma's own per-query overhead
+(metadata and document fetch) does not depend on these parameters, so it is
+measured once against the live collection for reference.
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import hnswlib
+import numpy as np
+from app.config import settings
+from core.vectorstore import vector_manager
+
+
+def load_vectors(namespace: str, max_vectors: int) -> np.ndarray:
+    """Read up to max_vectors embeddings from a namespace's collection"""
+    collection = vector_manager.get_collection(namespace)
+    total = min(collection.count(), max_vectors)
+    page_size = 1000
+
+    pages = []
+    for offset in range(0, total, page_size):
+        page = collection.get(
+            include=["embeddings"],
+            limit=min(page_size, total - offset),
+            offset=offset
+        )
+        pages.append(np.asarray(page['embeddings'], dtype=np.float32))
+
+    if not pages:
+        raise ValueError(f"Namespace '{namespace}' has no vectors")
+    return np.vstack(pages)
+
+
+def exact_top_k(index_vectors: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Brute-force nearest neighbours (row indices) for each query"""
+    if space == "cosine":
+        index_vectors = index_vectors / np.linalg.norm(index_vectors, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+    neighbours = []
+    for query in queries:
+        if space == "l2":
+            distances = np.sum((index_vectors - query) ** 2, axis=1)
+        else:
+            distances = -(index_vectors @ query)
+        top = np.argpartition(distances, k)[:k]
+        neighbours.append(top[np.argsort(distances[top])])
+    return np.asarray(neighbours)
+
+
+def percentile_ms(samples: List[float], pct: float) -> float:
+    return round(float(np.percentile(samples, pct)) * 1000, 3)
+
+
+def evaluate_grid(
+    index_vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    space: str,
+    m_values: List[int],
+    construction_efs: List[int],
+    search_efs: List[int]
+) -> List[Dict[str, Any]]:
+    """Measure recall@k and query latency for every parameter combination"""
+    truth = exact_top_k(index_vectors, queries, k, space)
+    labels = np.arange(len(index_vectors))
+    results = []
+
+    for m in m_values:
+        for construction_ef in construction_efs:
+            index = hnswlib.Index(space=space, dim=index_vectors.shape[1])
+            build_start = time.perf_counter()
+            index.init_index(max_elements=len(index_vectors), ef_construction=construction_ef, M=m)
+            index.add_items(index_vectors, labels)
+            build_seconds = time.perf_counter() - build_start
+
+            for search_ef in search_efs:
+                index.set_ef(max(search_ef, k))
+                latencies = []
+                hits = 0
+                for query, expected in zip(queries, truth):
+                    start = time.perf_counter()
+                    found, _ = index.knn_query(query, k=k)
+                    latencies.append(time.perf_counter() - start)
+                    hits += len(set(found[0]) & set(expected))
+
+                row = {
+                    "M": m,
+                    "construction_ef": construction_ef,
+                    "search_ef": search_ef,
+                    f"recall@{k}": round(hits / (len(queries) * k), 4),
+                    "p50_ms": percentile_ms(latencies, 50),
+                    "p99_ms": percentile_ms(latencies, 99),
+                    "build_s": round(build_seconds, 2)
+                }
+                results.append(row)
+                print(
+                    f"M={m:<3} construction_ef={construction_ef:<4} search_ef={search_ef:<4} "
+                    f"recall@{k}={row[f'recall@{k}']:.4f} p50={row['p50_ms']}ms "
+                    f"p99={row['p99_ms']}ms build={row['build_s']}s",
+                    flush=True
+                )
+
+    return results
+
+
+def chroma_query_latency(namespace: str, queries: np.ndarray, k: int) -> Dict[str, float]:
+    """p50/p99 latency of full Chroma queries against the live collection"""
+    collection = vector_manager.get_collection(namespace)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append(time.perf_counter() - start)
+    return {"p50_ms": percentile_ms(latencies, 50), "p99_ms": percentile_ms(latencies, 99)}
+
+
+def parse_ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    """Run the tuning harness"""
+    parser = argparse.ArgumentParser(description="HNSW recall-vs-latency tuning harness")
+    parser.add_argument("--namespace", default=None)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--m", type=parse_ints, default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=parse_ints, default=[64, 100, 200])
+    parser.add_argument("--search-ef", type=parse_ints, default=[10, 20, 50, 100])
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], default=None)
+    parser.add_argument("--max-vectors", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    args = parser.parse_args()
+
+    namespace = vector_manager.resolve_namespace(args.namespace)
+    collection = vector_manager.get_collection(namespace)
+    space = args.space or (collection.metadata or {}).get("hnsw:space", settings.CHROMA_DISTANCE)
+
+    vectors = load_vectors(namespace, args.max_vectors)
+    if len(vectors) <= args.queries + args.k:
+        raise SystemExit(f"Need more than {args.queries + args.k} vectors, found {len(vectors)}")
+
+    # Hold out queries so they are not trivially their own nearest neighbour
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(vectors))
+    queries = vectors[order[:args.queries]]
+    index_vectors = vectors[order[args.queries:]]
+
+    print(
+        f"Namespace '{namespace}': {len(index_vectors)} vectors x {vectors.shape[1]} dims, "
+        f"{len(queries)} queries, space={space}, k={args.k}\n"
+    )
+
+    results = evaluate_grid(
+        index_vectors,
+        queries,
+        args.k,
+        space,
+        args.m,
+        args.construction_ef,
+        args.search_ef
+    )
+    baseline = chroma_query_latency(namespace, queries, args.k)
+    print(f"\nLive Chroma query (current settings): p50={baseline['p50_ms']}ms p99={baseline['p99_ms']}ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "namespace": namespace,
+                    "space": space,
+                    "k": args.k,
+                    "vectors": len(index_vectors),
+                    "queries": len(queries),
+                    "chroma_baseline": baseline,
+                    "results": results
+                },
+                f,
+                indent=2
+            )
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
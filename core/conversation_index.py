@@ -0,0 +1,68 @@
+"""
+Embedding index of past conversation turns
+"""
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from core.embeddings import embedding_manager
+from core.vectorstore import vector_manager
+from core.session_store import format_turn
+
+
+class ConversationIndex:
+    """
+    Long-term conversation memory: past turns recalled by relevance
+
+    Each turn is embedded with the EmbeddingManager in a background thread
+    and stored in the vector store's memory collection, tagged with its
+    session; searches only ever see the asking session's turns. Turns of
+    cleared or evicted sessions are deleted in the same background thread,
+    so they can't be re-added after their deletion.
+    """
+
+    # Longest text embedded per turn (the stored text is not cut)
+    embed_max_chars = 8000
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-index")
+
+    def add_turn(self, session_id: str, human_msg: str, ai_msg: str):
+        """Embed and store a turn in the background"""
+        self._executor.submit(self._index_turn, session_id, format_turn(human_msg, ai_msg))
+
+    def _index_turn(self, session_id: str, text: str):
+        try:
+            embedding = embedding_manager.get_embeddings().embed_documents([text[:self.embed_max_chars]])[0]
+            vector_manager.add_memory_turns(
+                [uuid.uuid4().hex],
+                [text],
+                [embedding],
+                [{"session_id": session_id, "created_at": time.time()}]
+            )
+        except Exception as e:
+            print(f"[Memory][ERROR] Indexing a turn of session {session_id} failed: {type(e).__name__}: {e}")
+
+    def search(self, session_id: str, query: str, k: int) -> List[str]:
+        """
+        A session's past turns most relevant to a query
+
+        Returns:
+            Up to k formatted turns, most relevant first
+        """
+        embedding = embedding_manager.get_embeddings().embed_query(query)
+        results = vector_manager.search_memory(embedding, k, {"session_id": session_id})
+        return [text for text, _, _ in results]
+
+    def forget(self, session_ids: List[str]):
+        """Delete every turn of these sessions, in the background"""
+        self._executor.submit(self._delete_sessions, list(session_ids))
+
+    def _delete_sessions(self, session_ids: List[str]):
+        try:
+            vector_manager.delete_memory({"session_id": {"$in": session_ids}})
+        except Exception as e:
+            print(f"[Memory][ERROR] Deleting indexed turns failed: {type(e).__name__}: {e}")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
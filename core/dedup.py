@@ -0,0 +1,163 @@
+"""
+Near-duplicate chunk detection with SimHash
+"""
+import re
+import math
+import hashlib
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FINGERPRINT_BITS = 64
+
+# Chunks with fewer words than this are never treated as duplicates;
+# their fingerprints are too coarse to compare
+MIN_WORDS = 8
+
+# Words per shingle
+SHINGLE_SIZE = 2
+
+# Band index layout: most bands stored per fingerprint, and the band width
+# past which wider bands are not worth more bands
+MAX_BANDS = 32
+BAND_TARGET_BITS = 32
+
+_word_pattern = re.compile(r"\w+")
+
+
+def simhash(text: str) -> Optional[int]:
+    """
+    64-bit SimHash of a text's word shingles
+
+    Near-identical texts get fingerprints that differ in only a few bits.
+
+    Returns:
+        The fingerprint, or None if the text is too short to fingerprint
+    """
+    words = _word_pattern.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    digests = b"".join(
+        hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles
+    )
+    # One row of 64 bits per shingle; each output bit is the majority vote
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    votes = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(votes).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def max_distance_for(threshold: float) -> int:
+    """Largest Hamming distance that still counts as `threshold` similar"""
+    return int((1.0 - threshold) * FINGERPRINT_BITS)
+
+
+def lsh_layout(max_distance: int) -> Tuple[int, int]:
+    """
+    (blocks, blocks per band) for fingerprints compared within max_distance
+
+    The fingerprint is cut into `blocks` equal blocks and each band joins a
+    different combination of `blocks - max_distance` of them. Two
+    fingerprints within max_distance bits differ in at most that many
+    blocks, so they share at least one band exactly.
+
+    More blocks make wider bands, so a lookup matches fewer unrelated
+    fingerprints, at the cost of more bands per fingerprint. The first
+    layout with bands of BAND_TARGET_BITS is used, or else the widest one
+    with at most MAX_BANDS bands.
+    """
+    best = None
+    for blocks in range(max_distance + 1, FINGERPRINT_BITS + 1):
+        per_band = blocks - max_distance
+        if math.comb(blocks, per_band) > MAX_BANDS:
+            break
+        width = per_band * (FINGERPRINT_BITS // blocks)
+        # Band values must fit in a signed 64-bit integer
+        if width >= FINGERPRINT_BITS:
+            continue
+        if best is None or width > best[0]:
+            best = (width, blocks, per_band)
+        if width >= BAND_TARGET_BITS:
+            break
+    return best[1], best[2]
+
+
+@lru_cache(maxsize=None)
+def _band_combinations(max_distance: int) -> Tuple[int, int, Tuple[Tuple[int, ...], ...]]:
+    """Block width, block count and the block combination of each band"""
+    blocks, per_band = lsh_layout(max_distance)
+    return FINGERPRINT_BITS // blocks, blocks, tuple(combinations(range(blocks), per_band))
+
+
+def lsh_bands(fingerprint: int, max_distance: int) -> List[int]:
+    """
+    Band values of a fingerprint (see lsh_layout)
+
+    Candidates are found by equality lookups on the bands.
+    """
+    block_bits, block_count, band_blocks = _band_combinations(max_distance)
+    mask = (1 << block_bits) - 1
+    blocks = [(fingerprint >> (i * block_bits)) & mask for i in range(block_count)]
+    bands = []
+    for combination in band_blocks:
+        value = 0
+        for block in combination:
+            value = (value << block_bits) | blocks[block]
+        bands.append(value)
+    return bands
+
+
+def to_hex(fingerprint: int) -> str:
+    return f"{fingerprint:016x}"
+
+
+def from_hex(value: str) -> int:
+    return int(value, 16)
+
+
+class NearDuplicateFilter:
+    """
+    Decides, chunk by chunk, whether a document's chunk is a near-duplicate
+
+    Chunks are compared with the namespace's other sources (through the
+    registry's fingerprint index) and with the chunks already accepted
+    from the same document.
+    """
+
+    def __init__(self, registry, source: str, threshold: float):
+        self.registry = registry
+        self.source = source
+        self.max_distance = max_distance_for(threshold)
+        # band (index, value) -> [(fingerprint, content_hash)] accepted from this document
+        self._local: Dict[Tuple[int, int], List[Tuple[int, str]]] = {}
+
+    def check(self, fingerprint: Optional[int]) -> Optional[str]:
+        """
+        Content hash of the chunk this fingerprint nearly duplicates, if any
+        """
+        if fingerprint is None:
+            return None
+
+        bands = lsh_bands(fingerprint, self.max_distance)
+        for key in enumerate(bands):
+            for other, content_hash in self._local.get(key, ()):
+                if hamming(fingerprint, other) <= self.max_distance:
+                    return content_hash
+
+        return self.registry.find_near_duplicate(
+            fingerprint, bands, self.max_distance, exclude_source=self.source
+        )
+
+    def accept(self, fingerprint: Optional[int], content_hash: str):
+        """Remember a chunk that will be stored"""
+        if fingerprint is None:
+            return
+        for key in enumerate(lsh_bands(fingerprint, self.max_distance)):
+            self._local.setdefault(key, []).append((fingerprint, content_hash))
@@ -0,0 +1,177 @@
+"""
+Document ingestion pipeline: parse -> chunk -> embed -> upsert
+
+The stages are chained generators, so a document streams through in
+embedding-batch-sized pieces instead of being materialised at each step.
+Re-ingesting a source is incremental: an unchanged file is skipped, and for
+a changed one only added chunks are embedded and only removed ones deleted.
+Ingests of the same source run one at a time.
+"""
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Callable, Tuple
+from pathlib import Path
+from utils.chunking import default_chunker, TokenChunker
+from utils.document_loader import DocumentLoader
+from core.parsing import parsing_pool
+from core.vectorstore import vector_manager
+
+
+# Counts tokens of spreadsheet chunks, which skip the chunker
+_token_counter = TokenChunker()
+
+# (namespace, source) -> [lock, ingests holding or waiting for it]
+_source_locks: Dict[Tuple[str, str], List[Any]] = {}
+_source_locks_guard = threading.Lock()
+
+
+@contextmanager
+def source_lock(source: str, namespace: Optional[str] = None) -> Iterator[None]:
+    """
+    Hold a source's ingest lock, so two revisions can't be written at once
+
+    Re-entrant, so a caller can hold it around ingest_file() and whatever it
+    does with the file afterwards.
+    """
+    key = (vector_manager.resolve_namespace(namespace), source)
+    with _source_locks_guard:
+        entry = _source_locks.setdefault(key, [threading.RLock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _source_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _source_locks[key]
+
+
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def ingest_file(
+    file_path: str,
+    source: Optional[str] = None,
+    namespace: Optional[str] = None,
+    progress: Optional[Callable[[str, int], None]] = None,
+    file_hash: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Ingest one document into the vector database
+
+    A source that is already in the namespace is updated in place: if the
+    file matches the one it was last ingested from nothing is done,
+    otherwise only the chunks that changed are embedded or deleted. An
+    ingest of a source that is already being ingested waits for it.
+
+    Args:
+        file_path: Path of the document on disk
+        source: Name recorded as the chunks' source (defaults to the file name)
+        namespace: Target namespace (default namespace if None)
+        progress: Called as progress(counter, value) for "pages_parsed",
+            "chunks_created", "chunks_reused", "chunks_duplicate",
+            "chunks_embedded" and "chunks_written"
+        file_hash: SHA-256 of the file, if already known (computed otherwise)
+
+    Returns:
+        Ingestion summary ("tokens" counts chunk tokens when the chunker
+        records token_count, and is 0 otherwise)
+    """
+    source = source or Path(file_path).name
+    namespace = vector_manager.resolve_namespace(namespace)
+    file_hash = file_hash or file_sha256(file_path)
+
+    with source_lock(source, namespace):
+        return _ingest(file_path, source, namespace, progress, file_hash)
+
+
+def _ingest(
+    file_path: str,
+    source: str,
+    namespace: str,
+    progress: Optional[Callable[[str, int], None]],
+    file_hash: str
+) -> Dict[str, Any]:
+    """ingest_file() body, with the source's lock held"""
+    if vector_manager.get_file_hash(source, namespace) == file_hash:
+        existing = len(vector_manager.get_registry(namespace).get_ids(source))
+        print(f"[Ingest] {source} is unchanged, skipping")
+        return {
+            "source": source,
+            "namespace": namespace,
+            "status": "unchanged",
+            "pages": 0,
+            "chunks_created": existing,
+            "tokens": 0,
+            "chunks_new": 0,
+            "chunks_reused": existing,
+            "chunks_duplicate": 0,
+            "dedup_ratio": 0.0,
+            "chunks_deleted": 0,
+            "document_ids": []
+        }
+
+    counts = {"pages": 0, "chunks": 0, "tokens": 0}
+
+    def pages():
+        for page in parsing_pool.iter_document(file_path):
+            counts["pages"] += 1
+            if progress:
+                progress("pages_parsed", counts["pages"])
+            yield page
+
+    def row_groups(documents):
+        for document in documents:
+            document.metadata['token_count'] = _token_counter.count_tokens(document.page_content)
+            yield document
+
+    # Spreadsheet row groups are already chunk-sized
+    if DocumentLoader.is_tabular(file_path):
+        split = row_groups
+    else:
+        split = default_chunker.iter_chunks
+
+    def chunks():
+        for chunk in split(pages()):
+            chunk.metadata['source'] = source
+            if 'page' not in chunk.metadata:
+                chunk.metadata['page'] = 'N/A'
+            counts["chunks"] += 1
+            counts["tokens"] += chunk.metadata.get('token_count', 0)
+            if progress:
+                progress("chunks_created", counts["chunks"])
+            yield chunk
+
+    # Pages -> chunks -> embedding batches -> upserts, one batch in memory at a time
+    existed = vector_manager.has_source(source, namespace)
+    update = vector_manager.replace_source(
+        source,
+        chunks(),
+        namespace,
+        progress=progress,
+        file_hash=file_hash
+    )
+    ids = update["ids"]
+
+    return {
+        "source": source,
+        "namespace": namespace,
+        "status": "updated" if existed else "added",
+        "pages": counts["pages"],
+        "chunks_created": counts["chunks"],
+        "tokens": counts["tokens"],
+        "chunks_new": update["added"],
+        "chunks_reused": update["reused"],
+        "chunks_duplicate": update["duplicates"],
+        "dedup_ratio": round(update["duplicates"] / counts["chunks"], 4) if counts["chunks"] else 0.0,
+        "chunks_deleted": update["deleted"],
+        "document_ids": ids[:5] + ['...'] if len(ids) > 5 else ids
+    }
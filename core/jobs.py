@@ -0,0 +1,368 @@
+"""
+Background ingestion job queue
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import traceback
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from app.config import settings
+from core.ingestion import ingest_file, source_lock
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue has no room for another job"""
+    pass
+
+
+class IngestionJob:
+    """One queued document ingestion and its stage-level progress"""
+
+    # Progress counter -> pipeline stage it belongs to
+    STAGES = {
+        "pages_parsed": "parsing",
+        "chunks_created": "chunking",
+        "chunks_reused": "embedding",
+        "chunks_duplicate": "embedding",
+        "chunks_embedded": "embedding",
+        "chunks_written": "writing"
+    }
+
+    def __init__(
+        self,
+        file_path: str,
+        source: str,
+        namespace: Optional[str],
+        replace: bool = False,
+        cleanup_on_failure: bool = False,
+        file_hash: Optional[str] = None,
+        final_path: Optional[str] = None
+    ):
+        self.id = uuid.uuid4().hex
+        self.file_path = file_path
+        self.source = source
+        self.namespace = namespace
+        self.replace = replace
+        self.file_hash = file_hash
+        self.cleanup_on_failure = cleanup_on_failure
+        self.final_path = final_path
+
+        self.status = "queued"
+        self.stage = "queued"
+        self.progress = {counter: 0 for counter in self.STAGES}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serialisable job status"""
+        return {
+            "job_id": self.id,
+            "source": self.source,
+            "namespace": self.namespace,
+            "replace": self.replace,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    """Whether another process with this PID is running"""
+    if not pid or pid == os.getpid() or os.name == "nt":
+        # On Windows signal 0 would terminate the process, not probe it
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore:
+    """
+    SQLite-backed job status table
+
+    Shared by every worker process, so a status request can be answered by
+    a different worker than the one running the job. Each row records the
+    PID of the worker that owns the job, so jobs orphaned by a worker that
+    died can be told apart from jobs another live worker is running.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    created_at TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )"""
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "worker_pid" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN worker_pid INTEGER")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def save(self, job: IngestionJob):
+        """Insert or update a job's status"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, created_at, data, worker_pid) VALUES (?, ?, ?, ?)",
+                (job.id, job.created_at, json.dumps(job.to_dict()), os.getpid())
+            )
+            conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._get_conn().execute(
+                "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs first"""
+        with self._lock:
+            rows = self._get_conn().execute(
+                "SELECT data FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def fail_interrupted(self) -> int:
+        """
+        Mark jobs left queued or running by a worker that is gone as failed
+
+        Returns:
+            Number of jobs marked failed
+        """
+        with self._lock:
+            conn = self._get_conn()
+            rows = conn.execute(
+                """SELECT job_id, worker_pid, data FROM jobs
+                   WHERE json_extract(data, '$.status') IN ('queued', 'running')"""
+            ).fetchall()
+            interrupted = []
+            for job_id, worker_pid, data in rows:
+                if _process_alive(worker_pid):
+                    continue
+                job = json.loads(data)
+                job["status"] = "failed"
+                job["error"] = "Interrupted by restart"
+                job["finished_at"] = datetime.utcnow().isoformat()
+                interrupted.append((json.dumps(job), job_id))
+            conn.executemany("UPDATE jobs SET data = ? WHERE job_id = ?", interrupted)
+            conn.commit()
+        return len(interrupted)
+
+    def prune(self, keep: int):
+        """Drop all but the newest `keep` jobs"""
+        with self._lock:
+            conn = self._get_conn()
+            # Everything older than the keep-th newest, found on the index
+            conn.execute(
+                """DELETE FROM jobs WHERE created_at < (
+                    SELECT created_at FROM jobs ORDER BY created_at DESC LIMIT 1 OFFSET ?
+                )""",
+                (max(keep - 1, 0),)
+            )
+            conn.commit()
+
+
+class IngestionJobQueue:
+    """
+    Runs ingestion jobs on a bounded pool of background workers
+
+    Jobs don't survive a restart: on startup, jobs that a dead worker left
+    queued or running are marked failed, so their status doesn't stay
+    "running" for good.
+    """
+
+    # Minimum seconds between progress writes to the job store
+    progress_save_interval = 0.5
+    # Old jobs are pruned from the store once every this many finished jobs
+    prune_every = 50
+
+    def __init__(self):
+        self.max_pending = settings.INGEST_MAX_PENDING
+        self.store = JobStore(settings.INGEST_JOB_DB)
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.INGEST_WORKERS,
+            thread_name_prefix="ingest"
+        )
+        self._active: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+        self._finished = 0
+
+        interrupted = self.store.fail_interrupted()
+        if interrupted:
+            print(f"[Ingest][WARN] Marked {interrupted} jobs interrupted by a restart as failed")
+        self.store.prune(settings.INGEST_JOB_RETENTION)
+
+    def submit(
+        self,
+        file_path: str,
+        source: Optional[str] = None,
+        namespace: Optional[str] = None,
+        replace: bool = False,
+        cleanup_on_failure: bool = False,
+        file_hash: Optional[str] = None,
+        final_path: Optional[str] = None
+    ) -> IngestionJob:
+        """
+        Queue a saved file for ingestion
+
+        Args:
+            file_path: Path of the document on disk
+            source: Name recorded as the chunks' source (defaults to the file name)
+            namespace: Target namespace
+            replace: Job is a new revision of an existing source (recorded in its status)
+            cleanup_on_failure: Delete file_path if ingestion fails
+            file_hash: SHA-256 of the file, if already computed
+            final_path: Move file_path here once it is ingested (so a job
+                can read its own copy of an upload while an earlier
+                revision's job still reads the stored file)
+
+        Returns:
+            The queued job
+
+        Raises:
+            QueueFullError: If INGEST_MAX_PENDING jobs are already waiting or running
+        """
+        job = IngestionJob(
+            file_path,
+            source or Path(file_path).name,
+            namespace,
+            replace=replace,
+            cleanup_on_failure=cleanup_on_failure,
+            file_hash=file_hash,
+            final_path=final_path
+        )
+
+        with self._lock:
+            if len(self._active) >= self.max_pending:
+                raise QueueFullError(
+                    f"Ingestion queue is full ({self.max_pending} jobs pending)"
+                )
+            self._active[job.id] = job
+
+        self.store.save(job)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current status of a job, whichever worker is running it"""
+        with self._lock:
+            job = self._active.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.store.get(job_id)
+
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs first"""
+        return self.store.list(limit)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            running = sum(1 for job in self._active.values() if job.status == "running")
+            return {
+                "pending": len(self._active) - running,
+                "running": running,
+                "max_pending": self.max_pending,
+                "workers": settings.INGEST_WORKERS
+            }
+
+    def _run(self, job: IngestionJob):
+        """Worker body: run the pipeline and record progress"""
+        job.status = "running"
+        job.stage = "parsing"
+        job.started_at = datetime.utcnow().isoformat()
+        self.store.save(job)
+
+        last_save = [time.monotonic()]
+
+        stage_order = list(IngestionJob.STAGES.values())
+
+        def progress(counter: str, value: int):
+            job.progress[counter] = value
+            # Stages overlap while a document streams through the pipeline;
+            # report the furthest one reached
+            stage = IngestionJob.STAGES.get(counter, job.stage)
+            stage_changed = (
+                stage in stage_order
+                and stage_order.index(stage) > stage_order.index(job.stage)
+            )
+            if stage_changed:
+                job.stage = stage
+            now = time.monotonic()
+            if stage_changed or now - last_save[0] >= self.progress_save_interval:
+                last_save[0] = now
+                self.store.save(job)
+
+        try:
+            # Jobs for the same source run one at a time, and the stored file
+            # is replaced in the same order as the chunks
+            with source_lock(job.source, job.namespace):
+                job.result = ingest_file(
+                    job.file_path,
+                    source=job.source,
+                    namespace=job.namespace,
+                    progress=progress,
+                    file_hash=job.file_hash
+                )
+                if job.final_path:
+                    os.replace(job.file_path, job.final_path)
+            job.namespace = job.result["namespace"]
+            job.status = "completed"
+            job.stage = "done"
+
+        except Exception as e:
+            print(f"[Ingest][ERROR] Job {job.id} ({job.source}) failed: {type(e).__name__}: {e}")
+            traceback.print_exc()
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+            if job.cleanup_on_failure and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+
+        finally:
+            job.finished_at = datetime.utcnow().isoformat()
+            self.store.save(job)
+            with self._lock:
+                self._active.pop(job.id, None)
+                self._finished += 1
+                prune = self._finished % self.prune_every == 0
+            if prune:
+                self.store.prune(settings.INGEST_JOB_RETENTION)
+
+
+# Global instance
+ingestion_queue = IngestionJobQueue()
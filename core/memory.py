@@ -1,59 +1,343 @@
 """
 Conversation memory management
 """
-from typing import List, Dict, Any
+import threading
+from contextlib import AbstractAsyncContextManager, AbstractContextManager
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from langchain.memory import ConversationBufferMemory
 from langchain.schema import BaseMessage, HumanMessage, AIMessage
+from app.config import settings
+from core.llm import llm_manager
+from core.conversation_index import ConversationIndex
+from core.session_lock import SessionLockManager, SessionLease
+from core.session_store import (
+    SessionStore, ContextEntry, create_session_store, format_turn, count_tokens
+)
+from utils.prompts import CONVERSATION_SUMMARY_PROMPT
 
 
 class MemoryManager:
-    """Manages conversation history and memory"""
+    """
+    Manages conversation history and memory
     
-    def __init__(self):
-        self.sessions: Dict[str, ConversationBufferMemory] = {}
+    Turns are kept by a pluggable session backend (SESSION_BACKEND): in
+    this process ("memory") or in a SQLite database shared by every worker
+    and kept across restarts ("sqlite"). Sessions are evicted when idle
+    for longer than SESSION_TIMEOUT_MINUTES, or least recently used first
+    beyond SESSION_MAX_COUNT sessions or SESSION_MAX_MB of messages. A
+    background thread sweeps idle sessions.
     
-    def get_session_memory(self, session_id: str) -> ConversationBufferMemory:
-        """Get or create memory for a session"""
-        if session_id not in self.sessions:
-            self.sessions[session_id] = ConversationBufferMemory(
-                return_messages=True,
-                memory_key="chat_history"
+    With SESSION_SUMMARY_ENABLED, once a session's turns not yet summarized
+    pass SESSION_SUMMARY_TRIGGER_TOKENS, all but the newest
+    SESSION_SUMMARY_KEEP_TURNS of them are folded into a rolling summary in
+    the background. get_prompt_context() then returns the summary plus the
+    turns since, so prompts stay roughly the same size however long the
+    conversation gets.
+    
+    With SESSION_RECALL_ENABLED every turn is also embedded into the vector
+    store, and get_prompt_context() adds the session's past turns most
+    relevant to the current query.
+    
+    session_lock() serializes the requests of a session (SESSION_LOCK_MODE)
+    so their turns can't interleave; with the sqlite backend, across every
+    worker sharing the database.
+    """
+    
+    def __init__(self, store: Optional[SessionStore] = None):
+        self.store = store or create_session_store()
+        # With the shared sqlite backend, a session is held across workers too
+        lease = None
+        if settings.SESSION_BACKEND == "sqlite" and settings.SESSION_LOCK_MODE != "allow":
+            lease = SessionLease(settings.SESSION_DB, settings.SESSION_LEASE_SECONDS)
+        self.locks = SessionLockManager(
+            settings.SESSION_LOCK_MODE,
+            settings.SESSION_LOCK_TIMEOUT_SECONDS,
+            lease=lease
+        )
+        
+        self.summaries_enabled = settings.SESSION_SUMMARY_ENABLED
+        self._summary_executor = None
+        self._summarizing = set()
+        self._summary_lock = threading.Lock()
+        if self.summaries_enabled:
+            self._summary_executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix="session-summary"
             )
-        return self.sessions[session_id]
+        
+        self.index = None
+        if settings.SESSION_RECALL_ENABLED:
+            self.index = ConversationIndex()
+            self.store.on_remove = self.index.forget
+        
+        self._stop = threading.Event()
+        self._sweeper = threading.Thread(
+            target=self._sweep_loop,
+            name="session-sweeper",
+            daemon=True
+        )
+        self._sweeper.start()
+    
+    def sweep(self) -> int:
+        """
+        Evict every idle session
+        
+        Returns:
+            Number of sessions evicted
+        """
+        if self.locks.lease is not None:
+            self.locks.lease.sweep()
+        return self.store.sweep()
+    
+    def _sweep_loop(self):
+        interval = max(1, settings.SESSION_SWEEP_INTERVAL_SECONDS)
+        while not self._stop.wait(interval):
+            try:
+                evicted = self.sweep()
+                if evicted:
+                    print(f"[Memory] Evicted {evicted} sessions")
+            except Exception as e:
+                print(f"[Memory][ERROR] Session sweep failed: {type(e).__name__}: {e}")
+    
+    def session_lock(self, session_id: str) -> AbstractContextManager:
+        """
+        Context manager held for the whole of a request on a session
+        
+        Raises:
+            SessionBusyError: If the session is busy and the lock mode
+                rejects, or the queue wait times out
+        """
+        return self.locks.hold(session_id)
+    
+    def session_lock_async(self, session_id: str) -> AbstractAsyncContextManager:
+        """
+        session_lock() for async routes: waits in the event loop, not on a
+        threadpool thread
+        
+        Raises:
+            SessionBusyError: If the session is busy and the lock mode
+                rejects, or the queue wait times out
+        """
+        return self.locks.hold_async(session_id)
+    
+    def get_session_memory(self, session_id: str) -> ConversationBufferMemory:
+        """Get a LangChain memory loaded with the session's history (a copy)"""
+        memory = ConversationBufferMemory(
+            return_messages=True,
+            memory_key="chat_history"
+        )
+        memory.chat_memory.add_messages(self.get_history(session_id))
+        return memory
     
     def add_message(self, session_id: str, human_msg: str, ai_msg: str):
         """Add a conversation turn to memory"""
-        memory = self.get_session_memory(session_id)
-        memory.chat_memory.add_user_message(human_msg)
-        memory.chat_memory.add_ai_message(ai_msg)
+        pending_tokens = self.store.append(session_id, human_msg, ai_msg)
+        if self.summaries_enabled and pending_tokens >= settings.SESSION_SUMMARY_TRIGGER_TOKENS:
+            self._schedule_summary(session_id)
+        if self.index is not None:
+            self.index.add_turn(session_id, human_msg, ai_msg)
     
     def get_history(self, session_id: str) -> List[BaseMessage]:
         """Get conversation history"""
-        memory = self.get_session_memory(session_id)
-        return memory.chat_memory.messages
+        messages = []
+        for human_msg, ai_msg in self.store.history(session_id):
+            messages.append(HumanMessage(content=human_msg))
+            messages.append(AIMessage(content=ai_msg))
+        return messages
     
     def clear_session(self, session_id: str):
         """Clear session memory"""
-        if session_id in self.sessions:
-            self.sessions[session_id].clear()
+        self.store.clear(session_id)
     
     def get_context_string(self, session_id: str, last_n: int = 5) -> str:
         """Get recent conversation as formatted string"""
-        history = self.get_history(session_id)
+        return "\n".join(text for _, text, _ in self.store.window(session_id, last_n))
+    
+    def get_context_within_tokens(
+        self,
+        session_id: str,
+        max_tokens: int,
+        last_n: Optional[int] = None
+    ) -> str:
+        """
+        Get as many recent turns as fit in a token budget, as formatted string
+        
+        Args:
+            session_id: Session identifier
+            max_tokens: Token budget for the returned context
+            last_n: Most turns to include (default: SESSION_CONTEXT_TURNS)
         
-        # Get last N messages
-        recent = history[-last_n*2:] if len(history) > last_n*2 else history
+        Returns:
+            The most recent whole turns whose tokens fit within max_tokens,
+            oldest first; empty if even the last turn doesn't fit
+        """
+        window = self.store.window(session_id, last_n or self.store.context_turns)
+        return "\n".join(self._fit_to_budget(window, max_tokens))
+    
+    @staticmethod
+    def _fit_to_budget(window: List[ContextEntry], max_tokens: int) -> List[str]:
+        """The newest whole turns that fit in max_tokens, oldest first"""
+        # Newest first, until the budget runs out (+1 for each joining newline)
+        kept = []
+        used = 0
+        for _, text, tokens in reversed(window):
+            cost = tokens + (1 if kept else 0)
+            if used + cost > max_tokens:
+                break
+            kept.append(text)
+            used += cost
+        return list(reversed(kept))
+    
+    def get_prompt_context(
+        self,
+        session_id: str,
+        max_tokens: int,
+        last_n: Optional[int] = None,
+        query: Optional[str] = None
+    ) -> str:
+        """
+        Get conversation context for a prompt: summary, relevant and recent turns
+        
+        Args:
+            session_id: Session identifier
+            max_tokens: Token budget for the returned context
+            last_n: Most recent turns to include when the session has no summary
+            query: Current query, to recall relevant older turns by (with
+                SESSION_RECALL_ENABLED)
+        
+        Returns:
+            The session's summary (if any), past turns relevant to the query
+            that aren't among the recent ones, and the recent turns that fit
+            in the budget. With neither a summary nor recalled turns, the
+            same as get_context_within_tokens()
+        """
+        sections = []
+        budget = max_tokens
+        
+        summary = self.store.get_summary(session_id) if self.summaries_enabled else None
+        if summary is not None:
+            text, summary_tokens, position = summary
+            sections.append(f"Summary of the earlier conversation:\n{text}")
+            budget -= summary_tokens + 8  # and the heading
+            # Everything since the summary, not just last_n, so no turn falls
+            # between the summary and the recent window
+            window = [
+                entry for entry in self.store.window(session_id, self.store.context_turns)
+                if entry[0] > position
+            ]
+        else:
+            window = self.store.window(session_id, last_n or self.store.context_turns)
+        
+        recalled = []
+        if query and self.index is not None and window:
+            recalled = self._recall(session_id, query, window, min(budget, settings.SESSION_RECALL_MAX_TOKENS))
+            if recalled:
+                sections.append("Relevant earlier conversation:\n" + "\n".join(text for text, _ in recalled))
+                budget -= sum(tokens + 1 for _, tokens in recalled) + 8
+        
+        recent = self._fit_to_budget(window, budget)
+        if not sections:
+            return "\n".join(recent)
+        if recent:
+            sections.append("Recent conversation:\n" + "\n".join(recent))
+        return "\n\n".join(sections)
+    
+    def _recall(
+        self,
+        session_id: str,
+        query: str,
+        window: List[ContextEntry],
+        max_tokens: int
+    ) -> List[tuple]:
+        """(text, tokens) of the most relevant past turns not in window, within max_tokens"""
+        try:
+            matches = self.index.search(session_id, query, settings.SESSION_RECALL_K + len(window))
+        except Exception as e:
+            print(f"[Memory][ERROR] Recalling turns of session {session_id} failed: {type(e).__name__}: {e}")
+            return []
+        
+        recent = {text for _, text, _ in window}
+        recalled = []
+        used = 0
+        for text in matches:
+            if text in recent:
+                continue
+            tokens = count_tokens(text)
+            if used + tokens + 1 > max_tokens:
+                continue
+            recalled.append((text, tokens))
+            used += tokens + 1
+            if len(recalled) == settings.SESSION_RECALL_K:
+                break
+        return recalled
+    
+    def _schedule_summary(self, session_id: str):
+        """Summarize a session in the background, unless already queued"""
+        with self._summary_lock:
+            if session_id in self._summarizing:
+                return
+            self._summarizing.add(session_id)
+        self._summary_executor.submit(self._run_summary, session_id)
+    
+    def _run_summary(self, session_id: str):
+        try:
+            self.summarize(session_id)
+        except Exception as e:
+            print(f"[Memory][ERROR] Summarizing session {session_id} failed: {type(e).__name__}: {e}")
+        finally:
+            with self._summary_lock:
+                self._summarizing.discard(session_id)
+    
+    def summarize(self, session_id: str) -> bool:
+        """
+        Fold a session's older unsummarized turns into its rolling summary
+        
+        The newest SESSION_SUMMARY_KEEP_TURNS turns stay verbatim.
+        
+        Returns:
+            True if the summary was updated
+        """
+        summary = self.store.get_summary(session_id)
+        previous_text, _, previous_position = summary if summary else ("", 0, 0)
         
-        context_parts = []
-        for msg in recent:
-            if isinstance(msg, HumanMessage):
-                context_parts.append(f"User: {msg.content}")
-            elif isinstance(msg, AIMessage):
-                context_parts.append(f"Assistant: {msg.content}")
+        turns = self.store.turns_after(session_id, previous_position)
+        keep = max(0, settings.SESSION_SUMMARY_KEEP_TURNS)
+        to_fold = turns[:len(turns) - keep] if keep else turns
+        if not to_fold:
+            return False
         
-        return "\n".join(context_parts)
+        prompt = CONVERSATION_SUMMARY_PROMPT.format(
+            max_words=settings.SESSION_SUMMARY_MAX_WORDS,
+            summary=previous_text or "(none yet)",
+            transcript="\n".join(format_turn(human_msg, ai_msg) for _, human_msg, ai_msg, _ in to_fold)
+        )
+        text = llm_manager.get_primary_llm().invoke(prompt).content.strip()
+        
+        updated = self.store.set_summary(
+            session_id,
+            text,
+            count_tokens(text),
+            to_fold[-1][0],
+            sum(tokens for _, _, _, tokens in to_fold),
+            previous_position
+        )
+        if updated:
+            print(f"[Memory] Summarized {len(to_fold)} turns of session {session_id}")
+        return updated
+    
+    def stats(self) -> Dict[str, Any]:
+        """Resident sessions, memory estimate, eviction and lock counters"""
+        return dict(self.store.stats(), locks=self.locks.stats())
+    
+    def shutdown(self):
+        """Stop the background sweeper, summarizer and indexer"""
+        self._stop.set()
+        if self._summary_executor is not None:
+            self._summary_executor.shutdown(wait=False, cancel_futures=True)
+        if self.index is not None:
+            self.index.shutdown()
 
 
 # Global instance
 memory_manager = MemoryManager()
-
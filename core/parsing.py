@@ -0,0 +1,163 @@
+"""
+Process-pool document parsing
+"""
+import math
+import time
+import threading
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional
+from langchain.schema import Document
+from app.config import settings
+from utils.document_loader import DocumentLoader
+from utils.processes import spawn_context
+
+
+class ParseTimeoutError(TimeoutError):
+    """Raised when a file takes longer than PARSE_TIMEOUT_SECONDS to parse"""
+    pass
+
+
+class ParsingPool:
+    """
+    Parses documents on a pool of worker processes
+
+    PDFs are split into page ranges that are parsed in parallel; other formats
+    are parsed whole on one worker. Pages are yielded in order as soon as
+    their range is done, so chunking can start before the file is finished.
+    Text extraction is CPU-bound, so processes (not threads) are used to get
+    past the GIL.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.PARSE_WORKERS,
+        timeout: int = settings.PARSE_TIMEOUT_SECONDS,
+        pages_per_task: int = settings.PARSE_PAGES_PER_TASK
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self.pages_per_task = max(1, pages_per_task)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start the worker processes on first use"""
+        with self._lock:
+            if self._executor is None:
+                # spawn behaves the same on every platform and does not copy
+                # the parent's threads (Chroma, job workers) into the children;
+                # they import the document loader, not the whole application
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=spawn_context()
+                )
+                print(f"[Parse] Started {self.workers} parser processes")
+            return self._executor
+
+    def _reset_executor(self, executor: ProcessPoolExecutor, reason: str):
+        """
+        Replace a pool whose worker died or hung, killing its processes
+
+        Cancelling a running future doesn't stop it, so a hung parser would
+        otherwise keep its worker busy for good. Parses of other files still
+        running on the pool fail with BrokenProcessPool.
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return  # Already replaced by another parse
+            self._executor = None
+        # ProcessPoolExecutor has no public way to stop running tasks
+        for process in list(getattr(executor, "_processes", {}).values()):
+            if process.is_alive():
+                process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+        print(f"[Parse][WARN] Parser pool {reason}, restarting on next use")
+
+    def _page_ranges(self, page_count: int) -> List[tuple]:
+        """
+        Split a PDF into page ranges
+
+        Ranges are no larger than pages_per_task, and small files are still
+        spread over every worker.
+        """
+        size = min(self.pages_per_task, max(1, math.ceil(page_count / self.workers)))
+        return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+    def iter_document(self, file_path: str) -> Iterator[Document]:
+        """
+        Parse a document, yielding its pages in order
+
+        Args:
+            file_path: Path of the document on disk
+
+        Raises:
+            ParseTimeoutError: If the whole file is not parsed within the timeout
+            ValueError: If the file format is not supported
+        """
+        # Spreadsheets are streamed row by row in this process; shipping a
+        # whole sheet back from a worker would defeat the streaming
+        if self.workers <= 0 or DocumentLoader.is_tabular(file_path):
+            yield from DocumentLoader.iter_document(file_path)
+            return
+
+        # Only time spent waiting on the workers counts towards the timeout;
+        # time the caller spends on each page between yields does not
+        waited = 0.0
+        executor = self._get_executor()
+
+        if Path(file_path).suffix.lower() == '.pdf':
+            page_count = DocumentLoader.count_pdf_pages(file_path)
+            tasks = deque(
+                (DocumentLoader.load_pdf_pages, file_path, start, end)
+                for start, end in self._page_ranges(page_count)
+            )
+        else:
+            tasks = deque([(DocumentLoader.load_document, file_path)])
+
+        # Keep a bounded number of ranges in flight so a huge PDF neither
+        # monopolises the pool nor piles up parsed pages in memory
+        max_in_flight = self.workers * 2
+        in_flight = deque()
+
+        try:
+            while tasks or in_flight:
+                while tasks and len(in_flight) < max_in_flight:
+                    func, *args = tasks.popleft()
+                    in_flight.append(executor.submit(func, *args))
+
+                wait_start = time.monotonic()
+                try:
+                    pages = in_flight[0].result(timeout=max(self.timeout - waited, 0))
+                except FutureTimeoutError:
+                    self._reset_executor(executor, "timed out")
+                    raise ParseTimeoutError(
+                        f"Parsing {Path(file_path).name} took longer than {self.timeout}s"
+                    )
+                waited += time.monotonic() - wait_start
+                in_flight.popleft()
+                yield from pages
+
+        except BrokenProcessPool:
+            self._reset_executor(executor, "broken")
+            raise
+
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def load(self, file_path: str) -> List[Document]:
+        """Parse a whole document"""
+        return list(self.iter_document(file_path))
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Global instance
+parsing_pool = ParsingPool()
@@ -0,0 +1,420 @@
+"""
+Per-source chunk registry for the vector store
+"""
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from core.dedup import FINGERPRINT_BITS, lsh_bands, lsh_layout, hamming, from_hex
+
+
+class SourceRegistry:
+    """
+    Tracks which chunk IDs belong to which source document
+    
+    Also a manifest for incremental re-ingestion: each chunk's content hash
+    and the hash of the file each source was last ingested from. Chunk
+    SimHash fingerprints are indexed in LSH bands for near-duplicate
+    lookups, and near-duplicate chunks that were linked instead of stored
+    are recorded per source, with their text, so they can be stored after
+    all if the chunk they duplicate is removed.
+    
+    Every change also bumps a version number, so readers can tell whether
+    the collection changed since they last looked.
+    """
+
+    def __init__(self, db_path: str, fingerprint_distance: int = 3):
+        self.db_path = db_path
+        self.fingerprint_distance = fingerprint_distance
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the registry database (created on first use)"""
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_id TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(source)")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(chunks)")]
+            if "content_hash" not in columns:
+                conn.execute("ALTER TABLE chunks ADD COLUMN content_hash TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks(content_hash)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS sources (
+                    source TEXT PRIMARY KEY,
+                    file_hash TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )"""
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS fingerprints (
+                    chunk_id TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS fingerprint_bands (
+                    band INTEGER NOT NULL,
+                    value INTEGER NOT NULL,
+                    chunk_id TEXT NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bands_value ON fingerprint_bands(band, value)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bands_chunk ON fingerprint_bands(chunk_id)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS duplicates (
+                    source TEXT NOT NULL,
+                    canonical_hash TEXT NOT NULL,
+                    page TEXT,
+                    created_at TEXT NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_duplicates_source ON duplicates(source)")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(duplicates)")]
+            if "content" not in columns:
+                conn.execute("ALTER TABLE duplicates ADD COLUMN content TEXT")
+                conn.execute("ALTER TABLE duplicates ADD COLUMN metadata TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_duplicates_hash ON duplicates(canonical_hash)")
+            self._check_band_layout(conn)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _check_band_layout(self, conn: sqlite3.Connection):
+        """Re-band stored fingerprints if the band layout (or dedup threshold) changed"""
+        blocks, per_band = lsh_layout(self.fingerprint_distance)
+        layout = blocks * FINGERPRINT_BITS + per_band
+        row = conn.execute("SELECT value FROM meta WHERE key = 'band_layout'").fetchone()
+        if row is not None and row[0] == layout:
+            return
+        conn.execute("DELETE FROM fingerprint_bands")
+        rows = conn.execute("SELECT chunk_id, fingerprint FROM fingerprints").fetchall()
+        conn.executemany(
+            "INSERT INTO fingerprint_bands (band, value, chunk_id) VALUES (?, ?, ?)",
+            self._band_rows(rows)
+        )
+        conn.execute("DELETE FROM meta WHERE key = 'fingerprint_distance'")
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('band_layout', ?)", (layout,)
+        )
+    
+    def _band_rows(self, fingerprints: Iterable[Tuple[str, str]]) -> List[tuple]:
+        """fingerprint_bands rows for (chunk_id, hex fingerprint) pairs"""
+        return [
+            (band, value, chunk_id)
+            for chunk_id, fingerprint in fingerprints
+            for band, value in enumerate(lsh_bands(from_hex(fingerprint), self.fingerprint_distance))
+        ]
+    
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection):
+        """Increment the version inside the caller's transaction"""
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+    def touch(self):
+        """Bump the version for a change made outside the registry (e.g. chunk metadata)"""
+        with self._lock:
+            conn = self._get_conn()
+            self._bump_version(conn)
+            conn.commit()
+
+    def version(self) -> int:
+        """Current version of the registered collection"""
+        with self._lock:
+            cursor = self._get_conn().execute("SELECT value FROM meta WHERE key = 'version'")
+            return cursor.fetchone()[0]
+
+    def add_ids(
+        self,
+        source: str,
+        ids: Iterable[str],
+        content_hashes: Optional[Iterable[Optional[str]]] = None,
+        fingerprints: Optional[Iterable[Optional[str]]] = None
+    ):
+        """
+        Record chunk IDs as belonging to a source
+        
+        Args:
+            source: Source document name
+            ids: Chunk IDs
+            content_hashes: Content hash per chunk, if known
+            fingerprints: Hex SimHash fingerprint per chunk, if known
+        """
+        now = datetime.utcnow().isoformat()
+        ids = list(ids)
+        hashes = list(content_hashes) if content_hashes is not None else [None] * len(ids)
+        rows = [
+            (chunk_id, source, now, content_hash)
+            for chunk_id, content_hash in zip(ids, hashes)
+        ]
+        if not rows:
+            return
+        fingerprinted = [
+            (chunk_id, fingerprint)
+            for chunk_id, fingerprint in zip(ids, fingerprints or [])
+            if fingerprint
+        ]
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany(
+                """INSERT OR REPLACE INTO chunks (chunk_id, source, created_at, content_hash)
+                   VALUES (?, ?, ?, ?)""",
+                rows
+            )
+            if fingerprinted:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO fingerprints (chunk_id, fingerprint) VALUES (?, ?)",
+                    fingerprinted
+                )
+                conn.executemany(
+                    "INSERT INTO fingerprint_bands (band, value, chunk_id) VALUES (?, ?, ?)",
+                    self._band_rows(fingerprinted)
+                )
+            self._bump_version(conn)
+            conn.commit()
+
+    def get_ids(self, source: str) -> List[str]:
+        """Get all chunk IDs registered for a source"""
+        with self._lock:
+            cursor = self._get_conn().execute(
+                "SELECT chunk_id FROM chunks WHERE source = ?", (source,)
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_content_hashes(self, ids: Iterable[str]) -> List[str]:
+        """Distinct content hashes of the given chunks"""
+        ids = list(ids)
+        hashes = set()
+        with self._lock:
+            conn = self._get_conn()
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                cursor = conn.execute(
+                    f"SELECT DISTINCT content_hash FROM chunks WHERE content_hash IS NOT NULL "
+                    f"AND chunk_id IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                hashes.update(row[0] for row in cursor.fetchall())
+        return list(hashes)
+
+    def get_chunk_hashes(self, source: str) -> List[Tuple[str, Optional[str]]]:
+        """(chunk_id, content_hash) for each chunk of a source"""
+        with self._lock:
+            cursor = self._get_conn().execute(
+                "SELECT chunk_id, content_hash FROM chunks WHERE source = ?", (source,)
+            )
+            return cursor.fetchall()
+    
+    def get_file_hash(self, source: str) -> Optional[str]:
+        """Hash of the file a source was last fully ingested from"""
+        with self._lock:
+            cursor = self._get_conn().execute(
+                "SELECT file_hash FROM sources WHERE source = ?", (source,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+    
+    def clear_file_hashes(self, sources: Iterable[str]):
+        """Forget which files sources came from, so their next upload is ingested"""
+        rows = [(source,) for source in sources]
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("DELETE FROM sources WHERE source = ?", rows)
+            conn.commit()
+
+    def set_file_hash(self, source: str, file_hash: str):
+        """Record the file a source's current chunks came from"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO sources (source, file_hash, updated_at) VALUES (?, ?, ?)",
+                (source, file_hash, datetime.utcnow().isoformat())
+            )
+            conn.commit()
+    
+    def find_near_duplicate(
+        self,
+        fingerprint: int,
+        bands: List[int],
+        max_distance: int,
+        exclude_source: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Content hash of the closest stored chunk within max_distance bits
+        
+        Args:
+            fingerprint: SimHash of the candidate chunk
+            bands: Its LSH bands (see core.dedup.lsh_bands)
+            max_distance: Largest Hamming distance that counts as a duplicate
+            exclude_source: Ignore this source's own chunks
+        """
+        best, best_distance = None, max_distance + 1
+        with self._lock:
+            conn = self._get_conn()
+            for band, value in enumerate(bands):
+                cursor = conn.execute(
+                    """SELECT f.fingerprint, c.content_hash
+                       FROM fingerprint_bands b
+                       JOIN fingerprints f ON f.chunk_id = b.chunk_id
+                       JOIN chunks c ON c.chunk_id = b.chunk_id
+                       WHERE b.band = ? AND b.value = ? AND c.source != ?""",
+                    (band, value, exclude_source or "")
+                )
+                for other, content_hash in cursor.fetchall():
+                    distance = hamming(fingerprint, from_hex(other))
+                    if distance < best_distance and content_hash:
+                        best, best_distance = content_hash, distance
+        return best
+    
+    def set_duplicates(self, source: str, duplicates: Iterable[Tuple[str, Any, str, str]]):
+        """
+        Replace a source's linked near-duplicates
+
+        Args:
+            source: Source document name
+            duplicates: (canonical_hash, page, text, metadata JSON) per chunk
+        """
+        now = datetime.utcnow().isoformat()
+        rows = [
+            (source, canonical_hash, str(page), now, text, metadata)
+            for canonical_hash, page, text, metadata in duplicates
+        ]
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("DELETE FROM duplicates WHERE source = ?", (source,))
+            conn.executemany(
+                """INSERT INTO duplicates (source, canonical_hash, page, created_at, content, metadata)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+            conn.commit()
+    
+    def orphaned_duplicates(self, canonical_hashes: Iterable[str]) -> List[tuple]:
+        """
+        Linked duplicates of these hashes that no stored chunk has any more
+
+        Returns:
+            (rowid, source, canonical_hash, text, metadata JSON) per
+            duplicate; text is None for duplicates recorded without it
+        """
+        orphans = []
+        with self._lock:
+            conn = self._get_conn()
+            for canonical_hash in set(canonical_hashes):
+                if conn.execute(
+                    "SELECT 1 FROM chunks WHERE content_hash = ? LIMIT 1", (canonical_hash,)
+                ).fetchone():
+                    continue
+                orphans.extend(conn.execute(
+                    """SELECT rowid, source, canonical_hash, content, metadata
+                       FROM duplicates WHERE canonical_hash = ? ORDER BY rowid""",
+                    (canonical_hash,)
+                ).fetchall())
+        return orphans
+    
+    def relink_duplicates(self, rowids: Iterable[int], canonical_hash: str):
+        """Point linked duplicates at another stored chunk"""
+        rows = [(canonical_hash, rowid) for rowid in rowids]
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("UPDATE duplicates SET canonical_hash = ? WHERE rowid = ?", rows)
+            conn.commit()
+    
+    def remove_duplicates(self, rowids: Iterable[int]):
+        """Forget linked duplicates (e.g. once they are stored as chunks)"""
+        rows = [(rowid,) for rowid in rowids]
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("DELETE FROM duplicates WHERE rowid = ?", rows)
+            conn.commit()
+    
+    def get_duplicates(self, source: str) -> List[Dict[str, Any]]:
+        """A source's near-duplicate chunks, linked to the chunk they duplicate"""
+        with self._lock:
+            cursor = self._get_conn().execute(
+                """SELECT d.canonical_hash, d.page,
+                          (SELECT c.source FROM chunks c WHERE c.content_hash = d.canonical_hash LIMIT 1)
+                   FROM duplicates d WHERE d.source = ?""",
+                (source,)
+            )
+            return [
+                {"page": page, "canonical_hash": canonical_hash, "canonical_source": canonical_source}
+                for canonical_hash, page, canonical_source in cursor.fetchall()
+            ]
+    
+    def has_source(self, source: str) -> bool:
+        """Check whether a source has any registered chunks"""
+        with self._lock:
+            cursor = self._get_conn().execute(
+                "SELECT 1 FROM chunks WHERE source = ? LIMIT 1", (source,)
+            )
+            return cursor.fetchone() is not None
+
+    def remove_ids(self, ids: Iterable[str]):
+        """Forget specific chunk IDs"""
+        rows = [(chunk_id,) for chunk_id in ids]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", rows)
+            conn.executemany("DELETE FROM fingerprints WHERE chunk_id = ?", rows)
+            conn.executemany("DELETE FROM fingerprint_bands WHERE chunk_id = ?", rows)
+            # A source with no chunks left no longer matches any file
+            conn.execute(
+                "DELETE FROM sources WHERE source NOT IN (SELECT DISTINCT source FROM chunks)"
+            )
+            self._bump_version(conn)
+            conn.commit()
+
+    def list_sources(self) -> List[Dict[str, Any]]:
+        """List registered sources with their chunk counts"""
+        with self._lock:
+            cursor = self._get_conn().execute(
+                """SELECT source, COUNT(*), MAX(created_at)
+                   FROM chunks GROUP BY source ORDER BY source"""
+            )
+            rows = cursor.fetchall()
+            duplicates = dict(self._get_conn().execute(
+                "SELECT source, COUNT(*) FROM duplicates GROUP BY source"
+            ).fetchall())
+            return [
+                {
+                    "source": source,
+                    "chunk_count": count,
+                    "duplicate_count": duplicates.get(source, 0),
+                    "updated_at": updated_at
+                }
+                for source, count, updated_at in rows
+            ]
+
+    def count(self) -> int:
+        """Total number of registered chunks"""
+        with self._lock:
+            cursor = self._get_conn().execute("SELECT COUNT(*) FROM chunks")
+            return cursor.fetchone()[0]
+
+    def clear(self):
+        """Forget every registered chunk"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("DELETE FROM chunks")
+            conn.execute("DELETE FROM sources")
+            conn.execute("DELETE FROM fingerprints")
+            conn.execute("DELETE FROM fingerprint_bands")
+            conn.execute("DELETE FROM duplicates")
+            self._bump_version(conn)
+            conn.commit()
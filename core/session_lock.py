@@ -0,0 +1,312 @@
+"""
+Per-session request serialization
+"""
+import os
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional
+
+
+class SessionBusyError(Exception):
+    """Raised when a session already has a request in progress"""
+    pass
+
+
+# Sessions whose lock the current request already holds. run_in_threadpool
+# copies it into the worker thread, so a lock taken by an async route isn't
+# waited for again by the sync code it calls
+_held_sessions: ContextVar[frozenset] = ContextVar("held_sessions", default=frozenset())
+
+
+class SessionLease:
+    """
+    Cross-process lease on a session, kept in a SQLite table
+
+    Serializes a session's requests between API workers that share the
+    session database. A lease not released within ttl_seconds (its worker
+    crashed, or the request ran that long) is taken over by the next
+    request, so ttl_seconds should exceed the longest request.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the lease table (created on first use)"""
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.db_path, timeout=5, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS session_leases (
+                    session_id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )"""
+            )
+            self._conn = conn
+        return self._conn
+
+    def try_acquire(self, session_id: str, owner: str) -> bool:
+        """Take a session's lease if it is free or expired"""
+        now = time.time()
+        with self._lock:
+            cursor = self._get_conn().execute(
+                """INSERT INTO session_leases (session_id, owner, expires_at) VALUES (?, ?, ?)
+                   ON CONFLICT(session_id) DO UPDATE
+                   SET owner = excluded.owner, expires_at = excluded.expires_at
+                   WHERE session_leases.expires_at < ?""",
+                (session_id, owner, now + self.ttl_seconds, now)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, session_id: str, owner: str):
+        """Give a lease back, unless it expired and was taken over"""
+        with self._lock:
+            self._get_conn().execute(
+                "DELETE FROM session_leases WHERE session_id = ? AND owner = ?",
+                (session_id, owner)
+            )
+
+    def sweep(self) -> int:
+        """Delete expired leases left by crashed workers"""
+        with self._lock:
+            cursor = self._get_conn().execute(
+                "DELETE FROM session_leases WHERE expires_at < ?", (time.time(),)
+            )
+            return cursor.rowcount
+
+
+class SessionLockManager:
+    """
+    One lock per active session, so a session's requests run one at a time
+
+    Two requests on the same session would otherwise both read the history,
+    both call the LLM and append their turns in whichever order they finish.
+    Requests on different sessions never wait for each other. Locks exist
+    only while a request holds or waits for them.
+
+    Async routes use hold_async(), which waits in the event loop, so queued
+    requests don't tie up threadpool threads. Locks are per process; with
+    a lease (the sqlite session backend) a session is also held across the
+    API workers sharing its database, waiting for it by polling.
+
+    Modes:
+        queue: wait for the session's previous request (up to timeout seconds)
+        reject: fail at once with SessionBusyError if the session is busy
+        allow: no locking
+    """
+
+    modes = ("queue", "reject", "allow")
+
+    # How often a held lease (or a lock held by sync code) is checked again
+    poll_seconds = 0.05
+
+    def __init__(self, mode: str = "queue", timeout: float = 120, lease: Optional[SessionLease] = None):
+        if mode not in self.modes:
+            raise ValueError(f"Unknown SESSION_LOCK_MODE '{mode}': use 'queue', 'reject' or 'allow'")
+        self.mode = mode
+        self.timeout = timeout
+        self.lease = lease
+        self._guard = threading.Lock()
+        # session_id -> [thread lock, asyncio lock, requests holding or waiting for them]
+        self._locks: Dict[str, List[Any]] = {}
+        self.metrics = {
+            "acquired": 0,
+            "contended": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0
+        }
+
+    def _skip(self, session_id: str) -> bool:
+        """No locking, or the current request holds the session already"""
+        return self.mode == "allow" or session_id in _held_sessions.get()
+
+    def _enter(self, session_id: str) -> List[Any]:
+        with self._guard:
+            entry = self._locks.setdefault(session_id, [threading.Lock(), asyncio.Lock(), 0])
+            entry[2] += 1
+        return entry
+
+    def _exit(self, session_id: str, entry: List[Any]):
+        with self._guard:
+            entry[2] -= 1
+            if entry[2] == 0:
+                del self._locks[session_id]
+
+    def _remaining(self, start: float) -> Optional[float]:
+        """Seconds left to wait, or None without a timeout"""
+        if self.timeout <= 0:
+            return None
+        return max(0.0, self.timeout - (time.perf_counter() - start))
+
+    def _busy(self, session_id: str, start: float):
+        """
+        The session is held by another request: refuse in reject mode, or
+        give up once the queue wait has used up the timeout
+        """
+        if self.mode == "reject":
+            with self._guard:
+                self.metrics["rejected"] += 1
+            raise SessionBusyError(f"Session '{session_id}' already has a request in progress")
+        if self._remaining(start) == 0:
+            self._timed_out(session_id, start)
+
+    def _timed_out(self, session_id: str, start: float):
+        self._record(start, contended=True, acquired=False)
+        raise SessionBusyError(
+            f"Session '{session_id}' is still busy after waiting {self.timeout}s"
+        )
+
+    def _record(self, start: float, contended: bool, acquired: bool = True):
+        waited = time.perf_counter() - start
+        with self._guard:
+            if acquired:
+                self.metrics["acquired"] += 1
+            else:
+                self.metrics["timeouts"] += 1
+            if contended:
+                self.metrics["contended"] += 1
+                self.metrics["wait_seconds_total"] += waited
+                self.metrics["wait_seconds_max"] = max(self.metrics["wait_seconds_max"], waited)
+
+    @contextmanager
+    def _held(self, session_id: str) -> Iterator[None]:
+        token = _held_sessions.set(_held_sessions.get() | {session_id})
+        try:
+            yield
+        finally:
+            _held_sessions.reset(token)
+
+    @contextmanager
+    def hold(self, session_id: str) -> Iterator[None]:
+        """
+        Hold a session's lock for the duration of a request, blocking the
+        calling thread while waiting
+
+        Raises:
+            SessionBusyError: In reject mode if the session is busy, or in
+                queue mode if the wait exceeds the timeout
+        """
+        if self._skip(session_id):
+            yield
+            return
+
+        entry = self._enter(session_id)
+        lock = entry[0]
+        start = time.perf_counter()
+        contended = False
+
+        try:
+            while not lock.acquire(blocking=False):
+                contended = True
+                self._busy(session_id, start)
+                remaining = self._remaining(start)
+                if lock.acquire(timeout=-1 if remaining is None else remaining):
+                    break
+            try:
+                owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+                while self.lease is not None and not self.lease.try_acquire(session_id, owner):
+                    contended = True
+                    self._busy(session_id, start)
+                    time.sleep(self.poll_seconds)
+                self._record(start, contended)
+                try:
+                    with self._held(session_id):
+                        yield
+                finally:
+                    if self.lease is not None:
+                        self.lease.release(session_id, owner)
+            finally:
+                lock.release()
+        finally:
+            self._exit(session_id, entry)
+
+    @asynccontextmanager
+    async def hold_async(self, session_id: str) -> AsyncIterator[None]:
+        """
+        Hold a session's lock for the duration of a request, waiting in the
+        event loop
+
+        Sync code run from inside (through run_in_threadpool) that calls
+        hold() on the same session doesn't wait again.
+
+        Raises:
+            SessionBusyError: In reject mode if the session is busy, or in
+                queue mode if the wait exceeds the timeout
+        """
+        if self._skip(session_id):
+            yield
+            return
+
+        entry = self._enter(session_id)
+        lock, async_lock = entry[0], entry[1]
+        start = time.perf_counter()
+        contended = False
+
+        try:
+            # Requests of this process queue on the asyncio lock, in order
+            if not async_lock.locked():
+                await async_lock.acquire()
+            else:
+                contended = True
+                self._busy(session_id, start)
+                try:
+                    await asyncio.wait_for(async_lock.acquire(), self._remaining(start))
+                except asyncio.TimeoutError:
+                    self._timed_out(session_id, start)
+
+            try:
+                # The thread lock is only held elsewhere by sync callers
+                while not lock.acquire(blocking=False):
+                    contended = True
+                    self._busy(session_id, start)
+                    await asyncio.sleep(self.poll_seconds)
+                try:
+                    owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+                    while self.lease is not None and not await asyncio.to_thread(
+                        self.lease.try_acquire, session_id, owner
+                    ):
+                        contended = True
+                        self._busy(session_id, start)
+                        await asyncio.sleep(self.poll_seconds)
+                    self._record(start, contended)
+                    try:
+                        with self._held(session_id):
+                            yield
+                    finally:
+                        if self.lease is not None:
+                            await asyncio.to_thread(self.lease.release, session_id, owner)
+                finally:
+                    lock.release()
+            finally:
+                async_lock.release()
+        finally:
+            self._exit(session_id, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        """Lock mode, sessions currently busy and contention counters"""
+        with self._guard:
+            return {
+                "mode": self.mode,
+                "scope": "database" if self.lease is not None else "process",
+                "busy_sessions": len(self._locks),
+                "waiting": sum(entry[2] - 1 for entry in self._locks.values() if entry[2] > 1),
+                **{
+                    key: round(value, 3) if isinstance(value, float) else value
+                    for key, value in self.metrics.items()
+                }
+            }
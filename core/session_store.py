@@ -0,0 +1,653 @@
+"""
+Conversation session storage backends
+"""
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from app.config import settings
+from utils.chunking import TokenChunker
+
+# One conversation turn: (user message, assistant message)
+Turn = Tuple[str, str]
+
+# One turn formatted for a prompt: (position, text, token count). Positions
+# increase with each turn of a session; older turns have lower positions.
+ContextEntry = Tuple[int, str, int]
+
+# Only used for counting tokens with the embedding model's tokenizer
+_token_counter = TokenChunker()
+
+
+def format_turn(human_msg: str, ai_msg: str) -> str:
+    """A turn the way prompts show it"""
+    return f"User: {human_msg}\nAssistant: {ai_msg}"
+
+
+def count_tokens(text: str) -> int:
+    return _token_counter.count_tokens(text)
+
+
+def context_entry(position: int, human_msg: str, ai_msg: str, tokens: Optional[int] = None) -> ContextEntry:
+    """Format a turn, counting its tokens unless already known"""
+    text = format_turn(human_msg, ai_msg)
+    return position, text, tokens if tokens is not None else count_tokens(text)
+
+
+class SessionStore(ABC):
+    """
+    Interface shared by the session backends
+
+    Sessions are append-only lists of turns. Idle sessions (no activity for
+    ttl_seconds) and, beyond the caps, the least recently active ones are
+    evicted.
+
+    Each session also keeps its last context_turns turns preformatted, in
+    a ring buffer, so building a prompt's context costs O(turns used)
+    regardless of how long the session is.
+
+    A session can carry a rolling summary of its older turns: the summary
+    text plus the position of the last turn it covers. Stores count the
+    tokens of the turns not yet covered so callers know when to fold more
+    of them in.
+    """
+
+    # Rough per-message overhead (objects, dict entries) on top of the text
+    message_overhead_bytes = 200
+
+    def __init__(self, ttl_seconds: int, max_sessions: int, max_bytes: int, context_turns: int = 20):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.context_turns = max(1, context_turns)
+        self.evictions = {"ttl": 0, "max_sessions": 0, "max_bytes": 0}
+        # Called with the IDs of sessions that were cleared or evicted
+        self.on_remove: Optional[Callable[[List[str]], None]] = None
+
+    def _removed(self, session_ids: List[str]):
+        if self.on_remove is not None and session_ids:
+            self.on_remove(session_ids)
+
+    def turn_size(self, human_msg: str, ai_msg: str) -> int:
+        """Estimated resident size of one turn, in bytes"""
+        return (
+            len(human_msg.encode("utf-8"))
+            + len(ai_msg.encode("utf-8"))
+            + 2 * self.message_overhead_bytes
+        )
+
+    @abstractmethod
+    def append(self, session_id: str, human_msg: str, ai_msg: str) -> int:
+        """
+        Add a turn to a session, creating it if needed
+
+        Returns:
+            Tokens in the session's turns not yet covered by its summary
+        """
+
+    @abstractmethod
+    def window(self, session_id: str, last_n: int) -> List[ContextEntry]:
+        """The last `last_n` turns of a session, formatted, oldest first"""
+
+    @abstractmethod
+    def history(self, session_id: str) -> List[Turn]:
+        """Every turn of a session, oldest first"""
+
+    @abstractmethod
+    def turns_after(self, session_id: str, position: int) -> List[Tuple[int, str, str, int]]:
+        """(position, user message, assistant message, tokens) of the turns after `position`"""
+
+    @abstractmethod
+    def get_summary(self, session_id: str) -> Optional[Tuple[str, int, int]]:
+        """(summary, tokens, position of the last turn covered), or None"""
+
+    @abstractmethod
+    def set_summary(
+        self,
+        session_id: str,
+        summary: str,
+        tokens: int,
+        position: int,
+        covered_tokens: int,
+        previous_position: int
+    ) -> bool:
+        """
+        Replace a session's summary, if it still covers up to previous_position
+
+        Args:
+            covered_tokens: Tokens of the turns newly folded into the summary
+
+        Returns:
+            False if the session is gone or its summary changed meanwhile
+        """
+
+    @abstractmethod
+    def clear(self, session_id: str):
+        """Delete a session and its turns"""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """
+        Evict idle sessions, and the least recently active beyond the caps
+
+        Returns:
+            Number of sessions evicted
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Resident sessions, size and eviction counters"""
+
+
+class _Session:
+    """One session's turns plus the bookkeeping used for eviction"""
+
+    __slots__ = (
+        "turns", "window", "size_bytes", "last_access",
+        "summary", "summary_tokens", "summary_position", "pending_tokens"
+    )
+
+    def __init__(self, context_turns: int):
+        self.turns: List[Turn] = []
+        self.window: "deque[ContextEntry]" = deque(maxlen=context_turns)
+        self.size_bytes = 0
+        self.last_access = time.monotonic()
+        self.summary: Optional[str] = None
+        self.summary_tokens = 0
+        # Turn positions are 1-based indexes into turns; 0 = nothing summarized
+        self.summary_position = 0
+        self.pending_tokens = 0
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Sessions held in this process, in LRU order
+
+    Fastest, but each worker process has its own sessions and a restart
+    loses them all.
+    """
+
+    def __init__(self, ttl_seconds: int, max_sessions: int, max_bytes: int, context_turns: int = 20):
+        super().__init__(ttl_seconds, max_sessions, max_bytes, context_turns)
+        self.sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._resident_bytes = 0
+
+    def _touch(self, session_id: str, create: bool = True):
+        """Get a live session and mark it most recently used"""
+        session = self.sessions.get(session_id)
+        if session is not None and self._expired(session, time.monotonic()):
+            self._evict(session_id, "ttl")
+            session = None
+        if session is None:
+            if not create:
+                return None
+            session = _Session(self.context_turns)
+            self.sessions[session_id] = session
+        session.last_access = time.monotonic()
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def _expired(self, session: _Session, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - session.last_access > self.ttl_seconds
+
+    def _evict(self, session_id: str, reason: str):
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            self._resident_bytes -= session.size_bytes
+            self.evictions[reason] += 1
+            self._removed([session_id])
+
+    def _enforce_caps(self, keep: str):
+        """Evict least recently used sessions (never `keep`) until under the caps"""
+        for session_id in list(self.sessions):
+            if len(self.sessions) <= self.max_sessions and self._resident_bytes <= self.max_bytes:
+                break
+            if session_id == keep:
+                continue
+            reason = "max_sessions" if len(self.sessions) > self.max_sessions else "max_bytes"
+            self._evict(session_id, reason)
+
+    def append(self, session_id: str, human_msg: str, ai_msg: str) -> int:
+        size = self.turn_size(human_msg, ai_msg)
+        text = format_turn(human_msg, ai_msg)
+        tokens = count_tokens(text)
+        with self._lock:
+            session = self._touch(session_id)
+            session.turns.append((human_msg, ai_msg))
+            session.window.append((len(session.turns), text, tokens))
+            session.pending_tokens += tokens
+            session.size_bytes += size
+            self._resident_bytes += size
+            self._enforce_caps(keep=session_id)
+            return session.pending_tokens
+
+    def window(self, session_id: str, last_n: int) -> List[ContextEntry]:
+        if last_n <= 0:
+            return []
+        with self._lock:
+            session = self._touch(session_id, create=False)
+            if session is None:
+                return []
+            if last_n <= len(session.window) or len(session.window) == len(session.turns):
+                count = min(last_n, len(session.window))
+                return [session.window[i] for i in range(-count, 0)]
+            first = max(0, len(session.turns) - last_n)
+            turns = session.turns[first:]
+        # Further back than the ring buffer reaches
+        return [
+            context_entry(first + i + 1, human_msg, ai_msg)
+            for i, (human_msg, ai_msg) in enumerate(turns)
+        ]
+
+    def history(self, session_id: str) -> List[Turn]:
+        with self._lock:
+            session = self._touch(session_id, create=False)
+            return list(session.turns) if session else []
+
+    def turns_after(self, session_id: str, position: int) -> List[Tuple[int, str, str, int]]:
+        with self._lock:
+            session = self._touch(session_id, create=False)
+            turns = session.turns[position:] if session else []
+        return [
+            (position + i + 1, human_msg, ai_msg, count_tokens(format_turn(human_msg, ai_msg)))
+            for i, (human_msg, ai_msg) in enumerate(turns)
+        ]
+
+    def get_summary(self, session_id: str) -> Optional[Tuple[str, int, int]]:
+        with self._lock:
+            session = self._touch(session_id, create=False)
+            if session is None or session.summary is None:
+                return None
+            return session.summary, session.summary_tokens, session.summary_position
+
+    def set_summary(
+        self,
+        session_id: str,
+        summary: str,
+        tokens: int,
+        position: int,
+        covered_tokens: int,
+        previous_position: int
+    ) -> bool:
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None or session.summary_position != previous_position:
+                return False
+            session.summary = summary
+            session.summary_tokens = tokens
+            session.summary_position = position
+            session.pending_tokens = max(0, session.pending_tokens - covered_tokens)
+            return True
+
+    def clear(self, session_id: str):
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+            if session is not None:
+                self._resident_bytes -= session.size_bytes
+                self._removed([session_id])
+
+    def sweep(self) -> int:
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            # LRU order: the first non-expired session ends the scan
+            for session_id, session in list(self.sessions.items()):
+                if not self._expired(session, now):
+                    break
+                self._evict(session_id, "ttl")
+                evicted += 1
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self.sessions),
+                "resident_bytes": self._resident_bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": dict(self.evictions)
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a local SQLite database (WAL mode)
+
+    Shared by every worker process on the host and kept across restarts.
+    Turns are append-only rows; reads fetch only the last-N window. A small
+    in-process cache holds the preformatted recent turns of the most
+    recently read sessions and is validated against the session's latest
+    turn sequence number, a single primary-key lookup, so a turn written
+    by another worker is never missed. Turn positions are sequence numbers.
+
+    A session's idle time counts from its last turn. Idle sessions and,
+    beyond the caps, the least recently active sessions are deleted by
+    sweep() rather than on every write.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        ttl_seconds: int,
+        max_sessions: int,
+        max_bytes: int,
+        cache_sessions: int = 1000,
+        context_turns: int = 20
+    ):
+        super().__init__(ttl_seconds, max_sessions, max_bytes, context_turns)
+        self.db_path = db_path
+        self.cache_sessions = cache_sessions
+        self._conn = None
+        self._lock = threading.Lock()
+        # session_id -> (last seq, last context_turns turns formatted, holds every turn)
+        self._cache: "OrderedDict[str, Tuple[int, deque, bool]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the session database (created on first use)"""
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.db_path, timeout=30, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # AUTOINCREMENT: sequence numbers are never reused, even after a
+            # session is cleared, so a cached seq can't match a newer session
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS turns (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    human TEXT NOT NULL,
+                    ai TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(turns)")]
+            if "tokens" not in columns:
+                conn.execute("ALTER TABLE turns ADD COLUMN tokens INTEGER")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_turns_session ON turns(session_id, seq)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    last_seq INTEGER NOT NULL,
+                    turn_count INTEGER NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+            for column, definition in (
+                ("summary", "TEXT"),
+                ("summary_tokens", "INTEGER NOT NULL DEFAULT 0"),
+                ("summary_seq", "INTEGER NOT NULL DEFAULT 0"),
+                ("pending_tokens", "INTEGER NOT NULL DEFAULT 0")
+            ):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} {definition}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_access ON sessions(last_access)")
+            self._conn = conn
+        return self._conn
+
+    def _cache_put(self, session_id: str, seq: int, window: deque, complete: bool):
+        self._cache[session_id] = (seq, window, complete and len(window) < self.context_turns)
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.cache_sessions:
+            self._cache.popitem(last=False)
+
+    def append(self, session_id: str, human_msg: str, ai_msg: str) -> int:
+        now = time.time()
+        size = self.turn_size(human_msg, ai_msg)
+        text = format_turn(human_msg, ai_msg)
+        tokens = count_tokens(text)
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = conn.execute(
+                    "SELECT last_seq, last_access, pending_tokens FROM sessions WHERE session_id = ?",
+                    (session_id,)
+                ).fetchone()
+                if previous is not None and self.ttl_seconds > 0 and now - previous[1] > self.ttl_seconds:
+                    # Idle past the TTL but not swept yet: start over
+                    self._delete_sessions(conn, [session_id])
+                    self.evictions["ttl"] += 1
+                    previous = None
+                seq = conn.execute(
+                    "INSERT INTO turns (session_id, human, ai, tokens, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (session_id, human_msg, ai_msg, tokens, now)
+                ).lastrowid
+                if previous is None:
+                    conn.execute(
+                        "INSERT INTO sessions (session_id, last_seq, turn_count, size_bytes, last_access, "
+                        "pending_tokens) VALUES (?, ?, 1, ?, ?, ?)",
+                        (session_id, seq, size, now, tokens)
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE sessions SET last_seq = ?, turn_count = turn_count + 1, "
+                        "size_bytes = size_bytes + ?, last_access = ?, pending_tokens = pending_tokens + ? "
+                        "WHERE session_id = ?",
+                        (seq, size, now, tokens, session_id)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            # Extend the cached window if it was current before this turn
+            entry = (seq, text, tokens)
+            cached = self._cache.get(session_id)
+            previous_seq = previous[0] if previous else None
+            if cached is not None and cached[0] == previous_seq:
+                cached[1].append(entry)
+                self._cache_put(session_id, seq, cached[1], cached[2])
+            elif previous is None:
+                self._cache_put(session_id, seq, deque([entry], maxlen=self.context_turns), True)
+            else:
+                self._cache.pop(session_id, None)
+
+        return tokens + (previous[2] if previous else 0)
+
+    def _last_seq(self, conn: sqlite3.Connection, session_id: str):
+        """Latest turn seq of a live session, or None"""
+        row = conn.execute(
+            "SELECT last_seq, last_access FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self.ttl_seconds > 0 and time.time() - row[1] > self.ttl_seconds:
+            return None
+        return row[0]
+
+    def window(self, session_id: str, last_n: int) -> List[ContextEntry]:
+        if last_n <= 0:
+            return []
+        with self._lock:
+            conn = self._get_conn()
+            seq = self._last_seq(conn, session_id)
+            if seq is None:
+                self._cache.pop(session_id, None)
+                return []
+
+            cached = self._cache.get(session_id)
+            if cached is not None and cached[0] == seq and (cached[2] or last_n <= len(cached[1])):
+                self._cache.move_to_end(session_id)
+                self.cache_hits += 1
+                window = cached[1]
+                count = min(last_n, len(window))
+                return [window[i] for i in range(-count, 0)]
+
+            self.cache_misses += 1
+            limit = max(last_n, self.context_turns)
+            rows = conn.execute(
+                "SELECT seq, human, ai, tokens FROM turns WHERE session_id = ? AND seq <= ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_id, seq, limit)
+            ).fetchall()
+            entries = [context_entry(*row) for row in reversed(rows)]
+            window = deque(entries[-self.context_turns:], maxlen=self.context_turns)
+            self._cache_put(session_id, seq, window, len(rows) < limit)
+            return entries[-last_n:]
+
+    def history(self, session_id: str) -> List[Turn]:
+        with self._lock:
+            conn = self._get_conn()
+            seq = self._last_seq(conn, session_id)
+            if seq is None:
+                return []
+            rows = conn.execute(
+                "SELECT human, ai FROM turns WHERE session_id = ? AND seq <= ? ORDER BY seq",
+                (session_id, seq)
+            ).fetchall()
+        return [(human, ai) for human, ai in rows]
+
+    def turns_after(self, session_id: str, position: int) -> List[Tuple[int, str, str, int]]:
+        with self._lock:
+            conn = self._get_conn()
+            if self._last_seq(conn, session_id) is None:
+                return []
+            rows = conn.execute(
+                "SELECT seq, human, ai, tokens FROM turns WHERE session_id = ? AND seq > ? ORDER BY seq",
+                (session_id, position)
+            ).fetchall()
+        return [
+            (seq, human, ai, tokens if tokens is not None else count_tokens(format_turn(human, ai)))
+            for seq, human, ai, tokens in rows
+        ]
+
+    def get_summary(self, session_id: str) -> Optional[Tuple[str, int, int]]:
+        with self._lock:
+            conn = self._get_conn()
+            if self._last_seq(conn, session_id) is None:
+                return None
+            row = conn.execute(
+                "SELECT summary, summary_tokens, summary_seq FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return row[0], row[1], row[2]
+
+    def set_summary(
+        self,
+        session_id: str,
+        summary: str,
+        tokens: int,
+        position: int,
+        covered_tokens: int,
+        previous_position: int
+    ) -> bool:
+        with self._lock:
+            # Conditional on the previous position: another worker may have
+            # summarized the same session meanwhile
+            cursor = self._get_conn().execute(
+                "UPDATE sessions SET summary = ?, summary_tokens = ?, summary_seq = ?, "
+                "pending_tokens = MAX(0, pending_tokens - ?) "
+                "WHERE session_id = ? AND summary_seq = ?",
+                (summary, tokens, position, covered_tokens, session_id, previous_position)
+            )
+        return cursor.rowcount == 1
+
+    def _delete_sessions(self, conn: sqlite3.Connection, session_ids: List[str]):
+        """Delete sessions and their turns inside the caller's transaction"""
+        for session_id in session_ids:
+            conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._cache.pop(session_id, None)
+        self._removed(session_ids)
+
+    def clear(self, session_id: str):
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_sessions(conn, [session_id])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def sweep(self) -> int:
+        evicted = {"ttl": [], "max_sessions": [], "max_bytes": []}
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.ttl_seconds > 0:
+                    evicted["ttl"] = [row[0] for row in conn.execute(
+                        "SELECT session_id FROM sessions WHERE last_access < ?",
+                        (time.time() - self.ttl_seconds,)
+                    )]
+                    self._delete_sessions(conn, evicted["ttl"])
+
+                count, total_bytes = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM sessions"
+                ).fetchone()
+                if count > self.max_sessions or total_bytes > self.max_bytes:
+                    # Least recently active first, until under both caps
+                    for session_id, size_bytes in conn.execute(
+                        "SELECT session_id, size_bytes FROM sessions ORDER BY last_access"
+                    ).fetchall():
+                        if count <= self.max_sessions and total_bytes <= self.max_bytes:
+                            break
+                        reason = "max_sessions" if count > self.max_sessions else "max_bytes"
+                        evicted[reason].append(session_id)
+                        count -= 1
+                        total_bytes -= size_bytes
+                    self._delete_sessions(conn, evicted["max_sessions"] + evicted["max_bytes"])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            for reason, session_ids in evicted.items():
+                self.evictions[reason] += len(session_ids)
+        return sum(len(session_ids) for session_ids in evicted.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total_bytes = self._get_conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM sessions"
+            ).fetchone()
+            return {
+                "backend": "sqlite",
+                "sessions": count,
+                "resident_bytes": total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": dict(self.evictions),
+                "cache": {
+                    "sessions": len(self._cache),
+                    "hits": self.cache_hits,
+                    "misses": self.cache_misses
+                }
+            }
+
+
+def create_session_store() -> SessionStore:
+    """Build the session backend selected by SESSION_BACKEND"""
+    ttl_seconds = settings.SESSION_TIMEOUT_MINUTES * 60
+    max_bytes = settings.SESSION_MAX_MB * 1024 * 1024
+    if settings.SESSION_BACKEND == "memory":
+        return InMemorySessionStore(
+            ttl_seconds, settings.SESSION_MAX_COUNT, max_bytes, settings.SESSION_CONTEXT_TURNS
+        )
+    if settings.SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore(
+            settings.SESSION_DB,
+            ttl_seconds,
+            settings.SESSION_MAX_COUNT,
+            max_bytes,
+            cache_sessions=settings.SESSION_CACHE_SIZE,
+            context_turns=settings.SESSION_CONTEXT_TURNS
+        )
+    raise ValueError(f"Unknown SESSION_BACKEND '{settings.SESSION_BACKEND}': use 'memory' or 'sqlite'")
@@ -0,0 +1,106 @@
+"""
+Snapshot bundle format for vector index export/import
+
+A snapshot is an uncompressed tar file:
+
+    manifest.json        embedding model, dimensions, namespace, row count
+    part-00000.json      columns: ids, documents, metadatas
+    part-00000.npy       float32 matrix of embeddings, one row per id
+    part-00001.json
+    ...
+
+Parts are written and read one at a time, so memory stays bounded by the
+part size rather than the size of the index.
+"""
+import io
+import json
+import tarfile
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def _add_member(tar: tarfile.TarFile, name: str, data: bytes):
+    """Append one in-memory file to the tar stream"""
+    info = tarfile.TarInfo(name=name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+
+
+class SnapshotWriter:
+    """Streams collection rows into a snapshot bundle"""
+
+    def __init__(self, path: str, manifest: Dict[str, Any]):
+        self.path = path
+        self.manifest = dict(manifest, format_version=SNAPSHOT_FORMAT_VERSION)
+        self._tar = tarfile.open(path, mode="w|")
+        self._parts = 0
+        self.rows = 0
+        _add_member(self._tar, "manifest.json", json.dumps(self.manifest).encode("utf-8"))
+
+    def write_part(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """Write one part (columns plus vector matrix)"""
+        name = f"part-{self._parts:05d}"
+        columns = {"ids": ids, "documents": documents, "metadatas": metadatas}
+        _add_member(self._tar, f"{name}.json", json.dumps(columns).encode("utf-8"))
+
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(embeddings, dtype=np.float32))
+        _add_member(self._tar, f"{name}.npy", buffer.getvalue())
+
+        self._parts += 1
+        self.rows += len(ids)
+
+    def close(self):
+        self._tar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_snapshot(path: str) -> Iterator[Tuple[str, Any]]:
+    """
+    Stream a snapshot bundle
+
+    Yields:
+        ("manifest", dict) first, then ("part", (ids, embeddings, documents, metadatas))
+        for each part, where embeddings is a float32 numpy matrix
+    """
+    with tarfile.open(path, mode="r|") as tar:
+        columns = None
+        for member in tar:
+            data = tar.extractfile(member).read()
+
+            if member.name == "manifest.json":
+                manifest = json.loads(data)
+                if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+                    raise ValueError(
+                        f"Unsupported snapshot format: {manifest.get('format_version')}"
+                    )
+                yield "manifest", manifest
+            elif member.name.endswith(".json"):
+                columns = json.loads(data)
+            elif member.name.endswith(".npy"):
+                if columns is None:
+                    raise ValueError(f"Snapshot part {member.name} has no columns")
+                embeddings = np.load(io.BytesIO(data), allow_pickle=False)
+                yield "part", (
+                    columns["ids"],
+                    embeddings,
+                    columns["documents"],
+                    columns["metadatas"]
+                )
+                columns = None
@@ -10,11 +10,25 @@ os.environ["ANONYMIZED_TELEMETRY"] = "False"
 # Suppress ChromaDB telemetry errors
 logging.getLogger("chromadb.telemetry.product.posthog").setLevel(logging.CRITICAL)
 
-from typing import List, Dict, Any
+import re
+import json
+import hashlib
+import time
+import uuid
+import threading
+import traceback
+from datetime import datetime
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Iterable
 from pathlib import Path
 from langchain_community.vectorstores import Chroma
 from langchain.schema import Document
 from core.embeddings import embedding_manager
+from core.registry import SourceRegistry
+from core.dedup import NearDuplicateFilter, simhash, to_hex, max_distance_for
+from core.cache import RetrievalCache
+from core.snapshot import SnapshotWriter, iter_snapshot
 from app.config import settings
 import chromadb
 from chromadb.config import Settings as ChromaSettings
@@ -23,57 +37,250 @@ from chromadb.config import Settings as ChromaSettings
 class VectorStoreManager:
     """Manages vector database operations"""
     
+    # Chunks embedded per request, and written per upsert
+    embed_batch_size = 50
+    upsert_batch_size = 10
+    
+    # Chunks whose metadata is refreshed per collection.update() call
+    metadata_update_batch_size = 100
+    
+    # Chunk IDs removed per collection.delete() call
+    delete_batch_size = 500
+    
+    # Rows per snapshot part, and per upsert when importing one
+    snapshot_part_size = 1000
+    snapshot_upsert_size = 100
+    
+    # Namespaces become part of a Chroma collection name
+    namespace_pattern = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,39}$')
+    
+    # Embedded conversation turns live in their own collection, outside the
+    # document namespaces; this key can't clash with a namespace
+    memory_collection_key = "#memory"
+    
     def __init__(self):
         self.persist_dir = settings.CHROMA_PERSIST_DIR
         self.collection_name = settings.COLLECTION_NAME
-        self._vectorstore = None
+        self.default_namespace = settings.DEFAULT_NAMESPACE
+        self._vectorstores: Dict[str, Chroma] = {}
+        self._collections: Dict[str, Any] = {}
+        self._registries: Dict[str, SourceRegistry] = {}
+        self._registry_synced = set()
         self._client = None
+        self._client_lock = threading.RLock()
+        self._last_heartbeat = 0.0
+        
+        # "embedded" opens the persist dir in-process; "server" shares one Chroma server
+        self.mode = settings.CHROMA_MODE
+        if self.mode not in ("embedded", "server"):
+            raise ValueError(f"Unknown CHROMA_MODE '{self.mode}': use 'embedded' or 'server'")
+        
+        # Near-duplicate chunks at ingest: "off", "drop" (discard) or "link" (record, don't store)
+        self.dedup_mode = settings.DEDUP_MODE
+        if self.dedup_mode not in ("off", "drop", "link"):
+            raise ValueError(f"Unknown DEDUP_MODE '{self.dedup_mode}': use 'off', 'drop' or 'link'")
         
         # Create persist directory if it doesn't exist
         Path(self.persist_dir).mkdir(parents=True, exist_ok=True)
+        
+        # Parallel fan-out for queries spanning several namespaces
+        self._query_pool = ThreadPoolExecutor(
+            max_workers=settings.QUERY_FANOUT_WORKERS,
+            thread_name_prefix="chroma-query"
+        )
+        
+        # Search results keyed by query and collection version
+        self.retrieval_cache = RetrievalCache(settings.RETRIEVAL_CACHE_SIZE)
     
-    def get_client(self):
-        """Get ChromaDB client directly (like FinBot_Final)"""
-        if self._client is None:
-            # Disable telemetry
-            os.environ["ANONYMIZED_TELEMETRY"] = "False"
-            print(f"[ChromaDB] Using path: {self.persist_dir}")
-            
-            # Create client with telemetry disabled in settings
-            client_settings = ChromaSettings(
-                anonymized_telemetry=False,
-                allow_reset=True
+    def resolve_namespace(self, namespace: Optional[str] = None) -> str:
+        """Validate a namespace name, falling back to the default"""
+        if not namespace:
+            return self.default_namespace
+        if not self.namespace_pattern.match(namespace):
+            raise ValueError(
+                f"Invalid namespace '{namespace}': use up to 40 letters, digits, '-' or '_'"
+            )
+        return namespace
+    
+    def _collection_name_for(self, namespace: str) -> str:
+        """Chroma collection backing a namespace"""
+        if namespace == self.default_namespace:
+            return self.collection_name
+        return f"{self.collection_name}_ns_{namespace}"
+    
+    def get_registry(self, namespace: Optional[str] = None) -> SourceRegistry:
+        """Source -> chunk ID registry, stored next to the namespace's collection"""
+        namespace = self.resolve_namespace(namespace)
+        if namespace not in self._registries:
+            name = self._collection_name_for(namespace)
+            self._registries[namespace] = SourceRegistry(
+                str(Path(self.persist_dir) / f"{name}_registry.sqlite3"),
+                fingerprint_distance=max_distance_for(settings.DEDUP_THRESHOLD)
             )
-            self._client = chromadb.PersistentClient(
-                path=self.persist_dir,
+        return self._registries[namespace]
+    
+    def list_namespaces(self) -> List[str]:
+        """List namespaces that have a collection"""
+        prefix = f"{self.collection_name}_ns_"
+        namespaces = []
+        for collection in self.get_client().list_collections():
+            if collection.name == self.collection_name:
+                namespaces.append(self.default_namespace)
+            elif collection.name.startswith(prefix):
+                namespaces.append(collection.name[len(prefix):])
+        return sorted(namespaces)
+    
+    def _create_client(self):
+        """Open an embedded client or connect to the shared Chroma server"""
+        # Disable telemetry
+        os.environ["ANONYMIZED_TELEMETRY"] = "False"
+        
+        # Create client with telemetry disabled in settings
+        client_settings = ChromaSettings(
+            anonymized_telemetry=False,
+            allow_reset=True
+        )
+        
+        if self.mode == "server":
+            print(f"[ChromaDB] Connecting to server: {settings.CHROMA_SERVER_HOST}:{settings.CHROMA_SERVER_PORT}")
+            return chromadb.HttpClient(
+                host=settings.CHROMA_SERVER_HOST,
+                port=settings.CHROMA_SERVER_PORT,
                 settings=client_settings
             )
-        return self._client
+        
+        print(f"[ChromaDB] Using path: {self.persist_dir}")
+        return chromadb.PersistentClient(
+            path=self.persist_dir,
+            settings=client_settings
+        )
     
-    def get_collection(self):
-        """Get or create collection directly"""
-        client = self.get_client()
-        collection = client.get_or_create_collection(name=self.collection_name)
-        print(f"[ChromaDB] Collection '{self.collection_name}' count = {collection.count()}")
-        return collection
+    def get_client(self):
+        """
+        Get ChromaDB client directly (like FinBot_Final)
+        
+        In server mode the connection is heartbeat-checked at most once per
+        CHROMA_HEALTHCHECK_INTERVAL_SECONDS and re-established if it failed.
+        """
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._create_client()
+                self._last_heartbeat = time.monotonic()
+            elif (
+                self.mode == "server"
+                and time.monotonic() - self._last_heartbeat > settings.CHROMA_HEALTHCHECK_INTERVAL_SECONDS
+            ):
+                try:
+                    self._client.heartbeat()
+                    self._last_heartbeat = time.monotonic()
+                except Exception as e:
+                    print(f"[ChromaDB] Heartbeat failed ({type(e).__name__}: {e}), reconnecting")
+                    self.reconnect()
+            return self._client
+    
+    def reconnect(self):
+        """Drop the client and every cached collection handle, then connect again"""
+        with self._client_lock:
+            self._client = None
+            self._collections.clear()
+            self._vectorstores.clear()
+            self._client = self._create_client()
+            self._last_heartbeat = time.monotonic()
     
-    def get_vectorstore(self) -> Chroma:
+    def health_check(self) -> Dict[str, Any]:
+        """Ping the vector store and report latency"""
+        start = time.perf_counter()
+        try:
+            self.get_client().heartbeat()
+            with self._client_lock:
+                self._last_heartbeat = time.monotonic()
+            return {
+                "mode": self.mode,
+                "healthy": True,
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2)
+            }
+        except Exception as e:
+            return {
+                "mode": self.mode,
+                "healthy": False,
+                "error": f"{type(e).__name__}: {e}"
+            }
+    
+    def _with_reconnect(self, func, *args):
+        """Call func, reconnecting and retrying once if the server connection dropped"""
+        try:
+            return func(*args)
+        except Exception:
+            if self.mode != "server":
+                raise
+            try:
+                self.get_client().heartbeat()
+            except Exception as e:
+                print(f"[ChromaDB] Connection lost ({type(e).__name__}: {e}), reconnecting")
+                self.reconnect()
+                return func(*args)
+            raise
+    
+    def get_collection(self, namespace: Optional[str] = None):
+        """Get or create a namespace's collection directly"""
+        namespace = self.resolve_namespace(namespace)
+        with self._client_lock:
+            if namespace not in self._collections:
+                client = self.get_client()
+                name = self._collection_name_for(namespace)
+                try:
+                    collection = client.get_collection(name=name)
+                    self._warn_on_index_drift(collection)
+                except Exception:
+                    # HNSW parameters can only be set when the collection is created
+                    collection = client.get_or_create_collection(
+                        name=name,
+                        metadata=self.index_metadata()
+                    )
+                print(f"[ChromaDB] Collection '{name}' count = {collection.count()}")
+                self._collections[namespace] = collection
+            return self._collections[namespace]
+    
+    @staticmethod
+    def index_metadata() -> Dict[str, Any]:
+        """Distance function and HNSW parameters for new collections"""
+        return {
+            "hnsw:space": settings.CHROMA_DISTANCE,
+            "hnsw:M": settings.HNSW_M,
+            "hnsw:construction_ef": settings.HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": settings.HNSW_SEARCH_EF
+        }
+    
+    def _warn_on_index_drift(self, collection):
+        """Report when an existing collection was built with other index settings"""
+        existing = collection.metadata or {}
+        defaults = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+        for key, wanted in self.index_metadata().items():
+            actual = existing.get(key, defaults[key])
+            if actual != wanted:
+                print(
+                    f"[ChromaDB] Collection '{collection.name}' has {key}={actual} "
+                    f"(settings want {wanted}); re-create it to apply"
+                )
+    
+    def get_vectorstore(self, namespace: Optional[str] = None) -> Chroma:
         """Get or create vector store (for LangChain compatibility)"""
-        if self._vectorstore is None:
+        namespace = self.resolve_namespace(namespace)
+        if namespace not in self._vectorstores:
             # Disable telemetry to avoid PostHog errors
             os.environ["ANONYMIZED_TELEMETRY"] = "False"
             
             # Initialize using direct client first
             client = self.get_client()
-            collection = self.get_collection()
+            self.get_collection(namespace)
             
             # Now create LangChain wrapper
-            self._vectorstore = Chroma(
+            self._vectorstores[namespace] = Chroma(
                 client=client,
-                collection_name=self.collection_name,
+                collection_name=self._collection_name_for(namespace),
                 embedding_function=embedding_manager.get_embeddings()
             )
-        return self._vectorstore
+        return self._vectorstores[namespace]
     
     def _sanitize_metadata(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """Sanitize metadata for ChromaDB compatibility"""
@@ -101,76 +308,118 @@ class VectorStoreManager:
     def add_documents(
         self, 
         documents: List[Document],
-        metadatas: List[Dict[str, Any]] = None
+        metadatas: List[Dict[str, Any]] = None,
+        namespace: Optional[str] = None,
+        progress: Optional[Callable[[str, int], None]] = None
     ) -> List[str]:
-        """Add documents to vector store (hybrid approach)"""
+        """
+        Add documents to a namespace's collection (hybrid approach)
+        
+        Args:
+            documents: Chunks to add
+            metadatas: Extra metadata merged into each chunk
+            namespace: Target namespace (default namespace if None)
+            progress: Called as progress(counter, value) with running
+                "chunks_embedded" and "chunks_written" totals
+        """
+        print(f"[VectorStore] Adding {len(documents)} documents...")
+        
+        # Add metadata if provided
+        if metadatas:
+            for doc, metadata in zip(documents, metadatas):
+                doc.metadata.update(metadata)
+        
+        return self.add_documents_stream(documents, namespace=namespace, progress=progress)
+    
+    def add_documents_stream(
+        self,
+        documents: Iterable[Document],
+        namespace: Optional[str] = None,
+        progress: Optional[Callable[[str, int], None]] = None
+    ) -> List[str]:
+        """
+        Embed and upsert chunks as they are produced
+        
+        Pulls embed_batch_size chunks at a time from the iterable, so only one
+        batch of texts and vectors is held in memory, and each batch is
+        searchable as soon as it is written.
+        
+        Args:
+            documents: Chunks to add (any iterable, typically a generator)
+            namespace: Target namespace (default namespace if None)
+            progress: Called as progress(counter, value) with running
+                "chunks_embedded" and "chunks_written" totals
+        
+        Returns:
+            IDs of the written chunks
+        
+        If the iterable raises or a batch fails to write, chunks already
+        written by this call are deleted again before the error propagates.
+        """
+        namespace = self.resolve_namespace(namespace)
+        all_ids = []
         try:
-            print(f"[VectorStore] Adding {len(documents)} documents...")
-            
-            # Add metadata if provided
-            if metadatas:
-                for doc, metadata in zip(documents, metadatas):
-                    doc.metadata.update(metadata)
-            
             # Get collection directly (like FinBot_Final)
-            collection = self.get_collection()
+            collection = self.get_collection(namespace)
             embeddings_model = embedding_manager.get_embeddings()
             
-            # Sanitize all data first
-            import uuid
-            all_ids = []
-            texts = [doc.page_content.replace('\x00', '') for doc in documents]
-            metadatas_list = [self._sanitize_metadata(doc.metadata) for doc in documents]
-            
-            # Generate embeddings in batches
-            print(f"[VectorStore] Generating embeddings in batches...")
-            batch_size = 50
-            all_embeddings = []
-            for i in range(0, len(texts), batch_size):
-                batch_texts = texts[i:i+batch_size]
-                print(f"[VectorStore] Embedding batch {i//batch_size + 1}/{(len(texts)-1)//batch_size + 1}")
-                batch_embeddings = embeddings_model.embed_documents(batch_texts)
-                all_embeddings.extend(batch_embeddings)
-            print(f"[VectorStore] Generated {len(all_embeddings)} embeddings total")
-            
-            # Generate IDs
-            ids = [str(uuid.uuid4()) for _ in range(len(documents))]
+            embedded = 0
+            documents = iter(documents)
+            batch_number = 0
             
-            # Add to ChromaDB using small batches (10 at a time) to avoid crash
-            # ChromaDB has issues with both large batches and rapid individual upserts
-            print(f"[VectorStore] Adding {len(documents)} documents in small batches...", flush=True)
-            import sys, time
-            
-            batch_size_upsert = 10  # Very small batches
-            for i in range(0, len(documents), batch_size_upsert):
-                try:
-                    end_idx = min(i + batch_size_upsert, len(documents))
-                    batch_ids = ids[i:end_idx]
-                    batch_embeddings = all_embeddings[i:end_idx]
-                    batch_texts = texts[i:end_idx]
-                    batch_metadatas = metadatas_list[i:end_idx]
-                    
-                    print(f"[VectorStore] Progress: {i}/{len(documents)} documents (batch {i//batch_size_upsert + 1}/{(len(documents)-1)//batch_size_upsert + 1})", flush=True)
-                    sys.stdout.flush()
-                    
-                    # Use existing collection, don't recreate
-                    collection.upsert(
-                        ids=batch_ids,
-                        embeddings=batch_embeddings,
-                        documents=batch_texts,
-                        metadatas=batch_metadatas
-                    )
-                    all_ids.extend(batch_ids)
-                    
-                    # Small delay to let ChromaDB persist
-                    time.sleep(0.1)
-                    
-                except Exception as upsert_err:
-                    print(f"[VectorStore][ERROR] Failed at batch {i//batch_size_upsert + 1}: {type(upsert_err).__name__}: {upsert_err}", flush=True)
-                    import traceback
-                    traceback.print_exc()
-                    # Continue with remaining batches
-                    continue
+            while True:
+                batch = list(islice(documents, self.embed_batch_size))
+                if not batch:
+                    break
+                batch_number += 1
+                
+                # Sanitize and embed one batch
+                texts = [doc.page_content.replace('\x00', '') for doc in batch]
+                for doc, text in zip(batch, texts):
+                    doc.metadata.setdefault('content_hash', self.content_hash(text))
+                    if 'simhash' not in doc.metadata:
+                        fingerprint = simhash(text)
+                        if fingerprint is not None:
+                            doc.metadata['simhash'] = to_hex(fingerprint)
+                metadatas_list = [self._sanitize_metadata(doc.metadata) for doc in batch]
+                print(f"[VectorStore] Embedding batch {batch_number} ({len(texts)} chunks)")
+                embeddings = embeddings_model.embed_documents(texts)
+                embedded += len(embeddings)
+                if progress:
+                    progress("chunks_embedded", embedded)
+                
+                ids = [str(uuid.uuid4()) for _ in batch]
+                
+                # Add to ChromaDB using small batches (10 at a time) to avoid crash
+                # ChromaDB has issues with both large batches and rapid individual upserts
+                for i in range(0, len(batch), self.upsert_batch_size):
+                    try:
+                        end_idx = min(i + self.upsert_batch_size, len(batch))
+                        batch_ids = ids[i:end_idx]
+                        batch_metadatas = metadatas_list[i:end_idx]
+                        
+                        # Use existing collection, don't recreate
+                        collection.upsert(
+                            ids=batch_ids,
+                            embeddings=embeddings[i:end_idx],
+                            documents=texts[i:end_idx],
+                            metadatas=batch_metadatas
+                        )
+                        all_ids.extend(batch_ids)
+                        self._register_ids(namespace, batch_ids, batch_metadatas)
+                        if progress:
+                            progress("chunks_written", len(all_ids))
+                        
+                        # Small delay to let ChromaDB persist
+                        time.sleep(0.1)
+                        
+                    except Exception as upsert_err:
+                        print(f"[VectorStore][ERROR] Failed at batch {batch_number}.{i//self.upsert_batch_size + 1}: {type(upsert_err).__name__}: {upsert_err}", flush=True)
+                        # A document missing some of its chunks must not be
+                        # recorded as ingested; fail it (and roll back) instead
+                        raise
+                
+                print(f"[VectorStore] Progress: {len(all_ids)}/{embedded} documents written", flush=True)
             
             print(f"[VectorStore] Successfully added {len(all_ids)} documents")
             
@@ -185,53 +434,642 @@ class VectorStoreManager:
             
         except Exception as e:
             print(f"[VectorStore][ERROR] Failed to add documents: {type(e).__name__}: {e}")
-            import traceback
             traceback.print_exc()
+            # The source failed part-way through (e.g. a parse error on a later
+            # page); don't leave a partial copy of it searchable
+            if all_ids:
+                print(f"[VectorStore] Rolling back {len(all_ids)} chunks written before the failure")
+                self._delete_ids(namespace, all_ids)
             raise
     
+    def _query_namespace(
+        self,
+        namespace: str,
+        query_embeddings: List[List[float]],
+        k: int,
+        filter_dict: Dict[str, Any] = None
+    ) -> List[List[tuple]]:
+        """Run one multi-query nearest-neighbour search against a namespace's collection"""
+        collection = self.get_collection(namespace)
+        if collection.count() == 0:
+            return [[] for _ in query_embeddings]
+        
+        response = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            where=filter_dict or None,
+            include=["documents", "metadatas", "distances"]
+        )
+        
+        all_results = []
+        for texts, metadatas, distances in zip(
+            response['documents'],
+            response['metadatas'],
+            response['distances']
+        ):
+            results = []
+            for text, metadata, distance in zip(texts, metadatas, distances):
+                metadata = dict(metadata or {})
+                metadata['namespace'] = namespace
+                results.append((Document(page_content=text, metadata=metadata), distance))
+            all_results.append(results)
+        return all_results
+    
+    def _search_embeddings(
+        self,
+        query_embeddings: List[List[float]],
+        k: int,
+        filter_dict: Dict[str, Any] = None,
+        namespaces: Optional[List[str]] = None
+    ) -> List[List[tuple]]:
+        """Search embedded queries across namespaces, merging top-k per query"""
+        resolved = sorted({self.resolve_namespace(ns) for ns in (namespaces or [None])})
+        
+        if len(resolved) == 1:
+            return self._with_reconnect(
+                self._query_namespace, resolved[0], query_embeddings, k, filter_dict
+            )
+        
+        futures = [
+            self._query_pool.submit(
+                self._with_reconnect,
+                self._query_namespace, ns, query_embeddings, k, filter_dict
+            )
+            for ns in resolved
+        ]
+        merged = [[] for _ in query_embeddings]
+        for future in futures:
+            for query_idx, results in enumerate(future.result()):
+                merged[query_idx].extend(results)
+        
+        for results in merged:
+            results.sort(key=lambda item: item[1])
+        return [results[:k] for results in merged]
+    
     def similarity_search(
         self,
         query: str,
         k: int = 5,
-        filter_dict: Dict[str, Any] = None
+        filter_dict: Dict[str, Any] = None,
+        namespaces: Optional[List[str]] = None
     ) -> List[Document]:
         """Search for similar documents"""
-        vectorstore = self.get_vectorstore()
-        
-        if filter_dict:
-            results = vectorstore.similarity_search(
-                query, 
-                k=k,
-                filter=filter_dict
-            )
-        else:
-            results = vectorstore.similarity_search(query, k=k)
-        
-        return results
+        results = self.similarity_search_with_score(
+            query,
+            k=k,
+            filter_dict=filter_dict,
+            namespaces=namespaces
+        )
+        return [doc for doc, _ in results]
     
     def similarity_search_with_score(
         self,
         query: str,
-        k: int = 5
+        k: int = 5,
+        filter_dict: Dict[str, Any] = None,
+        namespaces: Optional[List[str]] = None
     ) -> List[tuple]:
-        """Search with relevance scores"""
-        vectorstore = self.get_vectorstore()
-        return vectorstore.similarity_search_with_score(query, k=k)
-    
-    def delete_collection(self):
-        """Delete the entire collection"""
-        if self._vectorstore:
-            self._vectorstore.delete_collection()
-            self._vectorstore = None
-    
-    def get_document_count(self) -> int:
-        """Get total number of documents"""
+        """
+        Search with relevance scores
+        
+        When several namespaces are given their collections are queried in
+        parallel and the top-k merged by distance.
+        
+        Returns:
+            List of (Document, distance) tuples, closest first
+        """
+        return self.similarity_search_batch(
+            [query],
+            k=k,
+            filter_dict=filter_dict,
+            namespaces=namespaces
+        )[0]
+    
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filter_dict: Dict[str, Any] = None,
+        namespaces: Optional[List[str]] = None
+    ) -> List[List[tuple]]:
+        """
+        Search several queries at once
+        
+        All queries are embedded in one request and sent to each collection
+        as a single multi-query search. Queries already answered for the
+        current collection versions are served from the retrieval cache.
+        
+        Returns:
+            One list of (Document, distance) tuples per query, in input order
+        """
+        if not queries:
+            return []
+        
+        # Read versions before searching: a concurrent write bumps the version
+        # only after it lands, so a result is never cached under a newer version
+        resolved = sorted({self.resolve_namespace(ns) for ns in (namespaces or [None])})
+        versions = tuple((ns, self.get_registry(ns).version()) for ns in resolved)
+        filter_key = json.dumps(filter_dict, sort_keys=True, default=str) if filter_dict else None
+        keys = [
+            (" ".join(query.lower().split()), k, filter_key, versions)
+            for query in queries
+        ]
+        
+        results: List[Optional[List[tuple]]] = [self.retrieval_cache.get(key) for key in keys]
+        missing = [idx for idx, cached in enumerate(results) if cached is None]
+        
+        if missing:
+            query_embeddings = embedding_manager.get_embeddings().embed_documents(
+                [queries[idx] for idx in missing]
+            )
+            fresh = self._search_embeddings(query_embeddings, k, filter_dict, resolved)
+            for idx, query_results in zip(missing, fresh):
+                self.retrieval_cache.put(keys[idx], query_results)
+                results[idx] = query_results
+        
+        # Hand out copies so callers can't modify cached documents
+        return [
+            [
+                (Document(page_content=doc.page_content, metadata=dict(doc.metadata)), score)
+                for doc, score in query_results
+            ]
+            for query_results in results
+        ]
+    
+    def _register_ids(self, namespace: str, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Record upserted chunk IDs under their source document"""
+        by_source: Dict[str, tuple] = {}
+        for chunk_id, metadata in zip(ids, metadatas):
+            source_ids, hashes, fingerprints = by_source.setdefault(
+                metadata.get('source', 'Unknown'), ([], [], [])
+            )
+            source_ids.append(chunk_id)
+            hashes.append(metadata.get('content_hash'))
+            fingerprints.append(metadata.get('simhash'))
+        registry = self.get_registry(namespace)
+        for source, (source_ids, hashes, fingerprints) in by_source.items():
+            registry.add_ids(source, source_ids, hashes, fingerprints)
+    
+    def _sync_registry(self, namespace: str):
+        """Backfill the registry from collection metadata (pre-registry indexes)"""
+        if namespace in self._registry_synced:
+            return
+        self._registry_synced.add(namespace)
+        
+        if self.get_registry(namespace).count() > 0:
+            return
+        
+        collection = self.get_collection(namespace)
+        total = collection.count()
+        if total == 0:
+            return
+        
+        print(f"[VectorStore] Backfilling source registry from {total} chunks...")
+        page_size = 1000
+        for offset in range(0, total, page_size):
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            self._register_ids(namespace, page['ids'], page['metadatas'] or [{}] * len(page['ids']))
+    
+    def _delete_ids(self, namespace: str, ids: List[str]) -> int:
+        """
+        Delete chunks by ID in batches
+        
+        Near-duplicates linked to a deleted chunk whose content is no longer
+        stored anywhere are stored in its place (see _promote_duplicates).
+        """
+        if not ids:
+            return 0
+        
+        collection = self.get_collection(namespace)
+        registry = self.get_registry(namespace)
+        content_hashes = registry.get_content_hashes(ids)
+        deleted = 0
+        for i in range(0, len(ids), self.delete_batch_size):
+            batch_ids = ids[i:i + self.delete_batch_size]
+            collection.delete(ids=batch_ids)
+            registry.remove_ids(batch_ids)
+            deleted += len(batch_ids)
+        
+        print(f"[VectorStore] Deleted {deleted} chunks")
+        self._promote_duplicates(namespace, content_hashes)
+        return deleted
+    
+    def _promote_duplicates(self, namespace: str, content_hashes: List[str]):
+        """
+        Store linked near-duplicates whose canonical chunk is gone
+        
+        For each removed content hash, the first duplicate linked to it is
+        embedded and stored as a chunk of its own source, and the others are
+        linked to that one instead. Duplicates recorded without their text
+        can't be restored that way; their sources' file hashes are cleared so
+        re-uploading them ingests them again.
+        """
+        registry = self.get_registry(namespace)
+        orphans = registry.orphaned_duplicates(content_hashes)
+        if not orphans:
+            return
+        
+        groups: Dict[str, List[tuple]] = {}
+        for row in orphans:
+            groups.setdefault(row[2], []).append(row)
+        
+        promoted = []  # (rowid, Document, rowids to link to it)
+        stranded = set()
+        legacy_rowids = []
+        for rows in groups.values():
+            for rowid, source, _, text, _ in rows:
+                if text is None:
+                    stranded.add(source)
+                    legacy_rowids.append(rowid)
+            with_text = [row for row in rows if row[3] is not None]
+            if with_text:
+                rowid, source, _, text, metadata = with_text[0]
+                doc = Document(page_content=text, metadata=json.loads(metadata or "{}"))
+                doc.metadata['source'] = source
+                promoted.append((rowid, doc, [row[0] for row in with_text[1:]]))
+        
+        if promoted:
+            try:
+                self.add_documents_stream((doc for _, doc, _ in promoted), namespace=namespace)
+                registry.remove_duplicates(rowid for rowid, _, _ in promoted)
+                for _, doc, followers in promoted:
+                    registry.relink_duplicates(followers, doc.metadata['content_hash'])
+                print(f"[VectorStore] Stored {len(promoted)} near-duplicate chunks whose original was removed")
+            except Exception as e:
+                print(f"[VectorStore][ERROR] Storing orphaned near-duplicates failed: {type(e).__name__}: {e}")
+                stranded.update(doc.metadata['source'] for _, doc, _ in promoted)
+        
+        registry.remove_duplicates(legacy_rowids)
+        if stranded:
+            registry.clear_file_hashes(stranded)
+            print(
+                f"[VectorStore][WARN] {len(stranded)} sources lost near-duplicate chunks; "
+                f"re-upload them to restore: {sorted(stranded)}"
+            )
+    
+    def list_sources(self, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        """List ingested source documents with their chunk counts"""
+        namespace = self.resolve_namespace(namespace)
+        self._sync_registry(namespace)
+        return self.get_registry(namespace).list_sources()
+    
+    def has_source(self, source: str, namespace: Optional[str] = None) -> bool:
+        """Check whether a source document is in the store"""
+        namespace = self.resolve_namespace(namespace)
+        self._sync_registry(namespace)
+        return self.get_registry(namespace).has_source(source)
+    
+    def delete_source(self, source: str, namespace: Optional[str] = None) -> int:
+        """
+        Delete all chunks of one source document
+        
+        Returns:
+            Number of chunks deleted
+        """
+        namespace = self.resolve_namespace(namespace)
+        self._sync_registry(namespace)
+        registry = self.get_registry(namespace)
+        registry.set_duplicates(source, [])
+        return self._delete_ids(namespace, registry.get_ids(source))
+    
+    def replace_source(
+        self,
+        source: str,
+        documents: Iterable[Document],
+        namespace: Optional[str] = None,
+        progress: Optional[Callable[[str, int], None]] = None,
+        file_hash: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Swap a source document's chunks for a new version, incrementally
+        
+        Chunks whose content hash matches one of the source's existing
+        chunks keep their ID and embedding (only their metadata is
+        refreshed); only added chunks are embedded and only removed ones
+        are deleted. New chunks are written before stale ones are removed,
+        so the source stays searchable throughout; if any of them fails to
+        write, the update is abandoned before stale chunks are deleted or
+        the file hash is recorded, so the next upload retries it.
+        
+        Unless DEDUP_MODE is "off", added chunks that are near-duplicates
+        (SimHash similarity >= DEDUP_THRESHOLD) of another source's chunks
+        or of an earlier chunk of this document are not embedded; in "link"
+        mode they are recorded (with their text) against the chunk they
+        duplicate, and stored after all if that chunk is later removed.
+        
+        Args:
+            source: Source document name
+            documents: New chunks (any iterable; consumed as it is written)
+            namespace: Namespace holding the source
+            progress: Called as progress(counter, value) for "chunks_reused"
+                and "chunks_duplicate" plus the add_documents_stream counters
+            file_hash: Hash of the file the chunks came from, recorded once
+                the update completes
+        
+        Returns:
+            Dict with the new chunk "ids" and "added", "reused",
+            "duplicates" and "deleted" counts
+        """
+        namespace = self.resolve_namespace(namespace)
+        self._sync_registry(namespace)
+        registry = self.get_registry(namespace)
+        
+        # content hash -> existing chunk IDs still available for reuse
+        existing: Dict[str, List[str]] = {}
+        stale = []
+        for chunk_id, content_hash in registry.get_chunk_hashes(source):
+            if content_hash:
+                existing.setdefault(content_hash, []).append(chunk_id)
+            else:
+                stale.append(chunk_id)  # ingested before hashes were recorded
+        
+        reused_ids = []
+        reused_metadatas = []
+        duplicates = []  # (canonical content hash, page, text, metadata JSON)
+        dedup = None
+        if self.dedup_mode != "off":
+            dedup = NearDuplicateFilter(registry, source, settings.DEDUP_THRESHOLD)
+        
+        def new_chunks(docs: Iterable[Document]):
+            for doc in docs:
+                doc.metadata['source'] = source
+                text = doc.page_content.replace('\x00', '')
+                content_hash = self.content_hash(text)
+                doc.metadata['content_hash'] = content_hash
+                fingerprint = simhash(text)
+                if fingerprint is not None:
+                    doc.metadata['simhash'] = to_hex(fingerprint)
+                
+                matches = existing.get(content_hash)
+                if matches:
+                    reused_ids.append(matches.pop())
+                    reused_metadatas.append(self._sanitize_metadata(doc.metadata))
+                    if dedup:
+                        dedup.accept(fingerprint, content_hash)
+                    if progress:
+                        progress("chunks_reused", len(reused_ids))
+                    continue
+                
+                canonical = dedup.check(fingerprint) if dedup else None
+                if canonical:
+                    duplicates.append((
+                        canonical,
+                        doc.metadata.get('page', 'N/A'),
+                        text,
+                        json.dumps(self._sanitize_metadata(doc.metadata))
+                    ))
+                    if progress:
+                        progress("chunks_duplicate", len(duplicates))
+                    continue
+                
+                if dedup:
+                    dedup.accept(fingerprint, content_hash)
+                yield doc
+        
+        new_ids = self.add_documents_stream(new_chunks(documents), namespace=namespace, progress=progress)
+        
+        # Reused chunks may have moved (page, offsets); refresh their metadata,
+        # and the version with it so cached results don't keep the old values
+        collection = self.get_collection(namespace)
+        for i in range(0, len(reused_ids), self.metadata_update_batch_size):
+            collection.update(
+                ids=reused_ids[i:i + self.metadata_update_batch_size],
+                metadatas=reused_metadatas[i:i + self.metadata_update_batch_size]
+            )
+            registry.touch()
+        
+        # Before deleting: this source's old duplicates mustn't be restored
+        registry.set_duplicates(source, duplicates if self.dedup_mode == "link" else [])
+        
+        stale.extend(chunk_id for ids in existing.values() for chunk_id in ids)
+        deleted = self._delete_ids(namespace, stale)
+        
+        if file_hash and (new_ids or reused_ids):
+            registry.set_file_hash(source, file_hash)
+        
+        print(
+            f"[VectorStore] Updated '{source}': {len(new_ids)} new, {len(reused_ids)} reused, "
+            f"{len(duplicates)} near-duplicate ({self.dedup_mode}), {deleted} deleted chunks"
+        )
+        return {
+            "ids": new_ids,
+            "added": len(new_ids),
+            "reused": len(reused_ids),
+            "duplicates": len(duplicates),
+            "deleted": deleted
+        }
+    
+    def get_file_hash(self, source: str, namespace: Optional[str] = None) -> Optional[str]:
+        """Hash of the file a source's current chunks were ingested from"""
+        namespace = self.resolve_namespace(namespace)
+        return self.get_registry(namespace).get_file_hash(source)
+    
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """Hash identifying a chunk's text"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    def delete_collection(self, namespace: Optional[str] = None):
+        """Delete a namespace's entire collection"""
+        namespace = self.resolve_namespace(namespace)
+        client = self.get_client()
         try:
-            collection = self.get_collection()
-            return collection.count()
+            client.delete_collection(name=self._collection_name_for(namespace))
+        except ValueError:
+            pass  # Collection was never created
+        self._collections.pop(namespace, None)
+        self._vectorstores.pop(namespace, None)
+        self.get_registry(namespace).clear()
+    
+    def export_snapshot(self, path: str, namespace: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Export a namespace's ids, vectors, texts and metadata to a snapshot bundle
+        
+        Rows are read and written one part at a time, so memory use does not
+        grow with the size of the collection.
+        
+        Returns:
+            The snapshot manifest with the number of rows written
+        """
+        namespace = self.resolve_namespace(namespace)
+        collection = self.get_collection(namespace)
+        total = collection.count()
+        include = ["embeddings", "documents", "metadatas"]
+        
+        first = collection.get(include=include, limit=self.snapshot_part_size, offset=0)
+        dims = len(first['embeddings'][0]) if first['ids'] else 0
+        
+        manifest = {
+            "namespace": namespace,
+            "embedding_model": embedding_manager.model,
+            "dimensions": dims,
+            "count": total,
+            "created_at": datetime.utcnow().isoformat()
+        }
+        print(f"[VectorStore] Exporting {total} chunks from '{namespace}' to {path}")
+        
+        with SnapshotWriter(path, manifest) as writer:
+            page = first
+            offset = 0
+            while page['ids']:
+                writer.write_part(
+                    page['ids'],
+                    page['embeddings'],
+                    page['documents'],
+                    page['metadatas']
+                )
+                offset += len(page['ids'])
+                print(f"[VectorStore] Snapshot progress: {offset}/{total}", flush=True)
+                if len(page['ids']) < self.snapshot_part_size:
+                    break
+                page = collection.get(
+                    include=include,
+                    limit=self.snapshot_part_size,
+                    offset=offset
+                )
+        
+        return dict(writer.manifest, rows=writer.rows)
+    
+    def import_snapshot(
+        self,
+        path: str,
+        namespace: Optional[str] = None,
+        allow_model_mismatch: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Load a snapshot bundle into a namespace without re-embedding
+        
+        Args:
+            path: Snapshot file written by export_snapshot
+            namespace: Target namespace (defaults to the snapshot's namespace)
+            allow_model_mismatch: Import even if the snapshot was built with a
+                different embedding model than the one configured
+        
+        Returns:
+            The snapshot manifest with the number of rows imported
+        """
+        imported = 0
+        manifest = None
+        collection = None
+        
+        for kind, payload in iter_snapshot(path):
+            if kind == "manifest":
+                manifest = payload
+                if manifest['embedding_model'] != embedding_manager.model and not allow_model_mismatch:
+                    raise ValueError(
+                        f"Snapshot was built with '{manifest['embedding_model']}', "
+                        f"but EMBEDDING_MODEL is '{embedding_manager.model}'"
+                    )
+                namespace = self.resolve_namespace(namespace or manifest['namespace'])
+                collection = self.get_collection(namespace)
+                self._check_dimensions(collection, manifest['dimensions'])
+                print(f"[VectorStore] Importing {manifest['count']} chunks into '{namespace}' from {path}")
+                continue
+            
+            if manifest is None:
+                raise ValueError("Snapshot is missing its manifest")
+            
+            ids, embeddings, documents, metadatas = payload
+            for i in range(0, len(ids), self.snapshot_upsert_size):
+                end = i + self.snapshot_upsert_size
+                collection.upsert(
+                    ids=ids[i:end],
+                    embeddings=embeddings[i:end].tolist(),
+                    documents=documents[i:end],
+                    metadatas=metadatas[i:end]
+                )
+                self._register_ids(namespace, ids[i:end], metadatas[i:end])
+            imported += len(ids)
+            print(f"[VectorStore] Import progress: {imported}/{manifest['count']}", flush=True)
+        
+        if manifest is None:
+            raise ValueError("Snapshot is missing its manifest")
+        
+        return dict(manifest, namespace=namespace, rows=imported)
+    
+    def _check_dimensions(self, collection, dims: int):
+        """Refuse to mix vectors of different sizes in one collection"""
+        if collection.count() == 0 or not dims:
+            return
+        existing = collection.peek(limit=1)['embeddings']
+        if existing and len(existing[0]) != dims:
+            raise ValueError(
+                f"Snapshot vectors have {dims} dimensions, "
+                f"collection has {len(existing[0])}"
+            )
+    
+    def get_document_count(self, namespaces: Optional[List[str]] = None) -> int:
+        """Get total number of documents across namespaces"""
+        try:
+            resolved = {self.resolve_namespace(ns) for ns in (namespaces or [None])}
+            return sum(
+                self._with_reconnect(lambda ns: self.get_collection(ns).count(), ns)
+                for ns in resolved
+            )
         except Exception as e:
             print(f"[VectorStore] Error getting count: {e}")
             return 0
+    
+    def get_memory_collection(self):
+        """Get or create the collection of embedded conversation turns"""
+        with self._client_lock:
+            if self.memory_collection_key not in self._collections:
+                self._collections[self.memory_collection_key] = self.get_client().get_or_create_collection(
+                    name=f"{self.collection_name}_memory",
+                    metadata=self.index_metadata()
+                )
+            return self._collections[self.memory_collection_key]
+    
+    def add_memory_turns(
+        self,
+        ids: List[str],
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """Store embedded conversation turns"""
+        self._with_reconnect(
+            lambda: self.get_memory_collection().upsert(
+                ids=ids,
+                documents=texts,
+                embeddings=embeddings,
+                metadatas=[self._sanitize_metadata(m) for m in metadatas]
+            )
+        )
+    
+    def search_memory(
+        self,
+        query_embedding: List[float],
+        k: int,
+        filter_dict: Dict[str, Any]
+    ) -> List[tuple]:
+        """
+        Nearest conversation turns matching a metadata filter
+        
+        Returns:
+            List of (text, metadata, distance) tuples, closest first
+        """
+        def query():
+            collection = self.get_memory_collection()
+            if collection.count() == 0:
+                return []
+            response = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=k,
+                where=filter_dict,
+                include=["documents", "metadatas", "distances"]
+            )
+            return list(zip(
+                response['documents'][0],
+                response['metadatas'][0],
+                response['distances'][0]
+            ))
+        
+        return self._with_reconnect(query)
+    
+    def delete_memory(self, filter_dict: Dict[str, Any]):
+        """Delete conversation turns matching a metadata filter"""
+        self._with_reconnect(lambda: self.get_memory_collection().delete(where=filter_dict))
 
 
 # Global instance
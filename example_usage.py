@@ -154,14 +154,9 @@ def example_ingest_document(file_path: str):
             print("Please provide a valid file path")
             return
         
-        # Load document
-        print(f"Loading document: {file_path}")
-        documents = DocumentLoader.load_document(file_path)
-        print(f"Loaded {len(documents)} pages/sections")
-        
-        # Chunk documents
-        print("Chunking document...")
-        chunks = default_chunker.chunk_documents(documents)
+        # Load and chunk the document page by page
+        print(f"Loading and chunking document: {file_path}")
+        chunks = list(default_chunker.iter_chunks(DocumentLoader.iter_document(file_path)))
         print(f"Created {len(chunks)} chunks")
         
         # Add metadata
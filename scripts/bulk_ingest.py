@@ -0,0 +1,229 @@
+"""
+Bulk-ingest a directory tree, resumably
+
+Usage:
+    python scripts/bulk_ingest.py CORPUS_DIR [--namespace NAME] [--workers 4]
+        [--state data/bulk_ingest/corpus.json] [--retry-failed] [--reset]
+
+Walks CORPUS_DIR for supported documents and runs each through the
+parse -> chunk -> embed -> upsert pipeline, several files at a time. Every
+finished file is checkpointed to a JSON state file, so after a crash or
+Ctrl-C the same command picks up where it stopped: files already done (and
+not modified since) are skipped. Each chunk's source is the file's path
+relative to CORPUS_DIR, so files with the same name in different folders
+stay separate.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, List
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.config import settings
+from core.ingestion import ingest_file
+from core.parsing import parsing_pool
+from core.vectorstore import vector_manager
+from utils.document_loader import DocumentLoader
+
+
+class Checkpoint:
+    """Per-file ingestion state, saved atomically after every change"""
+
+    def __init__(self, path: Path, root: str, namespace: str, reset: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {"root": root, "namespace": namespace, "files": {}}
+
+        if path.exists() and not reset:
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get("root") != root or saved.get("namespace") != namespace:
+                raise SystemExit(
+                    f"State file {path} belongs to {saved.get('root')} "
+                    f"(namespace '{saved.get('namespace')}'); use --state or --reset"
+                )
+            self.state = saved
+
+    def is_done(self, rel_path: str, stat: os.stat_result) -> bool:
+        """Finished, and not modified since"""
+        entry = self.state["files"].get(rel_path)
+        return (
+            entry is not None
+            and entry["status"] == "done"
+            and entry["size"] == stat.st_size
+            and entry["mtime"] == stat.st_mtime
+        )
+
+    def has_failed(self, rel_path: str) -> bool:
+        entry = self.state["files"].get(rel_path)
+        return entry is not None and entry["status"] == "failed"
+
+    def record(self, rel_path: str, entry: Dict[str, Any]):
+        with self._lock:
+            self.state["files"][rel_path] = dict(entry, updated_at=datetime.utcnow().isoformat())
+            self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def find_documents(root: Path) -> List[Path]:
+    """Supported documents under root, in a stable order"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for filename in sorted(filenames):
+            if Path(filename).suffix.lower() in DocumentLoader.supported_extensions:
+                found.append(Path(dirpath) / filename)
+    return found
+
+
+def default_state_path(root: str, namespace: str) -> Path:
+    """State file under data/bulk_ingest, one per (directory, namespace)"""
+    key = hashlib.sha256(f"{root}\0{namespace}".encode("utf-8")).hexdigest()[:12]
+    return Path(settings.UPLOAD_DIR).parent / "bulk_ingest" / f"{Path(root).name}-{namespace}-{key}.json"
+
+
+def main():
+    """Run the bulk ingestion CLI"""
+    parser = argparse.ArgumentParser(description="Resumable bulk directory ingestion")
+    parser.add_argument("directory", help="Directory tree to ingest")
+    parser.add_argument("--namespace", default=None)
+    parser.add_argument("--workers", type=int, default=settings.INGEST_WORKERS, help="Files ingested at once")
+    parser.add_argument("--state", default=None, help="Checkpoint file (default: under data/bulk_ingest)")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files that failed last run")
+    parser.add_argument("--reset", action="store_true", help="Ignore the existing checkpoint")
+    args = parser.parse_args()
+
+    root = Path(args.directory).resolve()
+    if not root.is_dir():
+        raise SystemExit(f"Not a directory: {root}")
+    namespace = vector_manager.resolve_namespace(args.namespace)
+    state_path = Path(args.state) if args.state else default_state_path(str(root), namespace)
+    checkpoint = Checkpoint(state_path, str(root), namespace, reset=args.reset)
+
+    # Work out what is left to do
+    pending = []
+    skipped = 0
+    for path in find_documents(root):
+        rel_path = path.relative_to(root).as_posix()
+        if checkpoint.is_done(rel_path, path.stat()):
+            skipped += 1
+        elif checkpoint.has_failed(rel_path) and not args.retry_failed:
+            skipped += 1
+        else:
+            pending.append((path, rel_path))
+
+    print(
+        f"[BulkIngest] {root} -> namespace '{namespace}': {len(pending)} to ingest, "
+        f"{skipped} already done or failed (checkpoint: {state_path})"
+    )
+    if not pending:
+        return
+
+    totals = {"files": 0, "failed": 0, "chunks": 0, "new": 0, "reused": 0, "tokens": 0}
+    start = time.perf_counter()
+
+    def run(path: Path, rel_path: str) -> Dict[str, Any]:
+        stat = path.stat()
+        file_start = time.perf_counter()
+        try:
+            result = ingest_file(str(path), source=rel_path, namespace=namespace)
+        except Exception as e:
+            checkpoint.record(rel_path, {
+                "status": "failed",
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "error": f"{type(e).__name__}: {e}"
+            })
+            raise
+        checkpoint.record(rel_path, {
+            "status": "done",
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "chunks": result["chunks_created"],
+            "tokens": result["tokens"],
+            "seconds": round(time.perf_counter() - file_start, 2)
+        })
+        return result
+
+    # Keep a bounded number of files in flight so Ctrl-C only has to wait for those
+    executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="bulk-ingest")
+    queue = list(reversed(pending))
+    in_flight = {}
+    done_count = 0
+
+    try:
+        while queue or in_flight:
+            while queue and len(in_flight) < args.workers * 2:
+                path, rel_path = queue.pop()
+                in_flight[executor.submit(run, path, rel_path)] = rel_path
+
+            finished, _ = wait(in_flight, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in finished:
+                rel_path = in_flight.pop(future)
+                done_count += 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    totals["failed"] += 1
+                    print(f"[BulkIngest] [{done_count}/{len(pending)}] {rel_path}: FAILED {type(e).__name__}: {e}")
+                    continue
+                totals["files"] += 1
+                totals["chunks"] += result["chunks_created"]
+                totals["new"] += result["chunks_new"]
+                totals["reused"] += result["chunks_reused"]
+                totals["tokens"] += result["tokens"]
+                print(
+                    f"[BulkIngest] [{done_count}/{len(pending)}] {rel_path}: {result['status']}, "
+                    f"{result['chunks_created']} chunks ({result['chunks_new']} new)",
+                    flush=True
+                )
+
+    except KeyboardInterrupt:
+        print(
+            f"\n[BulkIngest] Interrupted; finishing {len(in_flight)} in-flight files "
+            f"(Ctrl-C again to abort them). Re-run the same command to resume."
+        )
+        queue.clear()
+        for future in in_flight:
+            future.cancel()
+        try:
+            wait(in_flight)
+        except KeyboardInterrupt:
+            print("[BulkIngest] Aborted; unfinished files will be redone on resume")
+            os._exit(130)
+
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        parsing_pool.shutdown()
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"\n[BulkIngest] {totals['files']} files ingested, {totals['failed']} failed "
+            f"in {elapsed:.1f}s"
+        )
+        print(
+            f"[BulkIngest] {totals['files'] / elapsed:.2f} files/s, "
+            f"{totals['chunks'] / elapsed:.1f} chunks/s, "
+            f"{totals['tokens'] / elapsed:.0f} tokens/s "
+            f"({totals['new']} chunks embedded, {totals['reused']} reused)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Export or import a vector index snapshot
+
+Usage:
+    python scripts/snapshot.py export data/snapshots/base.tar [--namespace NAME]
+    python scripts/snapshot.py import data/snapshots/base.tar [--namespace NAME]
+
+A new node can import a snapshot taken on another node instead of
+re-uploading and re-embedding every document.
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.vectorstore import vector_manager
+
+
+def main():
+    """Run the snapshot CLI"""
+    parser = argparse.ArgumentParser(description="Vector index snapshot export/import")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot file")
+    parser.add_argument("--namespace", default=None, help="Namespace to export from / import into")
+    parser.add_argument(
+        "--allow-model-mismatch",
+        action="store_true",
+        help="Import even if the snapshot used a different embedding model"
+    )
+    args = parser.parse_args()
+    
+    if args.action == "export":
+        Path(args.path).parent.mkdir(parents=True, exist_ok=True)
+        result = vector_manager.export_snapshot(args.path, namespace=args.namespace)
+        print(f"Exported {result['rows']} chunks ({result['dimensions']} dims) to {args.path}")
+    else:
+        result = vector_manager.import_snapshot(
+            args.path,
+            namespace=args.namespace,
+            allow_model_mismatch=args.allow_model_mismatch
+        )
+        print(f"Imported {result['rows']} chunks into namespace '{result['namespace']}'")
+
+
+if __name__ == "__main__":
+    main()
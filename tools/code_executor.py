@@ -1,130 +1,558 @@
 """
 Sandboxed Python code execution
 """
-import sys
-import io
-import traceback
-from typing import Dict, Any
-from contextlib import redirect_stdout, redirect_stderr
-import signal
+import time
+import queue
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 from app.config import settings
+from tools.code_worker import worker_main
+from utils.processes import spawn_context
 
 
-class TimeoutException(Exception):
-    """Raised when code execution times out"""
-    pass
+def _wall_usage(start: float) -> Dict[str, Any]:
+    """Usage of a run the worker couldn't report on"""
+    return {
+        'wall_seconds': round(time.perf_counter() - start, 3),
+        'cpu_seconds': None,
+        'peak_rss_mb': None
+    }
 
 
-def timeout_handler(signum, frame):
-    """Handle timeout signal"""
-    raise TimeoutException("Code execution timed out")
-
-
-class CodeExecutor:
-    """Execute Python code in a restricted environment"""
+class CodeWorker:
+    """One warm worker process and the pipe to it"""
     
-    def __init__(self):
-        self.timeout = settings.CODE_TIMEOUT_SECONDS
+    def __init__(self, context, limits: Optional[Dict[str, int]] = None, persistent: bool = False):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=worker_main,
+            args=(child_conn, limits, persistent),
+            name="code-worker",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.runs = 0
+    
+    def wait_ready(self, timeout: float) -> bool:
+        """Wait for the worker to finish importing its libraries"""
+        if not self.ready and self.conn.poll(timeout):
+            self.ready = bool(self.conn.recv().get("ready"))
+        return self.ready
     
-    def execute(self, code: str) -> Dict[str, Any]:
+    def run(self, code: str, timeout: float) -> Optional[Dict[str, Any]]:
         """
-        Execute Python code and return results
+        Run code on the worker
         
         Returns:
-            dict with 'success', 'output', 'error' keys
-        """
-        # Create isolated namespace
-        namespace = {
-            '__builtins__': __builtins__,
-            'print': print,
-        }
-        
-        # Safe imports allowed
-        safe_imports = {
-            'math': __import__('math'),
-            'datetime': __import__('datetime'),
-            'json': __import__('json'),
-            're': __import__('re'),
-        }
-        
-        # Try to import data science libraries (if available)
-        try:
-            import pandas as pd
-            import numpy as np
-            safe_imports['pd'] = pd
-            safe_imports['pandas'] = pd
-            safe_imports['np'] = np
-            safe_imports['numpy'] = np
-        except ImportError:
-            pass
+            The worker's result, or None if it didn't finish within timeout
         
+        Raises:
+            EOFError: If the worker process died
+        """
+        self.conn.send({"code": code})
+        if not self.conn.poll(timeout):
+            return None
+        return self.conn.recv()
+    
+    def describe(self, timeout: float) -> Optional[List[str]]:
+        """The variables defined in the worker's namespace, or None on timeout"""
+        self.conn.send({"describe": True})
+        if not self.conn.poll(timeout):
+            return None
+        return self.conn.recv()
+    
+    def stop(self):
+        """Ask the worker to exit, killing it if it doesn't"""
         try:
-            import matplotlib
-            matplotlib.use('Agg')  # Non-interactive backend
-            import matplotlib.pyplot as plt
-            safe_imports['plt'] = plt
-            safe_imports['matplotlib'] = matplotlib
-        except ImportError:
+            self.conn.send(None)
+        except (OSError, ValueError):
             pass
+        self.process.join(1)
+        self.kill()
+    
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+        self.conn.close()
+
+
+class CodeWorkerPool:
+    """
+    Pre-started worker processes that run generated code
+    
+    Workers import pandas/numpy/matplotlib once at startup, so a run only
+    pays for the code itself, and each run gets a fresh namespace. Runs go
+    to idle workers over pipes, so up to `size` run in parallel, each in
+    its own process. A run that exceeds the timeout has its worker killed,
+    and workers are replaced after max_runs runs so state that leaks
+    between runs (module globals, memory) doesn't build up.
+    
+    Workers run under resource limits (on POSIX): CODE_MAX_MEMORY_MB of
+    address space beyond what the preloaded libraries use,
+    CODE_MAX_CPU_SECONDS of CPU per run, CODE_MAX_OPEN_FILES open files and
+    CODE_MAX_FILE_MB per written file; output beyond CODE_MAX_OUTPUT_KB is
+    cut. Each result reports the run's wall time, CPU time and peak RSS.
+    """
+    
+    # Longest wait for a new worker's imports
+    startup_timeout = 60
+    
+    def __init__(
+        self,
+        size: int = settings.CODE_WORKERS,
+        max_runs: int = settings.CODE_WORKER_MAX_RUNS,
+        timeout: int = settings.CODE_TIMEOUT_SECONDS,
+        limits: Optional[Dict[str, int]] = None
+    ):
+        self.size = max(1, size)
+        self.max_runs = max(1, max_runs)
+        self.timeout = timeout
+        self.limits = limits if limits is not None else {
+            "memory_mb": settings.CODE_MAX_MEMORY_MB,
+            "cpu_seconds": settings.CODE_MAX_CPU_SECONDS,
+            "open_files": settings.CODE_MAX_OPEN_FILES,
+            "file_mb": settings.CODE_MAX_FILE_MB,
+            "output_kb": settings.CODE_MAX_OUTPUT_KB
+        }
+        # spawn: the workers don't inherit the API process's threads or state,
+        # and only import tools.code_worker, not the application
+        self._context = spawn_context()
+        self._idle: "queue.Queue[CodeWorker]" = queue.Queue()
+        self._workers: List[CodeWorker] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self.metrics = {"runs": 0, "timeouts": 0, "crashes": 0, "recycled": 0}
+    
+    def start(self):
+        """Start the workers (done on first use if not called earlier)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        print(f"[CodeExecutor] Started {self.size} code workers")
+    
+    def _spawn(self) -> CodeWorker:
+        worker = CodeWorker(self._context, self.limits)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+    
+    def _retire(self, worker: CodeWorker, healthy: bool):
+        """Stop a worker and put a fresh one in its place"""
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if healthy:
+            worker.stop()
+        else:
+            worker.kill()
+        self._idle.put(self._spawn())
+    
+    def run(self, code: str) -> Dict[str, Any]:
+        """
+        Run code on the next idle worker
         
-        namespace.update(safe_imports)
-        
-        # Capture output
-        stdout = io.StringIO()
-        stderr = io.StringIO()
+        Returns:
+            dict with 'success', 'output', 'error' and 'usage' keys
+        """
+        self.start()
+        worker = self._idle.get()
+        healthy = False
+        start = time.perf_counter()
         
         try:
-            # Set timeout (Unix-like systems only)
-            if hasattr(signal, 'SIGALRM'):
-                signal.signal(signal.SIGALRM, timeout_handler)
-                signal.alarm(self.timeout)
-            
-            # Execute code
-            with redirect_stdout(stdout), redirect_stderr(stderr):
-                exec(code, namespace)
-            
-            # Cancel timeout
-            if hasattr(signal, 'SIGALRM'):
-                signal.alarm(0)
-            
-            output = stdout.getvalue()
-            errors = stderr.getvalue()
+            if not worker.wait_ready(self.startup_timeout):
+                return {
+                    'success': False,
+                    'output': '',
+                    'error': "Code worker failed to start"
+                }
             
-            if errors:
+            result = worker.run(code, self.timeout)
+            if result is None:
+                self._count("timeouts")
                 return {
                     'success': False,
-                    'output': output,
-                    'error': errors
+                    'output': '',
+                    'error': f"Code execution timed out after {self.timeout} seconds",
+                    'usage': _wall_usage(start)
                 }
             
+            healthy = True
+            worker.runs += 1
+            return result
+        
+        except (EOFError, OSError) as e:
+            self._count("crashes")
+            worker.process.join(1)
+            return {
+                'success': False,
+                'output': '',
+                'error': f"Code worker process died (exit code {worker.process.exitcode}): {type(e).__name__}",
+                'usage': _wall_usage(start)
+            }
+        
+        finally:
+            self._count("runs")
+            if healthy and worker.runs < self.max_runs:
+                self._idle.put(worker)
+            else:
+                if healthy:
+                    self._count("recycled")
+                self._retire(worker, healthy)
+    
+    def _count(self, metric: str):
+        with self._lock:
+            self.metrics[metric] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
             return {
-                'success': True,
-                'output': output or "Code executed successfully (no output)",
-                'error': None
+                "workers": len(self._workers),
+                "idle": self._idle.qsize(),
+                "max_runs": self.max_runs,
+                "limits": self.limits,
+                **self.metrics
             }
+    
+    def shutdown(self):
+        """Stop every worker"""
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+            self._started = False
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for worker in workers:
+            worker.stop()
+
+
+class SessionKernel(CodeWorker):
+    """A session's persistent worker process"""
+    
+    def __init__(self, context, limits: Optional[Dict[str, int]] = None):
+        super().__init__(context, limits, persistent=True)
+        # Runs one at a time; users counts requests holding the kernel
+        self.lock = threading.Lock()
+        self.users = 0
+        self.last_used = time.monotonic()
+
+
+class SessionKernels:
+    """
+    One long-lived worker process per session, keeping its namespace
+    
+    Variables defined by a session's code stay in memory for its later
+    runs, so follow-up analysis doesn't reload or recompute its data. Each
+    kernel runs under the pool's limits but with CODE_KERNEL_MEMORY_MB of
+    memory, since its data builds up; a run that goes over fails with a
+    MemoryError and the kernel keeps its state. Kernels idle for longer
+    than CODE_KERNEL_IDLE_MINUTES are stopped by a background thread, and
+    beyond CODE_MAX_KERNELS the least recently used idle one is stopped.
+    A run that times out or kills its kernel loses the session's state;
+    reset() drops it on request.
+    """
+    
+    # Longest wait for a new kernel's imports, and for a variable listing
+    startup_timeout = 60
+    describe_timeout = 5
+    sweep_interval = 60
+    
+    def __init__(
+        self,
+        max_kernels: int = settings.CODE_MAX_KERNELS,
+        idle_minutes: int = settings.CODE_KERNEL_IDLE_MINUTES,
+        timeout: int = settings.CODE_TIMEOUT_SECONDS,
+        limits: Optional[Dict[str, int]] = None
+    ):
+        self.max_kernels = max(1, max_kernels)
+        self.idle_seconds = idle_minutes * 60
+        self.timeout = timeout
+        self.limits = limits if limits is not None else {
+            "memory_mb": settings.CODE_KERNEL_MEMORY_MB,
+            "cpu_seconds": settings.CODE_MAX_CPU_SECONDS,
+            "open_files": settings.CODE_MAX_OPEN_FILES,
+            "file_mb": settings.CODE_MAX_FILE_MB,
+            "output_kb": settings.CODE_MAX_OUTPUT_KB
+        }
+        self._context = spawn_context()
+        self._kernels: "OrderedDict[str, SessionKernel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {
+            "runs": 0,
+            "started": 0,
+            "resets": 0,
+            "evicted_idle": 0,
+            "evicted_lru": 0,
+            "timeouts": 0,
+            "crashes": 0
+        }
+        
+        self._stop = threading.Event()
+        self._sweeper = threading.Thread(
+            target=self._sweep_loop,
+            name="kernel-sweeper",
+            daemon=True
+        )
+        self._sweeper.start()
+    
+    def _checkout(self, session_id: str) -> Optional[SessionKernel]:
+        """
+        The session's kernel, started if needed, marked in use
+        
+        Returns:
+            None if a new kernel is needed but every kernel is in use
+        """
+        evicted = None
+        with self._lock:
+            kernel = self._kernels.get(session_id)
+            if kernel is None:
+                if len(self._kernels) >= self.max_kernels:
+                    victim = next((sid for sid, k in self._kernels.items() if k.users == 0), None)
+                    if victim is None:
+                        return None
+                    evicted = self._kernels.pop(victim)
+                    self.metrics["evicted_lru"] += 1
+                kernel = SessionKernel(self._context, self.limits)
+                self._kernels[session_id] = kernel
+                self.metrics["started"] += 1
+            self._kernels.move_to_end(session_id)
+            kernel.users += 1
+            kernel.last_used = time.monotonic()
+        
+        if evicted is not None:
+            evicted.stop()
+        return kernel
+    
+    def _release(self, session_id: str, kernel: SessionKernel, dead: bool):
+        with self._lock:
+            kernel.users -= 1
+            kernel.last_used = time.monotonic()
+            if dead and self._kernels.get(session_id) is kernel:
+                del self._kernels[session_id]
+        if dead:
+            kernel.kill()
+    
+    def run(self, session_id: str, code: str) -> Dict[str, Any]:
+        """
+        Run code in the session's kernel
         
-        except TimeoutException:
+        Returns:
+            dict with 'success', 'output', 'error' and 'usage' keys
+        """
+        kernel = self._checkout(session_id)
+        if kernel is None:
             return {
                 'success': False,
-                'output': stdout.getvalue(),
-                'error': f"Code execution timed out after {self.timeout} seconds"
+                'output': '',
+                'error': f"All {self.max_kernels} session kernels are busy, try again shortly"
             }
         
-        except Exception as e:
+        dead = True
+        start = time.perf_counter()
+        try:
+            with kernel.lock:
+                if not kernel.wait_ready(self.startup_timeout):
+                    return {
+                        'success': False,
+                        'output': '',
+                        'error': "Session kernel failed to start"
+                    }
+                
+                result = kernel.run(code, self.timeout)
+                if result is None:
+                    self._count("timeouts")
+                    return {
+                        'success': False,
+                        'output': '',
+                        'error': (
+                            f"Code execution timed out after {self.timeout} seconds; "
+                            f"the session's kernel was restarted and its variables lost"
+                        ),
+                        'usage': _wall_usage(start)
+                    }
+                
+                dead = False
+                return result
+        
+        except (EOFError, OSError) as e:
+            self._count("crashes")
+            kernel.process.join(1)
             return {
                 'success': False,
-                'output': stdout.getvalue(),
-                'error': f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+                'output': '',
+                'error': (
+                    f"Session kernel died (exit code {kernel.process.exitcode}): "
+                    f"{type(e).__name__}; its variables were lost"
+                ),
+                'usage': _wall_usage(start)
             }
         
         finally:
-            # Cleanup
-            if hasattr(signal, 'SIGALRM'):
-                signal.alarm(0)
-            stdout.close()
-            stderr.close()
+            self._count("runs")
+            self._release(session_id, kernel, dead)
+    
+    def describe(self, session_id: str) -> List[str]:
+        """
+        The variables defined in a session's kernel
+        
+        Returns:
+            "name: type" lines; empty if the session has no kernel
+        """
+        with self._lock:
+            kernel = self._kernels.get(session_id)
+            if kernel is None:
+                return []
+            kernel.users += 1
+        
+        dead = True
+        try:
+            with kernel.lock:
+                if not kernel.wait_ready(self.startup_timeout):
+                    return []
+                variables = kernel.describe(self.describe_timeout)
+                # A late reply would be read as the next run's result
+                dead = variables is None
+                return variables or []
+        except (EOFError, OSError):
+            return []
+        finally:
+            self._release(session_id, kernel, dead)
+    
+    def reset(self, session_id: str) -> bool:
+        """
+        Stop a session's kernel, dropping its variables (a run in
+        progress fails)
+        
+        Returns:
+            True if the session had a kernel
+        """
+        with self._lock:
+            kernel = self._kernels.pop(session_id, None)
+            if kernel is not None:
+                self.metrics["resets"] += 1
+        if kernel is None:
+            return False
+        kernel.kill()
+        return True
+    
+    def sweep(self) -> int:
+        """
+        Stop every kernel idle for longer than the idle timeout
+        
+        Returns:
+            Number of kernels stopped
+        """
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [
+                sid for sid, kernel in self._kernels.items()
+                if kernel.users == 0 and kernel.last_used < cutoff
+            ]
+            kernels = [self._kernels.pop(sid) for sid in idle]
+            self.metrics["evicted_idle"] += len(kernels)
+        for kernel in kernels:
+            kernel.stop()
+        return len(kernels)
+    
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                evicted = self.sweep()
+                if evicted:
+                    print(f"[CodeExecutor] Stopped {evicted} idle session kernels")
+            except Exception as e:
+                print(f"[CodeExecutor][ERROR] Kernel sweep failed: {type(e).__name__}: {e}")
+    
+    def _count(self, metric: str):
+        with self._lock:
+            self.metrics[metric] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "kernels": len(self._kernels),
+                "busy": sum(1 for kernel in self._kernels.values() if kernel.users),
+                "max_kernels": self.max_kernels,
+                "idle_minutes": self.idle_seconds // 60,
+                **self.metrics
+            }
+    
+    def shutdown(self):
+        """Stop the sweeper and every kernel"""
+        self._stop.set()
+        with self._lock:
+            kernels = list(self._kernels.values())
+            self._kernels.clear()
+        for kernel in kernels:
+            kernel.stop()
+
+
+class CodeExecutor:
+    """
+    Execute Python code in isolated worker processes
+    
+    With CODE_STATEFUL_SESSIONS, code run for a session goes to that
+    session's persistent kernel instead of the shared pool.
+    """
+    
+    def __init__(self):
+        self.timeout = settings.CODE_TIMEOUT_SECONDS
+        self.pool = CodeWorkerPool(timeout=self.timeout)
+        self.kernels = None
+        if settings.CODE_STATEFUL_SESSIONS:
+            self.kernels = SessionKernels(timeout=self.timeout)
+    
+    def execute(self, code: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Execute Python code and return results
+        
+        Args:
+            code: Python source to run
+            session_id: Session whose kernel to run in (stateful mode only)
+        
+        Returns:
+            dict with 'success', 'output', 'error' and 'usage' keys
+        """
+        if self.kernels is not None and session_id:
+            return self.kernels.run(session_id, code)
+        return self.pool.run(code)
+    
+    def session_variables(self, session_id: Optional[str]) -> List[str]:
+        """Variables kept in a session's kernel (none in stateless mode)"""
+        if self.kernels is None or not session_id:
+            return []
+        return self.kernels.describe(session_id)
+    
+    def reset_session(self, session_id: str) -> bool:
+        """
+        Drop a session's kernel and its variables
+        
+        Returns:
+            True if the session had a kernel
+        """
+        if self.kernels is None:
+            return False
+        return self.kernels.reset(session_id)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.pool.stats(),
+            "session_kernels": self.kernels.stats() if self.kernels is not None else None
+        }
+    
+    def shutdown(self):
+        """Stop the pool's workers and every session kernel"""
+        self.pool.shutdown()
+        if self.kernels is not None:
+            self.kernels.shutdown()
 
 
 # Global instance
 code_executor = CodeExecutor()
-
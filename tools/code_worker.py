@@ -0,0 +1,330 @@
+"""
+Code execution worker process
+
+Runs in a child process started by tools.code_executor. The data science
+libraries are imported once, when the worker starts, and every request
+then runs in a fresh namespace, or, for a persistent session kernel, in
+the one namespace kept for the worker's lifetime. This module must stay
+importable without the application settings: it is the child's only
+entry point (utils.processes keeps spawn from re-running the API's main
+script in the child).
+
+Resource limits (POSIX only) are applied once the libraries are loaded:
+address space, open files and file size for the worker's lifetime, and
+CPU seconds per run. A run that hits one fails with an error; the worker
+carries on.
+"""
+import io
+import os
+import math
+import time
+import types
+import signal
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+from typing import Dict, Any, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits
+    resource = None
+
+
+class CPUTimeExceeded(Exception):
+    """Raised inside user code when its run uses up its CPU seconds"""
+    pass
+
+
+class CappedOutput(io.StringIO):
+    """StringIO that keeps only the first `limit` characters written"""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.size = 0
+        self.truncated = False
+
+    def write(self, text: str) -> int:
+        written = len(text)
+        remaining = self.limit - self.size
+        if written > remaining:
+            self.truncated = True
+            text = text[:max(0, remaining)]
+        if text:
+            super().write(text)
+            self.size += len(text)
+        return written
+
+    def getvalue(self) -> str:
+        value = super().getvalue()
+        if self.truncated:
+            value += f"\n... [output truncated at {self.limit // 1024} KB]"
+        return value
+
+
+def preload() -> Dict[str, Any]:
+    """Import the modules user code may use without importing them"""
+    # One math-library thread per worker, so a run can't take every core
+    for variable in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(variable, "1")
+
+    safe_imports = {
+        'math': __import__('math'),
+        'datetime': __import__('datetime'),
+        'json': __import__('json'),
+        're': __import__('re'),
+    }
+
+    # Try to import data science libraries (if available)
+    try:
+        import pandas as pd
+        import numpy as np
+        safe_imports['pd'] = pd
+        safe_imports['pandas'] = pd
+        safe_imports['np'] = np
+        safe_imports['numpy'] = np
+    except ImportError:
+        pass
+
+    try:
+        import matplotlib
+        matplotlib.use('Agg')  # Non-interactive backend
+        import matplotlib.pyplot as plt
+        safe_imports['plt'] = plt
+        safe_imports['matplotlib'] = matplotlib
+    except ImportError:
+        pass
+
+    return safe_imports
+
+
+def _proc_status_kb(field: str) -> Optional[int]:
+    """A kB value from /proc/self/status (Linux), or None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _set_limit(which: int, value: int):
+    """Set soft and hard limit, never above the current hard limit"""
+    _, hard = resource.getrlimit(which)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    try:
+        resource.setrlimit(which, (value, value))
+    except (ValueError, OSError) as e:
+        print(f"[CodeWorker][WARN] Could not set resource limit {which}: {e}")
+
+
+def _on_cpu_limit(signum, frame):
+    raise CPUTimeExceeded("CPU time limit exceeded")
+
+
+def apply_limits(limits: Dict[str, int]):
+    """
+    Apply the worker's lifetime limits (call after preload)
+
+    The memory limit is on top of what the worker already maps, so it is
+    what the user code itself may allocate.
+    """
+    if resource is None:
+        return
+
+    if limits.get("memory_mb"):
+        mapped = (_proc_status_kb("VmSize") or 0) * 1024
+        _set_limit(resource.RLIMIT_AS, mapped + limits["memory_mb"] * 1024 * 1024)
+
+    if limits.get("open_files"):
+        _set_limit(resource.RLIMIT_NOFILE, limits["open_files"])
+
+    if limits.get("file_mb"):
+        # Oversized writes fail with OSError instead of killing the worker
+        signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+        _set_limit(resource.RLIMIT_FSIZE, limits["file_mb"] * 1024 * 1024)
+
+    if limits.get("cpu_seconds"):
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter (Linux), so it covers one run"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> Optional[float]:
+    peak_kb = _proc_status_kb("VmHWM")
+    if peak_kb is None and resource is not None:
+        # Lifetime peak of the worker; ru_maxrss is in kB on Linux
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak_kb / 1024, 1) if peak_kb is not None else None
+
+
+def run_code(code: str, namespace: Dict[str, Any], limits: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Execute code in a namespace, capturing its output and resource usage
+
+    Returns:
+        dict with 'success', 'output', 'error' and 'usage' keys
+    """
+    output_limit = (limits.get("output_kb") or 0) * 1024 or 10 ** 9
+    stdout = CappedOutput(output_limit)
+    stderr = CappedOutput(output_limit)
+
+    start = time.perf_counter()
+    cpu_start = _cpu_seconds() if resource is not None else 0.0
+    if resource is not None and limits.get("cpu_seconds"):
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(
+            resource.RLIMIT_CPU,
+            (math.ceil(cpu_start + limits["cpu_seconds"]), hard)
+        )
+    _reset_peak_rss()
+
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            exec(code, namespace)
+
+        output = stdout.getvalue()
+        errors = stderr.getvalue()
+
+        if errors:
+            result = {
+                'success': False,
+                'output': output,
+                'error': errors
+            }
+        else:
+            result = {
+                'success': True,
+                'output': output or "Code executed successfully (no output)",
+                'error': None
+            }
+
+    except SystemExit as e:
+        # exit() ends the script, not the worker
+        if e.code in (None, 0):
+            result = {
+                'success': True,
+                'output': stdout.getvalue() or "Code executed successfully (no output)",
+                'error': None
+            }
+        else:
+            result = {
+                'success': False,
+                'output': stdout.getvalue(),
+                'error': f"SystemExit: {e.code}"
+            }
+
+    except CPUTimeExceeded:
+        result = {
+            'success': False,
+            'output': stdout.getvalue(),
+            'error': f"Code execution exceeded its CPU time limit of {limits['cpu_seconds']} seconds"
+        }
+
+    except MemoryError:
+        result = {
+            'success': False,
+            'output': stdout.getvalue(),
+            'error': f"MemoryError: code exceeded its memory limit of {limits.get('memory_mb')} MB"
+        }
+
+    except Exception as e:
+        result = {
+            'success': False,
+            'output': stdout.getvalue(),
+            'error': f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+        }
+
+    finally:
+        if resource is not None and limits.get("cpu_seconds"):
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        # Figures would otherwise pile up across runs
+        plt = namespace.get('plt')
+        if plt is not None:
+            plt.close('all')
+
+    result['usage'] = {
+        'wall_seconds': round(time.perf_counter() - start, 3),
+        'cpu_seconds': round(_cpu_seconds() - cpu_start, 3) if resource is not None else None,
+        'peak_rss_mb': _peak_rss_mb()
+    }
+    return result
+
+
+def fresh_namespace(preloaded: Dict[str, Any]) -> Dict[str, Any]:
+    namespace = {
+        '__builtins__': __builtins__,
+        'print': print,
+    }
+    namespace.update(preloaded)
+    return namespace
+
+
+def describe_namespace(namespace: Dict[str, Any], preloaded: Dict[str, Any], limit: int = 50) -> List[str]:
+    """
+    The variables user code has defined, as "name: type" lines
+
+    Preloaded and private names and modules are left out; arrays and
+    DataFrames show their shape.
+    """
+    lines = []
+    for name, value in namespace.items():
+        if name.startswith('_') or name in preloaded or name == 'print':
+            continue
+        if isinstance(value, types.ModuleType):
+            continue
+        description = f"{name}: {type(value).__name__}"
+        shape = getattr(value, 'shape', None)
+        if isinstance(shape, tuple):
+            description += f" {shape}"
+        lines.append(description)
+        if len(lines) == limit:
+            break
+    return lines
+
+
+def worker_main(conn, limits: Optional[Dict[str, int]] = None, persistent: bool = False):
+    """
+    Worker loop: preload, apply limits, report ready, then run requests
+    until told to stop
+
+    Requests are {"code": str} or {"describe": True}; None stops the
+    worker. A persistent worker runs every request in the same namespace.
+    """
+    limits = limits or {}
+    preloaded = preload()
+    apply_limits(limits)
+    namespace = fresh_namespace(preloaded)
+    conn.send({"ready": True})
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        if request.get("describe"):
+            conn.send(describe_namespace(namespace, preloaded))
+            continue
+        if not persistent:
+            namespace = fresh_namespace(preloaded)
+        conn.send(run_code(request["code"], namespace, limits))
@@ -15,10 +15,10 @@ sys.path.insert(0, str(project_root))
 import gradio as gr
 from agents.supervisor import supervisor
 from core.vectorstore import vector_manager
-from utils.document_loader import DocumentLoader
-from utils.chunking import default_chunker
+from core.jobs import ingestion_queue
 from app.config import settings
 import logging
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -92,46 +92,55 @@ def ingest_documents(files, current_status, progress=gr.Progress()):
     import datetime
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
+    # Submit every file to the shared ingestion queue, then poll for progress
+    jobs = []
     results = []
     total_chunks = 0
     
-    for file_idx, file in enumerate(files):
+    for file in files:
+        filename = Path(file.name).name
         try:
-            file_path = Path(file.name)
-            filename = file_path.name
-            
-            progress(file_idx / len(files), desc=f"Processing {filename}...")
-            logger.info(f"Processing file: {filename}")
-            
-            # Load document
-            progress(file_idx / len(files), desc=f"Loading {filename}...")
-            documents = DocumentLoader.load_document(file.name)
-            logger.info(f"Loaded {len(documents)} pages/sections")
-            
-            # Chunk documents
-            progress(file_idx / len(files), desc=f"Chunking {filename}...")
-            chunks = default_chunker.chunk_documents(documents)
-            logger.info(f"Created {len(chunks)} chunks")
-            
-            # Add metadata
-            for chunk in chunks:
-                chunk.metadata['source'] = filename
-                if 'page' not in chunk.metadata:
-                    chunk.metadata['page'] = 'N/A'
-            
-            # Add to vector store
-            progress(file_idx / len(files), desc=f"Embedding {filename}...")
-            logger.info("Adding to vector store...")
-            vector_manager.add_documents(chunks)
-            logger.info("Successfully added to vector store")
-            
-            total_chunks += len(chunks)
-            results.append(f"✅ {filename}: {len(chunks)} chunks")
-        
+            logger.info(f"Queueing file: {filename}")
+            jobs.append((filename, ingestion_queue.submit(file.name, source=filename)))
         except Exception as e:
-            logger.error(f"Error processing {filename}: {str(e)}", exc_info=True)
+            logger.error(f"Error queueing {filename}: {str(e)}", exc_info=True)
             results.append(f"❌ {filename}: {str(e)}")
     
+    statuses = []
+    while jobs:
+        statuses = [(filename, ingestion_queue.get(job.id)) for filename, job in jobs]
+        done = sum(1 for _, status in statuses if status['status'] in ("completed", "failed"))
+        
+        running = [(name, status) for name, status in statuses if status['status'] == "running"]
+        if running:
+            filename, status = running[0]
+            desc = (
+                f"{status['stage'].capitalize()} {filename} "
+                f"({status['progress']['chunks_written']}/{status['progress']['chunks_created']} chunks)"
+            )
+        else:
+            desc = "Waiting for ingestion workers..."
+        progress(done / len(jobs), desc=desc)
+        
+        if done == len(jobs):
+            break
+        time.sleep(0.5)
+    
+    for filename, status in statuses:
+        if status['status'] == "completed":
+            result = status['result']
+            chunks = result['chunks_created']
+            total_chunks += chunks
+            if result.get('status') == "unchanged":
+                results.append(f"✅ {filename}: unchanged, skipped ({chunks} chunks)")
+            else:
+                results.append(
+                    f"✅ {filename}: {chunks} chunks "
+                    f"({result['chunks_new']} new, {result['chunks_reused']} reused)"
+                )
+        else:
+            results.append(f"❌ {filename}: {status['error']}")
+    
     progress(1.0, desc="Complete!")
     
     # Create new entry with timestamp
@@ -282,7 +291,7 @@ with gr.Blocks(
         gr.Markdown("""
         ### Upload Documents for Analysis
         
-        Upload PDF, DOCX, or TXT files. The system will:
+        Upload PDF, DOCX, TXT, XLSX or CSV files. The system will:
         1. Extract text content
         2. Split into chunks
         3. Create embeddings
@@ -294,7 +303,7 @@ with gr.Blocks(
         file_upload = gr.File(
             label="Upload Documents",
             file_count="multiple",
-            file_types=[".pdf", ".docx", ".doc", ".txt"]
+            file_types=[".pdf", ".docx", ".doc", ".txt", ".xlsx", ".csv"]
         )
         
         ingest_btn = gr.Button("Process Documents", variant="primary")
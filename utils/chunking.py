@@ -1,9 +1,17 @@
 """
 Text chunking utilities
 """
-from typing import List
+import re
+from typing import List, Iterable, Iterator, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
+from app.config import settings
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
 
 
 class TextChunker:
@@ -28,11 +36,175 @@ class TextChunker:
         """Chunk documents into smaller pieces"""
         return self.splitter.split_documents(documents)
     
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Chunk documents lazily, one input document at a time"""
+        for document in documents:
+            yield from self.splitter.split_documents([document])
+    
     def chunk_text(self, text: str) -> List[str]:
         """Chunk plain text"""
         return self.splitter.split_text(text)
 
 
-# Default chunker instance
-default_chunker = TextChunker()
+class TokenChunker:
+    """
+    Chunk text into token-bounded pieces in a single pass
+
+    The text is tokenized once and each token's character offset is kept,
+    so every cut is an index lookup rather than a re-split of the text.
+    Cuts are moved back to a paragraph, sentence or word break when one
+    falls within the last quarter of the window. Chunks record their
+    character span (start_index/end_index) and token_count in metadata.
+
+    Uses the embedding model's tiktoken encoding; without tiktoken (or its
+    encoding files) words and punctuation marks are counted as tokens.
+    """
 
+    # Fraction of chunk_size to search backwards for a natural break
+    boundary_lookback = 0.25
+
+    # Fallback tokenizer: words and single punctuation marks
+    fallback_token_pattern = re.compile(r"\w+|[^\w\s]")
+
+    def __init__(
+        self,
+        chunk_size: int = 256,
+        chunk_overlap: int = 50
+    ):
+        if chunk_size <= 0 or not 0 <= chunk_overlap < chunk_size:
+            raise ValueError(
+                f"Invalid token chunk settings: size={chunk_size}, overlap={chunk_overlap}"
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._encoding = None
+        self._encoding_loaded = False
+
+    def _get_encoding(self):
+        """Load the embedding model's tiktoken encoding (None if unavailable)"""
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            if TIKTOKEN_AVAILABLE:
+                try:
+                    try:
+                        self._encoding = tiktoken.encoding_for_model(settings.EMBEDDING_MODEL)
+                    except KeyError:
+                        self._encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    print(f"[Chunker][WARN] tiktoken encoding unavailable ({type(e).__name__}), counting words instead")
+            else:
+                print("[Chunker][WARN] tiktoken not installed, counting words instead")
+        return self._encoding
+
+    def token_offsets(self, text: str) -> List[int]:
+        """Character offset at which each token starts"""
+        encoding = self._get_encoding()
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())
+            _, offsets = encoding.decode_with_offsets(tokens)
+            return offsets
+        return [match.start() for match in self.fallback_token_pattern.finditer(text)]
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.token_offsets(text))
+
+    @staticmethod
+    def _break_rank(text: str, offset: int) -> int:
+        """How good a cut just before `offset` is: 3 paragraph, 2 sentence, 1 word, 0 none"""
+        before = text[offset - 1] if offset > 0 else ""
+        at = text[offset] if offset < len(text) else ""
+        if before == "\n" or at == "\n":
+            return 3
+        if before in ".!?" and at.isspace():
+            return 2
+        if before.isspace() or at.isspace():
+            return 1
+        return 0
+
+    def _cut(self, text: str, offsets: List[int], start: int, end: int) -> int:
+        """Token index to end a chunk at, at most `end`"""
+        floor = max(start + 1, end - int(self.chunk_size * self.boundary_lookback))
+        best, best_rank = end, 0
+        for i in range(end, floor - 1, -1):
+            rank = self._break_rank(text, offsets[i])
+            if rank > best_rank:
+                best, best_rank = i, rank
+                if rank == 3:
+                    break
+        return best
+
+    def _overlap_start(self, text: str, offsets: List[int], start: int, end: int) -> int:
+        """Token index to start the next chunk at, moved forward to a word break"""
+        first = max(end - self.chunk_overlap, start + 1)
+        for i in range(first, end):
+            if self._break_rank(text, offsets[i]):
+                return i
+        return first if first < end else end
+    
+    def split_spans(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Split text into chunk spans
+
+        Returns:
+            (start_index, end_index, token_count) per chunk, as character
+            offsets into text with surrounding whitespace trimmed
+        """
+        offsets = self.token_offsets(text)
+        total = len(offsets)
+        spans = []
+        start = 0
+
+        while start < total:
+            end = min(start + self.chunk_size, total)
+            if end < total:
+                end = self._cut(text, offsets, start, end)
+
+            start_char = offsets[start]
+            end_char = offsets[end] if end < total else len(text)
+
+            # Trim whitespace without losing track of the offsets
+            piece = text[start_char:end_char]
+            stripped = piece.strip()
+            if stripped:
+                start_char += len(piece) - len(piece.lstrip())
+                spans.append((start_char, start_char + len(stripped), end - start))
+
+            if end >= total:
+                break
+            start = self._overlap_start(text, offsets, start, end)
+
+        return spans
+
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Chunk documents lazily, one input document at a time"""
+        for document in documents:
+            text = document.page_content
+            for start_index, end_index, token_count in self.split_spans(text):
+                metadata = dict(document.metadata)
+                metadata.update(
+                    start_index=start_index,
+                    end_index=end_index,
+                    token_count=token_count
+                )
+                yield Document(page_content=text[start_index:end_index], metadata=metadata)
+
+    def chunk_documents(self, documents: List[Document]) -> List[Document]:
+        """Chunk documents into smaller pieces"""
+        return list(self.iter_chunks(documents))
+
+    def chunk_text(self, text: str) -> List[str]:
+        """Chunk plain text"""
+        return [text[start:end] for start, end, _ in self.split_spans(text)]
+
+
+def create_chunker():
+    """Build the chunker selected by CHUNKER"""
+    if settings.CHUNKER == "token":
+        return TokenChunker(settings.CHUNK_SIZE_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
+    if settings.CHUNKER == "character":
+        return TextChunker()
+    raise ValueError(f"Unknown CHUNKER '{settings.CHUNKER}': use 'token' or 'character'")
+
+
+# Default chunker instance
+default_chunker = create_chunker()
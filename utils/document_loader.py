@@ -1,9 +1,15 @@
 """
 Document loading utilities
 """
-from typing import List
+import csv
+from itertools import chain
+from typing import List, Iterator, Iterable, Optional, Sequence
 from pathlib import Path
+import pandas as pd
+from openpyxl import load_workbook
+from pypdf import PdfReader
 from langchain.schema import Document
+from app.config import settings
 from langchain_community.document_loaders import (
     PyPDFLoader,
     TextLoader,
@@ -14,12 +20,54 @@ from langchain_community.document_loaders import (
 class DocumentLoader:
     """Load documents from various formats"""
     
+    # File extensions load_document can handle
+    supported_extensions = ('.pdf', '.txt', '.docx', '.doc', '.xlsx', '.csv')
+    
+    # Spreadsheet formats: read as a stream of row groups that are already chunks
+    tabular_extensions = ('.xlsx', '.csv')
+    
+    # Rows read from a CSV per pandas chunk
+    csv_read_rows = 10000
+    
     @staticmethod
     def load_pdf(file_path: str) -> List[Document]:
         """Load PDF document"""
         loader = PyPDFLoader(file_path)
         return loader.load()
     
+    @staticmethod
+    def iter_pdf(file_path: str) -> Iterator[Document]:
+        """Load a PDF one page at a time"""
+        reader = PdfReader(file_path)
+        for page_number, page in enumerate(reader.pages):
+            yield Document(
+                page_content=page.extract_text(),
+                metadata={"source": file_path, "page": page_number}
+            )
+    
+    @staticmethod
+    def count_pdf_pages(file_path: str) -> int:
+        """Number of pages in a PDF (reads the page tree only)"""
+        return len(PdfReader(file_path).pages)
+    
+    @staticmethod
+    def load_pdf_pages(file_path: str, start: int, end: int) -> List[Document]:
+        """
+        Load a range of PDF pages
+        
+        Produces the same documents as load_pdf for pages [start, end), so a
+        large PDF can be parsed in pieces by several processes.
+        """
+        reader = PdfReader(file_path)
+        end = min(end, len(reader.pages))
+        return [
+            Document(
+                page_content=reader.pages[page_number].extract_text(),
+                metadata={"source": file_path, "page": page_number}
+            )
+            for page_number in range(start, end)
+        ]
+    
     @staticmethod
     def load_txt(file_path: str) -> List[Document]:
         """Load text document"""
@@ -32,21 +80,201 @@ class DocumentLoader:
         loader = Docx2txtLoader(file_path)
         return loader.load()
     
+    @staticmethod
+    def is_tabular(file_path: str) -> bool:
+        """Whether a file is loaded as row groups rather than pages"""
+        return Path(file_path).suffix.lower() in DocumentLoader.tabular_extensions
+    
+    @staticmethod
+    def _group_rows(
+        rows: Iterable[tuple],
+        header: Sequence[str],
+        file_path: str,
+        label: str,
+        sheet: Optional[str] = None
+    ) -> Iterator[Document]:
+        """
+        Group (row_number, values) pairs into chunk-sized documents
+        
+        Every row is written as "column: value" pairs, so each chunk carries
+        its header context. Groups are closed at TABLE_CHUNK_CHARS; a row
+        longer than that on its own is cut into several chunks.
+        """
+        max_chars = settings.TABLE_CHUNK_CHARS
+        lines: List[str] = []
+        size = 0
+        first_row = last_row = None
+        
+        def flush() -> Document:
+            metadata = {
+                "source": file_path,
+                "page": f"{label} {first_row}-{last_row}",
+                "row_start": first_row,
+                "row_end": last_row
+            }
+            if sheet is not None:
+                metadata["sheet"] = sheet
+            return Document(page_content="\n".join(lines), metadata=metadata)
+        
+        for row_number, values in rows:
+            fields = [
+                f"{name}: {value}"
+                for name, value in zip(header, values)
+                if value is not None and str(value).strip() != ""
+            ]
+            if not fields:
+                continue
+            line = " | ".join(fields)
+            
+            if lines and size + len(line) > max_chars:
+                yield flush()
+                lines, size, first_row = [], 0, None
+            
+            if len(line) > max_chars:
+                first_row = last_row = row_number
+                for piece in DocumentLoader._split_row(line, max_chars):
+                    lines = [piece]
+                    yield flush()
+                lines, size, first_row = [], 0, None
+                continue
+            
+            if first_row is None:
+                first_row = row_number
+            last_row = row_number
+            lines.append(line)
+            size += len(line) + 1
+        
+        if lines:
+            yield flush()
+    
+    @staticmethod
+    def _split_row(line: str, max_chars: int) -> List[str]:
+        """Cut a row into pieces of at most max_chars, at field or word breaks"""
+        pieces = []
+        while len(line) > max_chars:
+            cut, skip = line.rfind(" | ", 0, max_chars), 3
+            if cut <= 0:
+                cut, skip = line.rfind(" ", 0, max_chars), 1
+            if cut < max_chars // 2:
+                cut, skip = max_chars, 0  # One long value: no useful break
+            pieces.append(line[:cut])
+            line = line[cut + skip:]
+        if line:
+            pieces.append(line)
+        return pieces
+    
+    @staticmethod
+    def _header(values: Sequence) -> List[str]:
+        """Column names, with placeholders for blank header cells"""
+        return [
+            str(value).strip() if value is not None and str(value).strip() else f"Column {i + 1}"
+            for i, value in enumerate(values)
+        ]
+    
+    @staticmethod
+    def iter_xlsx(file_path: str) -> Iterator[Document]:
+        """
+        Stream an Excel workbook as row groups, sheet by sheet
+        
+        Uses openpyxl's read-only mode, so rows are read from the file as
+        they are needed instead of loading the workbook.
+        """
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                rows = sheet.iter_rows(values_only=True)
+                header = None
+                row_number = 0
+                for values in rows:
+                    row_number += 1
+                    if any(value is not None and str(value).strip() for value in values):
+                        header = DocumentLoader._header(values)
+                        break
+                if header is None:
+                    continue  # Empty sheet
+                
+                numbered = enumerate(rows, start=row_number + 1)
+                yield from DocumentLoader._group_rows(
+                    numbered, header, file_path, label=f"{sheet.title} rows", sheet=sheet.title
+                )
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def iter_csv(file_path: str) -> Iterator[Document]:
+        """
+        Stream a CSV file as row groups
+        
+        Reads csv_read_rows rows at a time with pandas; the delimiter is
+        sniffed from the start of the file.
+        """
+        with open(file_path, newline="", encoding="utf-8", errors="replace") as f:
+            sample = f.read(64 * 1024)
+        try:
+            delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+        except csv.Error:
+            delimiter = ","
+        
+        with pd.read_csv(
+            file_path,
+            sep=delimiter,
+            dtype=str,
+            keep_default_na=False,
+            chunksize=DocumentLoader.csv_read_rows,
+            encoding="utf-8",
+            encoding_errors="replace",
+            on_bad_lines="warn"
+        ) as reader:
+            frames = iter(reader)
+            first = next(frames, None)
+            if first is None:
+                return
+            # pandas names blank header cells "Unnamed: N"
+            header = DocumentLoader._header(
+                [None if str(name).startswith("Unnamed:") else name for name in first.columns]
+            )
+            
+            def numbered_rows():
+                row_number = 1  # Row 1 is the header line
+                for frame in chain([first], frames):
+                    for values in frame.itertuples(index=False, name=None):
+                        row_number += 1
+                        yield row_number, values
+            
+            yield from DocumentLoader._group_rows(numbered_rows(), header, file_path, label="rows")
+    
     @staticmethod
     def load_document(file_path: str) -> List[Document]:
-        """Load document based on file extension"""
-        file_path_obj = Path(file_path)
-        extension = file_path_obj.suffix.lower()
-        
-        loaders = {
-            '.pdf': DocumentLoader.load_pdf,
-            '.txt': DocumentLoader.load_txt,
-            '.docx': DocumentLoader.load_docx,
-            '.doc': DocumentLoader.load_docx,
-        }
-        
-        if extension not in loaders:
-            raise ValueError(f"Unsupported file format: {extension}")
+        """
+        Load a whole document into memory
         
-        return loaders[extension](file_path)
-
+        Kept for compatibility: it is iter_document() collected into a list,
+        so a spreadsheet or a large PDF is held in memory in full. Use
+        iter_document() to stream them.
+        """
+        return list(DocumentLoader.iter_document(file_path))
+    
+    @staticmethod
+    def iter_document(file_path: str) -> Iterator[Document]:
+        """
+        Load a document lazily, page by page where the format allows it
+        
+        PDFs are read one page at a time and spreadsheets one row group at a
+        time; other formats are small enough to load whole.
+        
+        Raises:
+            ValueError: If the file format is not supported
+        """
+        extension = Path(file_path).suffix.lower()
+        if extension == '.pdf':
+            yield from DocumentLoader.iter_pdf(file_path)
+        elif extension == '.xlsx':
+            yield from DocumentLoader.iter_xlsx(file_path)
+        elif extension == '.csv':
+            yield from DocumentLoader.iter_csv(file_path)
+        elif extension == '.txt':
+            yield from DocumentLoader.load_txt(file_path)
+        elif extension in ('.docx', '.doc'):
+            yield from DocumentLoader.load_docx(file_path)
+        else:
+            raise ValueError(f"Unsupported file format: {extension}")
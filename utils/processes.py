@@ -0,0 +1,58 @@
+"""
+Worker process start-up
+
+Spawned children normally re-run the parent's main script (as
+__mp_main__) before they do anything else. Started with
+`python app/main.py` or the Gradio app, that imports the whole
+application (FastAPI, LangChain, Chroma) into every code worker, kernel
+and parser process. The context here starts children with the target's
+own module as their only entry point instead.
+
+The module is unpickled in every child, so it must only import the
+standard library.
+"""
+import sys
+import types
+import threading
+import multiprocessing.context
+from contextlib import contextmanager
+
+# Stands in for __main__ while a child is launched; without a file or spec
+# there is no main script for the child to re-run
+_bare_main = types.ModuleType("__main__")
+_main_lock = threading.Lock()
+
+
+@contextmanager
+def _without_main_script():
+    """Hide the main script from spawn's preparation data"""
+    with _main_lock:
+        main_module = sys.modules["__main__"]
+        sys.modules["__main__"] = _bare_main
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main_module
+
+
+class _SpawnProcess(multiprocessing.context.SpawnProcess):
+    """Spawned process that does not re-run the main script"""
+
+    @staticmethod
+    def _Popen(process_obj):
+        with _without_main_script():
+            return multiprocessing.context.SpawnProcess._Popen(process_obj)
+
+
+class _SpawnContext(multiprocessing.context.SpawnContext):
+    Process = _SpawnProcess
+
+
+def spawn_context() -> multiprocessing.context.SpawnContext:
+    """
+    spawn context whose children only import what their target needs
+
+    Targets (and anything passed to them) must live in importable modules,
+    not in the main script. Works as a ProcessPoolExecutor mp_context.
+    """
+    return _SpawnContext()
@@ -98,3 +98,15 @@ User Query: {query}
 
 Rewritten Query:"""
 
+
+CONVERSATION_SUMMARY_PROMPT = """Update the running summary of a conversation between a user and an AI assistant with the new turns below.
+
+Keep facts, names, numbers, decisions, open questions and the user's goals and preferences. Drop greetings and small talk. Write at most {max_words} words of plain prose.
+
+Current summary:
+{summary}
+
+New turns:
+{transcript}
+
+Updated summary:"""